@@ -3,11 +3,91 @@ Problem analyzer module for identifying, categorizing, and prioritizing problems
 """
 import re
 from collections import Counter
-from typing import List, Dict
+from typing import List, Dict, Optional
 import nltk
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 
+from preprocess import TextPreprocessor
+from sketches import create_keyword_counter, merge_counts
+
+
+class AnalysisState:
+    """Running aggregates of an analysis.
+    
+    States built independently (by pipeline workers or batch shards) can be
+    combined with ``merge``. Counts do not depend on the merge order; a
+    group's representative title and examples come from its earliest
+    problem, so only merging in input order (as ``batch.py`` does) gives
+    exactly the result of a single sequential pass.
+    """
+    
+    # Examples kept per global group (None keeps all)
+    max_examples = None
+    
+    def __init__(self, keyword_counts=None, max_examples: Optional[int] = None):
+        self.total = 0
+        self.max_examples = max_examples
+        # An exact Counter, or a fixed-memory sketch (see sketches.py)
+        self.keyword_counts = keyword_counts if keyword_counts is not None else Counter()
+        self.categories = Counter()
+        self.sources = Counter()
+        self.groups = {}
+        # Group-by cells: category name, source name, (category, source)
+        self.cubes = {'category': {}, 'source': {}, 'category_source': {}}
+    
+    def merge(self, other: 'AnalysisState'):
+        """Fold another state into this one."""
+        self.total += other.total
+        merge_counts(self.keyword_counts, other.keyword_counts)
+        self.categories.update(other.categories)
+        self.sources.update(other.sources)
+        _merge_groups(self.groups, other.groups, self.max_examples)
+        
+        for cube, cells in other.cubes.items():
+            own_cells = self.cubes[cube]
+            for key, cell in cells.items():
+                existing = own_cells.get(key)
+                if existing is None:
+                    own_cells[key] = cell
+                else:
+                    existing['total'] += cell['total']
+                    existing['engagement'] += cell['engagement']
+                    merge_counts(existing['keywords'], cell['keywords'])
+                    _merge_groups(existing['groups'], cell['groups'], existing['max_examples'])
+
+
+def _merge_groups(groups: Dict, other: Dict, max_examples: Optional[int] = None):
+    """Merge problem groups keyed by signature, optionally capping examples."""
+    for signature, group in other.items():
+        existing = groups.get(signature)
+        if existing is None:
+            groups[signature] = group
+        else:
+            existing['count'] += group['count']
+            existing['total_engagement'] += group['total_engagement']
+            existing['examples'].extend(group['examples'])
+            if max_examples is not None:
+                del existing['examples'][max_examples:]
+
+
+def calculate_engagement(problem: Dict) -> int:
+    """Calculate engagement score for a problem."""
+    score = 0
+    
+    # Different scoring based on source
+    if problem.get('source') == 'reddit':
+        score += problem.get('score', 0)
+        score += problem.get('num_comments', 0) * 2
+    elif problem.get('source') == 'stackoverflow':
+        score += problem.get('score', 0)
+        score += problem.get('answer_count', 0) * 3
+        score += problem.get('view_count', 0) // 100
+    elif problem.get('source') == 'github':
+        score += problem.get('comments', 0) * 2
+    
+    return score
+
 
 class ProblemAnalyzer:
     """Analyze and prioritize problems from scraped data."""
@@ -17,6 +97,19 @@ class ProblemAnalyzer:
         self.analysis_config = config.get('analysis', {})
         self.min_mentions = self.analysis_config.get('min_problem_mentions', 3)
         self.top_count = self.analysis_config.get('top_problems_count', 50)
+        # Examples kept per global group; None keeps all (batch.py caps it)
+        self.group_examples: Optional[int] = None
+        
+        cubes_config = self.analysis_config.get('cubes', {})
+        self.cubes_enabled = cubes_config.get('enabled', True)
+        self.cube_top_k = cubes_config.get('top_k', 10)
+        self.cube_top_keywords = cubes_config.get('top_keywords', 20)
+        self.cube_examples = cubes_config.get('examples', 3)
+        self.keyword_sketch = self.analysis_config.get('keyword_sketch', {})
+        
+        preprocess_config = self.analysis_config.get('preprocess', {})
+        self.preprocessor = (TextPreprocessor(preprocess_config)
+                             if preprocess_config.get('enabled', False) else None)
         
         # Download NLTK data if not already present
         try:
@@ -84,9 +177,77 @@ class ProblemAnalyzer:
         
         return 'General'
     
-    def analyze_problems(self, problems: List[Dict]) -> Dict:
-        """Analyze problems and return insights."""
-        if not problems:
+    def new_state(self) -> AnalysisState:
+        """Create an empty state using the configured keyword counter."""
+        return AnalysisState(create_keyword_counter(self.keyword_sketch, 50),
+                             max_examples=self.group_examples)
+    
+    def preprocess_problem(self, problem: Dict) -> Dict:
+        """Return the problem with code, traces, logs and markup stripped
+        from its body and comments (unchanged when preprocessing is off)."""
+        if self.preprocessor is None:
+            return problem
+        cleaned = dict(problem, text=self.preprocessor.clean(problem.get('text', '')))
+        if problem.get('comments_text'):
+            cleaned['comments_text'] = self.preprocessor.clean(problem['comments_text'])
+        return cleaned
+    
+    def prepare_problem(self, problem: Dict) -> Dict:
+        """Extract keywords, category and engagement for a single problem.
+        
+        This is the CPU-heavy, order-independent part of the analysis and can
+        run on any worker; the result is folded in with ``accumulate``.
+        """
+        problem = self.preprocess_problem(problem)
+        title = problem.get('title', '')
+        text = problem.get('text', '')
+        combined_text = f"{title} {text}"
+        # Comment threads fetched by the crawl frontier, if any
+        if problem.get('comments_text'):
+            combined_text = f"{combined_text} {problem['comments_text']}"
+        
+        return {
+            'title': title,
+            'keywords': self.extract_keywords(combined_text),
+            'category': self.categorize_problem(problem),
+            'source': problem.get('source', 'unknown'),
+            'url': problem.get('url', ''),
+            'score': problem.get('score', 0),
+            'engagement': self._calculate_engagement(problem)
+        }
+    
+    def accumulate(self, state: 'AnalysisState', prepared: Dict):
+        """Fold a prepared problem into a running analysis state."""
+        state.total += 1
+        state.keyword_counts.update(prepared['keywords'])
+        state.categories[prepared['category']] += 1
+        state.sources[prepared['source']] += 1
+        
+        # Only titled problems take part in grouping
+        if prepared['title']:
+            self._add_to_group(state.groups, prepared, state.max_examples)
+        
+        if self.cubes_enabled:
+            category, source = prepared['category'], prepared['source']
+            for cube, key in (('category', category), ('source', source),
+                              ('category_source', (category, source))):
+                cell = state.cubes[cube].get(key)
+                if cell is None:
+                    cell = state.cubes[cube][key] = {
+                        'total': 0, 'engagement': 0,
+                        'keywords': create_keyword_counter(self.keyword_sketch,
+                                                           self.cube_top_keywords, cell=True),
+                        'groups': {}, 'max_examples': self.cube_examples
+                    }
+                cell['total'] += 1
+                cell['engagement'] += prepared['engagement']
+                cell['keywords'].update(prepared['keywords'])
+                if prepared['title']:
+                    self._add_to_group(cell['groups'], prepared, self.cube_examples)
+    
+    def finalize(self, state: 'AnalysisState') -> Dict:
+        """Turn an accumulated state into the analysis result."""
+        if not state.total:
             return {
                 'total_problems': 0,
                 'top_problems': [],
@@ -94,105 +255,103 @@ class ProblemAnalyzer:
                 'sources': {}
             }
         
-        # Extract all keywords and titles
-        all_keywords = []
-        problem_titles = []
-        categories = Counter()
-        sources = Counter()
-        
-        for problem in problems:
-            # Extract keywords
-            title = problem.get('title', '')
-            text = problem.get('text', '')
-            combined_text = f"{title} {text}"
-            keywords = self.extract_keywords(combined_text)
-            all_keywords.extend(keywords)
-            
-            # Store title for problem identification
-            if title:
-                problem_titles.append({
-                    'title': title,
-                    'keywords': keywords,
-                    'category': self.categorize_problem(problem),
-                    'source': problem.get('source', 'unknown'),
-                    'url': problem.get('url', ''),
-                    'score': problem.get('score', 0),
-                    'engagement': self._calculate_engagement(problem)
-                })
-            
-            # Count categories
-            category = self.categorize_problem(problem)
-            categories[category] += 1
-            
-            # Count sources
-            source = problem.get('source', 'unknown')
-            sources[source] += 1
-        
-        # Find most common keywords
-        keyword_counts = Counter(all_keywords)
-        
-        # Group similar problems
-        grouped_problems = self._group_similar_problems(problem_titles)
-        
         # Rank problems by frequency and engagement
-        ranked_problems = self._rank_problems(grouped_problems)
+        ranked_problems = self._rank_problems(list(state.groups.values()))
         
-        return {
-            'total_problems': len(problems),
+        analysis = {
+            'total_problems': state.total,
             'top_problems': ranked_problems[:self.top_count],
-            'top_keywords': keyword_counts.most_common(50),
-            'categories': dict(categories.most_common()),
-            'sources': dict(sources)
+            'top_keywords': state.keyword_counts.most_common(50),
+            'categories': dict(state.categories.most_common()),
+            'sources': dict(state.sources)
         }
+        if not isinstance(state.keyword_counts, Counter):
+            # Keyword counts come from a sketch and may be this much too high
+            analysis['keyword_error_bound'] = state.keyword_counts.error_bound()
+        if self.cubes_enabled:
+            analysis['cubes'] = self._finalize_cubes(state.cubes)
+        return analysis
     
-    def _calculate_engagement(self, problem: Dict) -> int:
-        """Calculate engagement score for a problem."""
-        score = 0
+    def _finalize_cube_cell(self, cell: Dict) -> Dict:
+        """Rank one group-by cell into a small per-slice analysis."""
+        ranked = self._rank_problems(list(cell['groups'].values()))
+        result = {
+            'total_problems': cell['total'],
+            'total_engagement': cell['engagement'],
+            'top_problems': ranked[:self.cube_top_k],
+            'top_keywords': cell['keywords'].most_common(self.cube_top_keywords)
+        }
+        if not isinstance(cell['keywords'], Counter):
+            result['keyword_error_bound'] = cell['keywords'].error_bound()
+        return result
+    
+    def _finalize_cubes(self, cubes: Dict) -> Dict:
+        """Build the per-category, per-source and category x source slices.
+        
+        Cross cells are nested as ``category_source[category][source]``.
+        """
+        by_category = {name: self._finalize_cube_cell(cell)
+                       for name, cell in cubes['category'].items()}
+        by_source = {name: self._finalize_cube_cell(cell)
+                     for name, cell in cubes['source'].items()}
+        cross = {}
+        for (category, source), cell in cubes['category_source'].items():
+            cross.setdefault(category, {})[source] = self._finalize_cube_cell(cell)
+            by_category[category].setdefault('sources', {})[source] = cell['total']
+            by_source[source].setdefault('categories', {})[category] = cell['total']
+        
+        return {'category': by_category, 'source': by_source, 'category_source': cross}
+    
+    def analyze_problems(self, problems: List[Dict]) -> Dict:
+        """Analyze problems and return insights."""
+        state = self.new_state()
         
-        # Different scoring based on source
-        if problem.get('source') == 'reddit':
-            score += problem.get('score', 0)
-            score += problem.get('num_comments', 0) * 2
-        elif problem.get('source') == 'stackoverflow':
-            score += problem.get('score', 0)
-            score += problem.get('answer_count', 0) * 3
-            score += problem.get('view_count', 0) // 100
-        elif problem.get('source') == 'github':
-            score += problem.get('comments', 0) * 2
+        for problem in problems:
+            self.accumulate(state, self.prepare_problem(problem))
         
-        return score
+        return self.finalize(state)
+    
+    def _calculate_engagement(self, problem: Dict) -> int:
+        """Calculate engagement score for a problem."""
+        return calculate_engagement(problem)
     
     def _group_similar_problems(self, problems: List[Dict]) -> List[Dict]:
         """Group similar problems together."""
         grouped = {}
         
         for problem in problems:
-            # Use first 3 keywords as a signature (less strict for better grouping)
-            signature = ' '.join(sorted(problem['keywords'][:3]))
-            
-            if signature in grouped:
-                grouped[signature]['count'] += 1
-                grouped[signature]['total_engagement'] += problem['engagement']
-                grouped[signature]['examples'].append({
+            self._add_to_group(grouped, problem)
+        
+        return list(grouped.values())
+    
+    def _add_to_group(self, grouped: Dict, problem: Dict, max_examples: Optional[int] = None):
+        """Add a problem to its group, creating the group on first sight."""
+        # Use first 3 keywords as a signature (less strict for better grouping)
+        signature = ' '.join(sorted(problem['keywords'][:3]))
+        
+        if signature in grouped:
+            grouped[signature]['count'] += 1
+            grouped[signature]['total_engagement'] += problem['engagement']
+            if max_examples is not None and len(grouped[signature]['examples']) >= max_examples:
+                return
+            grouped[signature]['examples'].append({
+                'title': problem['title'],
+                'url': problem['url'],
+                'source': problem['source']
+            })
+        else:
+            grouped[signature] = {
+                'title': problem['title'],
+                'keywords': problem['keywords'][:3],
+                'category': problem['category'],
+                'count': 1,
+                'total_engagement': problem['engagement'],
+                'examples': [{
                     'title': problem['title'],
                     'url': problem['url'],
                     'source': problem['source']
-                })
-            else:
-                grouped[signature] = {
-                    'title': problem['title'],
-                    'keywords': problem['keywords'][:3],
-                    'category': problem['category'],
-                    'count': 1,
-                    'total_engagement': problem['engagement'],
-                    'examples': [{
-                        'title': problem['title'],
-                        'url': problem['url'],
-                        'source': problem['source']
-                    }]
-                }
-        
-        return list(grouped.values())
+                }]
+            }
     
     def _rank_problems(self, grouped_problems: List[Dict]) -> List[Dict]:
         """Rank problems by frequency and engagement."""
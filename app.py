@@ -1,12 +1,19 @@
 """
 Web application for displaying problem analysis results.
 """
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request, stream_with_context
 import json
 import os
-from datetime import datetime
-from scraper import scrape_all_sources
+from scraper import scrape_all_sources, create_session
+from hedging import HedgedSession
 from analyzer import ProblemAnalyzer
+from pipeline import ScrapePipeline
+from preview import PreviewAnalyzer
+from dedup import create_deduplicator
+from snapshot import Snapshot, load_snapshot
+from store import create_store
+from diff import diff_analyses
+from export import GROUP_FIELDS, PROBLEM_FIELDS, group_rows, iter_chunks, iter_csv, iter_ndjson
 
 
 app = Flask(__name__)
@@ -15,9 +22,11 @@ app = Flask(__name__)
 with open('config.json', 'r') as f:
     config = json.load(f)
 
-# Global storage for analysis results
-latest_analysis = None
-latest_scrape_time = None
+# Analysis results, published as immutable versioned snapshots. Readers
+# take one reference to the current snapshot and never lock. With
+# server.shared_snapshot enabled the snapshot lives in a memory-mapped file
+# shared by every worker process.
+store = create_store(config)
 
 
 @app.route('/')
@@ -29,38 +38,77 @@ def index():
 @app.route('/api/scrape', methods=['POST'])
 def scrape():
     """Trigger a new scraping operation."""
-    global latest_analysis, latest_scrape_time
-    
     try:
-        # Check if demo data exists (for when external APIs are not accessible)
+        # Check if demo data exists (for when external APIs are not accessible).
+        # The compact snapshot is memory-mapped once and decoded lazily.
+        if os.path.exists('demo_data.snap'):
+            published = store.publish(load_snapshot('demo_data.snap'))
+            return jsonify({
+                'success': True,
+                'message': f'Loaded demo snapshot with {published.analysis["total_problems"]} problems',
+                'timestamp': published.timestamp,
+                'version': published.version
+            })
+
         if os.path.exists('demo_data.json'):
             print("Loading demo data...")
             with open('demo_data.json', 'r') as f:
                 demo_data = json.load(f)
-                latest_analysis = demo_data['analysis']
-                latest_scrape_time = datetime.now().isoformat()
+                published = store.publish(demo_data['analysis'])
                 return jsonify({
                     'success': True,
-                    'message': f'Loaded demo data with {latest_analysis["total_problems"]} problems',
-                    'timestamp': latest_scrape_time
+                    'message': f'Loaded demo data with {published.analysis["total_problems"]} problems',
+                    'timestamp': published.timestamp,
+                    'version': published.version
                 })
         
-        # Scrape all sources
-        problems = scrape_all_sources(config)
+        # Scrape all sources (live, recording or replaying per config)
+        preview = request.args.get('preview', '').lower() in ('1', 'true', 'yes')
+        previewer = None
+        problems = None
+        session = create_session(config)
+        deduplicator = create_deduplicator(config)
+        try:
+            if preview:
+                # Estimate from a stratified sample now, refine in the background
+                problems = scrape_all_sources(config, session=session,
+                                              deduplicator=deduplicator)
+                previewer = PreviewAnalyzer(config)
+                analysis = previewer.run(problems)
+            elif config.get('scraping', {}).get('pipeline', {}).get('enabled', False):
+                # Analyze pages while the remaining sources are still fetching
+                pipeline = ScrapePipeline(config, session, deduplicator=deduplicator)
+                analysis = pipeline.run()
+                if pipeline.keep_problems:
+                    problems = pipeline.problems
+            else:
+                problems = scrape_all_sources(config, session=session,
+                                              deduplicator=deduplicator)
+                
+                # Analyze problems
+                analyzer = ProblemAnalyzer(config)
+                analysis = analyzer.analyze_problems(problems)
+        finally:
+            session.close()
         
-        # Analyze problems
-        analyzer = ProblemAnalyzer(config)
-        analysis = analyzer.analyze_problems(problems)
+        # Publish results (single atomic swap of analysis + timestamp); the
+        # raw problems are kept with them for /api/export/problems
+        published = store.publish(analysis, problems=problems)
         
-        # Store results
-        latest_analysis = analysis
-        latest_scrape_time = datetime.now().isoformat()
-        
-        return jsonify({
+        result = {
             'success': True,
-            'message': f'Scraped {len(problems)} problems',
-            'timestamp': latest_scrape_time
-        })
+            'message': f'Scraped {analysis["total_problems"]} problems',
+            'timestamp': published.timestamp,
+            'version': published.version
+        }
+        if previewer is not None:
+            previewer.refine_in_background(problems, store, published.version)
+            result['preview'] = analysis['preview']
+        if deduplicator is not None:
+            result['dedup'] = deduplicator.stats
+        if isinstance(session, HedgedSession):
+            result['http'] = session.metrics()
+        return jsonify(result)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -71,80 +119,264 @@ def scrape():
 @app.route('/api/analysis')
 def get_analysis():
     """Get the latest analysis results."""
-    if latest_analysis is None:
+    snapshot = store.current()
+    if snapshot.empty:
         return jsonify({
             'error': 'No analysis available. Please run scrape first.'
         }), 404
     
+    analysis = snapshot.analysis
     return jsonify({
-        'analysis': latest_analysis,
-        'timestamp': latest_scrape_time
+        'analysis': (analysis.to_dict() if isinstance(analysis, Snapshot)
+                     else analysis),
+        'timestamp': snapshot.timestamp,
+        'version': snapshot.version
     })
 
 
 @app.route('/api/top-problems')
 def get_top_problems():
     """Get the top problems."""
-    if latest_analysis is None:
+    snapshot = store.current()
+    if snapshot.empty:
         return jsonify({
             'error': 'No analysis available. Please run scrape first.'
         }), 404
     
+    analysis = snapshot.analysis
     limit = request.args.get('limit', 50, type=int)
-    top_problems = latest_analysis.get('top_problems', [])[:limit]
+    top_problems = analysis.get('top_problems', [])[:limit]
     
     return jsonify({
         'top_problems': top_problems,
         'total': len(top_problems),
-        'timestamp': latest_scrape_time
+        'timestamp': snapshot.timestamp,
+        'version': snapshot.version
     })
 
 
 @app.route('/api/categories')
 def get_categories():
     """Get problem categories breakdown."""
-    if latest_analysis is None:
+    snapshot = store.current()
+    if snapshot.empty:
+        return jsonify({
+            'error': 'No analysis available. Please run scrape first.'
+        }), 404
+    
+    analysis = snapshot.analysis
+    return jsonify({
+        'categories': analysis.get('categories', {}),
+        'timestamp': snapshot.timestamp,
+        'version': snapshot.version
+    })
+
+
+def _cube_cell(cells: dict, name: str):
+    """Look up a group-by cell by exact, then case-insensitive, name."""
+    if name in cells:
+        return cells[name]
+    # Iterate names only: snapshot-backed cells are decoded on access
+    for key in cells:
+        if key.lower() == name.lower():
+            return cells[key]
+    return None
+
+
+@app.route('/api/categories/<name>/analysis')
+def get_category_analysis(name):
+    """Get the precomputed analysis of one category (optionally ?source=)."""
+    snapshot = store.current()
+    if snapshot.empty:
+        return jsonify({
+            'error': 'No analysis available. Please run scrape first.'
+        }), 404
+    
+    cubes = snapshot.analysis.get('cubes', {})
+    source = request.args.get('source')
+    if source:
+        cell = _cube_cell(_cube_cell(cubes.get('category_source', {}), name) or {}, source)
+    else:
+        cell = _cube_cell(cubes.get('category', {}), name)
+    if cell is None:
+        return jsonify({
+            'error': f'No analysis for category {name}'
+        }), 404
+    
+    return jsonify({
+        'category': name,
+        'source': source,
+        'analysis': cell,
+        'timestamp': snapshot.timestamp,
+        'version': snapshot.version
+    })
+
+
+@app.route('/api/sources/<name>/analysis')
+def get_source_analysis(name):
+    """Get the precomputed analysis of one source."""
+    snapshot = store.current()
+    if snapshot.empty:
         return jsonify({
             'error': 'No analysis available. Please run scrape first.'
         }), 404
     
+    cell = _cube_cell(snapshot.analysis.get('cubes', {}).get('source', {}), name)
+    if cell is None:
+        return jsonify({
+            'error': f'No analysis for source {name}'
+        }), 404
+    
     return jsonify({
-        'categories': latest_analysis.get('categories', {}),
-        'timestamp': latest_scrape_time
+        'source': name,
+        'analysis': cell,
+        'timestamp': snapshot.timestamp,
+        'version': snapshot.version
     })
 
 
 @app.route('/api/keywords')
 def get_keywords():
     """Get top keywords."""
-    if latest_analysis is None:
+    snapshot = store.current()
+    if snapshot.empty:
         return jsonify({
             'error': 'No analysis available. Please run scrape first.'
         }), 404
     
+    analysis = snapshot.analysis
     limit = request.args.get('limit', 50, type=int)
-    keywords = latest_analysis.get('top_keywords', [])[:limit]
+    keywords = analysis.get('top_keywords', [])[:limit]
     
-    return jsonify({
+    result = {
         'keywords': keywords,
-        'timestamp': latest_scrape_time
+        'timestamp': snapshot.timestamp,
+        'version': snapshot.version
+    }
+    # Only present when keywords are counted by an approximate sketch
+    error_bound = analysis.get('keyword_error_bound')
+    if error_bound is not None:
+        result['error_bound'] = error_bound
+    return jsonify(result)
+
+
+def _parse_version(value):
+    """Parse a version given as ``3`` or ``v3``."""
+    if value is None:
+        return None
+    value = value.strip().lower()
+    return int(value[1:] if value.startswith('v') else value)
+
+
+@app.route('/api/diff')
+def get_diff():
+    """Get what changed between two analysis versions (?from=&to=)."""
+    try:
+        from_version = _parse_version(request.args.get('from'))
+        to_version = _parse_version(request.args.get('to'))
+    except ValueError:
+        return jsonify({
+            'error': 'Versions must be integers, e.g. ?from=3&to=5'
+        }), 400
+    if from_version is None:
+        return jsonify({
+            'error': 'Missing from version'
+        }), 400
+    
+    new = store.current() if to_version is None else store.get(to_version)
+    old = store.get(from_version)
+    if new is None or new.empty or old is None:
+        return jsonify({
+            'error': 'Version not available; only recent versions are retained.'
+        }), 404
+    
+    limit = request.args.get('keywords', 50, type=int)
+    return jsonify({
+        'from': old.version,
+        'to': new.version,
+        'from_timestamp': old.timestamp,
+        'to_timestamp': new.timestamp,
+        'diff': diff_analyses(old.analysis, new.analysis, keyword_limit=limit)
     })
 
 
+def _export_response(rows, fields, name, version):
+    """Stream rows as NDJSON (default) or CSV (?format=csv), gzipped with ?gzip=1."""
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format == 'csv':
+        requested = request.args.get('fields')
+        lines = iter_csv(rows, requested.split(',') if requested else fields)
+        mimetype, extension = 'text/csv', 'csv'
+    elif export_format == 'ndjson':
+        lines = iter_ndjson(rows)
+        mimetype, extension = 'application/x-ndjson', 'ndjson'
+    else:
+        return jsonify({
+            'error': 'format must be ndjson or csv'
+        }), 400
+    
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    response = Response(stream_with_context(iter_chunks(lines, compress)), mimetype=mimetype)
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename="{name}-v{version}.{extension}"')
+    response.headers['X-Analysis-Version'] = str(version)
+    return response
+
+
+@app.route('/api/export/problems')
+def export_problems():
+    """Stream the raw problems behind the latest analysis."""
+    snapshot = store.current()
+    if snapshot.empty:
+        return jsonify({
+            'error': 'No analysis available. Please run scrape first.'
+        }), 404
+    if snapshot.problems is None:
+        return jsonify({
+            'error': 'Raw problems were not retained for this analysis.'
+        }), 404
+    
+    return _export_response(iter(snapshot.problems), PROBLEM_FIELDS, 'problems',
+                            snapshot.version)
+
+
+@app.route('/api/export/groups')
+def export_groups():
+    """Stream the ranked problem groups of the latest analysis.
+    
+    Only the ranked groups the analysis keeps are exported: at most
+    ``top_problems_count`` groups with at least ``min_problem_mentions``
+    problems each, not every group.
+    """
+    snapshot = store.current()
+    if snapshot.empty:
+        return jsonify({
+            'error': 'No analysis available. Please run scrape first.'
+        }), 404
+    
+    groups = snapshot.analysis.get('top_problems', [])
+    return _export_response(group_rows(groups), GROUP_FIELDS, 'groups', snapshot.version)
+
+
 @app.route('/api/stats')
 def get_stats():
     """Get overall statistics."""
-    if latest_analysis is None:
+    snapshot = store.current()
+    if snapshot.empty:
         return jsonify({
             'error': 'No analysis available. Please run scrape first.'
         }), 404
     
+    analysis = snapshot.analysis
     return jsonify({
-        'total_problems': latest_analysis.get('total_problems', 0),
-        'sources': latest_analysis.get('sources', {}),
-        'categories_count': len(latest_analysis.get('categories', {})),
-        'top_problems_count': len(latest_analysis.get('top_problems', [])),
-        'timestamp': latest_scrape_time
+        'total_problems': analysis.get('total_problems', 0),
+        'sources': analysis.get('sources', {}),
+        'categories_count': len(analysis.get('categories', {})),
+        'top_problems_count': len(analysis.get('top_problems', [])),
+        'timestamp': snapshot.timestamp,
+        'version': snapshot.version
     })
 
 
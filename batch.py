@@ -0,0 +1,272 @@
+"""
+Headless batch analysis of JSONL problem dumps.
+
+Streams problems (one JSON object per line) from plain or gzipped JSONL
+files, or stdin, through ``ProblemAnalyzer`` without the web server. Input
+is cut into chunks of ``--chunk-size`` lines; worker processes prepare and
+accumulate each chunk into its own ``AnalysisState`` and the states are
+merged in input order, so the result equals a sequential pass. At most
+``--memory-limit`` MB of raw input is in flight at a time.
+
+The limit covers raw input only. The merged state, and so each checkpoint,
+grows with the number of distinct problem groups and, unless
+``analysis.keyword_sketch`` is enabled, with the keyword vocabulary; group
+examples are capped at ``--group-examples``. Titles and bodies are cut to
+``scraping.limits`` (``max_title_chars``, ``max_text_chars``) like scraped
+ones, so one huge record cannot stall a worker.
+
+With ``--checkpoint`` the merged state and the input position are saved
+every ``--checkpoint-every`` chunks; ``--resume`` continues from there after
+an interruption.
+
+Usage:
+    python batch.py dump-*.jsonl.gz --workers 8 --output analysis.snap
+    zcat dump.jsonl.gz | python batch.py - --output analysis.json
+    python batch.py big.jsonl --checkpoint big.ckpt --resume --output big.snap
+"""
+import gzip
+import json
+import os
+import pickle
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from analyzer import AnalysisState, ProblemAnalyzer
+from jsonstream import truncate_text
+
+
+CHECKPOINT_VERSION = 1
+
+# Analyzer of the current worker process, built once by the pool initializer
+_analyzer: Optional[ProblemAnalyzer] = None
+# Character caps per text field, from scraping.limits
+_field_limits: Dict[str, Optional[int]] = {}
+
+
+def _init_worker(config: dict, group_examples: Optional[int] = None):
+    global _analyzer, _field_limits
+    _analyzer = ProblemAnalyzer(config)
+    _analyzer.group_examples = group_examples
+    limits = config.get('scraping', {}).get('limits', {})
+    _field_limits = {'title': limits.get('max_title_chars'),
+                     'text': limits.get('max_text_chars'),
+                     'comments_text': limits.get('max_text_chars')}
+
+
+def analyze_chunk(lines: List[bytes]) -> Tuple[AnalysisState, int]:
+    """Accumulate one chunk of JSONL lines; returns its state and bad-line count."""
+    state = _analyzer.new_state()
+    bad = 0
+    for line in lines:
+        try:
+            problem = json.loads(line)
+        except ValueError:
+            bad += 1
+            continue
+        if not isinstance(problem, dict):
+            bad += 1
+            continue
+        for field, limit in _field_limits.items():
+            if isinstance(problem.get(field), str):
+                problem[field] = truncate_text(problem[field], limit)
+        _analyzer.accumulate(state, _analyzer.prepare_problem(problem))
+    return state, bad
+
+
+def _open_input(path: str):
+    if path == '-':
+        return sys.stdin.buffer
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def read_chunks(paths: List[str], chunk_size: int, start: Tuple[int, int] = (0, 0)
+                ) -> Iterator[Tuple[List[bytes], int, int, int]]:
+    """Yield ``(lines, size, file_index, end_offset)`` for each chunk.
+
+    ``end_offset`` is the (uncompressed) byte offset just past the chunk in
+    file ``file_index``; a chunk never spans two files. ``start`` is a
+    ``(file_index, offset)`` position to resume from.
+    """
+    start_index, start_offset = start
+    for index in range(start_index, len(paths)):
+        stream = _open_input(paths[index])
+        try:
+            offset = start_offset if index == start_index else 0
+            if offset:
+                stream.seek(offset)
+            lines, size = [], 0
+            for line in stream:
+                offset += len(line)
+                if not line.strip():
+                    continue
+                lines.append(line)
+                size += len(line)
+                if len(lines) >= chunk_size:
+                    yield lines, size, index, offset
+                    lines, size = [], 0
+            if lines:
+                yield lines, size, index, offset
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+
+def save_checkpoint(path: str, paths: List[str], position: Tuple[int, int],
+                    state: AnalysisState, stats: Dict):
+    """Atomically write the merged state and the input position reached."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'version': CHECKPOINT_VERSION, 'inputs': paths, 'position': position,
+                     'state': state, 'stats': stats}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str, paths: List[str]) -> Dict:
+    with open(path, 'rb') as f:
+        checkpoint = pickle.load(f)
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {checkpoint.get('version')}")
+    if checkpoint['inputs'] != paths:
+        raise ValueError("Checkpoint was written for different input files")
+    return checkpoint
+
+
+class BatchAnalyzer:
+    """Analyzes JSONL inputs in parallel chunks with bounded memory."""
+
+    def __init__(self, config: dict, workers: int = 1, chunk_size: int = 5000,
+                 memory_limit_mb: float = 512, checkpoint: Optional[str] = None,
+                 checkpoint_every: int = 20, group_examples: Optional[int] = 10):
+        self.config = config
+        self.group_examples = group_examples
+        self.workers = max(1, workers)
+        self.chunk_size = max(1, chunk_size)
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+        self.checkpoint = checkpoint
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.stats = {'chunks': 0, 'lines': 0, 'bad_lines': 0, 'bytes': 0}
+
+    def run(self, paths: List[str], resume: bool = False) -> Dict:
+        """Analyze every problem in ``paths`` and return the analysis."""
+        analyzer = ProblemAnalyzer(self.config)
+        analyzer.group_examples = self.group_examples
+        state = analyzer.new_state()
+        position = (0, 0)
+        if resume and self.checkpoint and os.path.exists(self.checkpoint):
+            if '-' in paths:
+                raise ValueError("Cannot resume when reading from stdin")
+            saved = load_checkpoint(self.checkpoint, paths)
+            state, position, self.stats = saved['state'], tuple(saved['position']), saved['stats']
+            print(f"Resuming after {self.stats['lines']} lines "
+                  f"(file {position[0] + 1}/{len(paths)}, offset {position[1]})")
+
+        started = time.perf_counter()
+        chunks = read_chunks(paths, self.chunk_size, position)
+        if self.workers == 1:
+            _init_worker(self.config, self.group_examples)
+            for lines, size, index, end in chunks:
+                self._merge(state, analyze_chunk(lines), len(lines), size, (index, end), paths)
+        else:
+            import multiprocessing
+            with multiprocessing.Pool(self.workers, _init_worker,
+                                      (self.config, self.group_examples)) as pool:
+                self._run_pool(pool, chunks, state, paths)
+
+        if self.checkpoint:
+            save_checkpoint(self.checkpoint, paths, (len(paths), 0), state, self.stats)
+        elapsed = time.perf_counter() - started
+        print(f"Analyzed {self.stats['lines']} lines in {elapsed:.1f}s "
+              f"({self.stats['bad_lines']} unparseable)")
+        return analyzer.finalize(state)
+
+    def _run_pool(self, pool, chunks, state: AnalysisState, paths: List[str]):
+        # Results are merged strictly in submission order; submission stops
+        # while the raw input of unmerged chunks exceeds the memory limit
+        in_flight = deque()
+        in_flight_bytes = 0
+        for lines, size, index, end in chunks:
+            while in_flight and (in_flight_bytes + size > self.memory_limit
+                                 or len(in_flight) >= 2 * self.workers):
+                result, count, done_size, done_position = in_flight.popleft()
+                in_flight_bytes -= done_size
+                self._merge(state, result.get(), count, done_size, done_position, paths)
+            in_flight.append((pool.apply_async(analyze_chunk, (lines,)),
+                              len(lines), size, (index, end)))
+            in_flight_bytes += size
+        while in_flight:
+            result, count, done_size, done_position = in_flight.popleft()
+            self._merge(state, result.get(), count, done_size, done_position, paths)
+
+    def _merge(self, state: AnalysisState, result: Tuple[AnalysisState, int], lines: int,
+               size: int, position: Tuple[int, int], paths: List[str]):
+        chunk_state, bad = result
+        state.merge(chunk_state)
+        self.stats['chunks'] += 1
+        self.stats['lines'] += lines
+        self.stats['bad_lines'] += bad
+        self.stats['bytes'] += size
+
+        if self.stats['chunks'] % self.checkpoint_every == 0:
+            print(f"{self.stats['lines']} lines, {self.stats['bytes'] / 1e6:.1f} MB processed")
+            if self.checkpoint and '-' not in paths:
+                save_checkpoint(self.checkpoint, paths, position, state, self.stats)
+
+
+def write_analysis(path: str, analysis: Dict):
+    """Write the analysis as a ``.snap`` snapshot or demo_data-style JSON."""
+    timestamp = datetime.now().isoformat()
+    if path.endswith('.snap'):
+        from snapshot import write_snapshot
+        write_snapshot(path, analysis, timestamp=timestamp)
+    else:
+        with open(path, 'w') as f:
+            json.dump({'analysis': analysis, 'timestamp': timestamp}, f)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Analyze JSONL problem dumps offline.')
+    parser.add_argument('inputs', nargs='+', help="JSONL or .jsonl.gz files, or '-' for stdin")
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--output', default='analysis.json',
+                        help='Write the analysis to this .json or .snap file')
+    parser.add_argument('--workers', type=int, help='Worker processes')
+    parser.add_argument('--chunk-size', type=int, help='Lines per chunk')
+    parser.add_argument('--memory-limit', type=float,
+                        help='MB of raw input allowed in flight at once (the merged '
+                             'state is not covered)')
+    parser.add_argument('--group-examples', type=int,
+                        help='Examples kept per problem group')
+    parser.add_argument('--checkpoint', help='Checkpoint file for resumable runs')
+    parser.add_argument('--checkpoint-every', type=int, help='Chunks between checkpoints')
+    parser.add_argument('--resume', action='store_true', help='Continue from --checkpoint')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = json.load(f)
+    batch_config = config.get('analysis', {}).get('batch', {})
+
+    def option(value, key, default):
+        return value if value is not None else batch_config.get(key, default)
+
+    batch = BatchAnalyzer(
+        config,
+        workers=option(args.workers, 'workers', os.cpu_count() or 1),
+        chunk_size=option(args.chunk_size, 'chunk_size', 5000),
+        memory_limit_mb=option(args.memory_limit, 'memory_limit_mb', 512),
+        checkpoint=args.checkpoint,
+        checkpoint_every=option(args.checkpoint_every, 'checkpoint_every', 20),
+        group_examples=option(args.group_examples, 'group_examples', 10),
+    )
+    try:
+        analysis = batch.run(args.inputs, resume=args.resume)
+    except ValueError as e:
+        parser.error(str(e))
+    write_analysis(args.output, analysis)
+    print(f"Wrote {analysis['total_problems']} problems to {args.output}")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Benchmark the text preprocessing stage of the analyzer.
+
+Runs ``ProblemAnalyzer.prepare_problem`` over the same documents with
+preprocessing off and on, and reports:
+  - analyzer time per document (preprocessing included when on)
+  - characters reaching the tokenizer per document
+  - the top keywords of both runs, to show identifiers dropping out
+
+Documents are synthetic issue/post bodies full of code fences, stack
+traces, logs and markup, or problems read from a JSONL dump.
+
+Usage:
+    python bench_preprocess.py [--docs N] [--repeat N] [--input dump.jsonl]
+"""
+import argparse
+import copy
+import json
+import random
+import time
+from collections import Counter
+
+from analyzer import ProblemAnalyzer
+
+
+PROSE = ("after upgrading the login flow fails with an invalid token error when the "
+         "session expires and users are redirected back to the dashboard").split()
+
+CODE = '''```js
+const token = await fetchToken(clientId, clientSecret);
+axios.interceptors.request.use(cfg => { cfg.headers.Authorization = `Bearer ${token}`; return cfg; });
+export default function useAuth() { const [user, setUser] = useState(null); return { user, setUser }; }
+```
+'''
+
+TRACE = '''Traceback (most recent call last):
+  File "/srv/app/auth/views.py", line 88, in refresh_token
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+  File "/usr/lib/python3/site-packages/jwt/api_jwt.py", line 119, in decode
+    decoded = self.decode_complete(jwt, key, algorithms, options)
+jwt.exceptions.ExpiredSignatureError: Signature has expired
+'''
+
+LOGS = '''2024-03-02 10:15:01,223 INFO  [http-nio-8080-exec-4] o.s.web.servlet.DispatcherServlet : Completed initialization
+2024-03-02 10:15:02,871 WARN  [http-nio-8080-exec-7] c.e.auth.TokenFilter : token refresh took 2312ms
+2024-03-02 10:15:03,002 ERROR [http-nio-8080-exec-7] c.e.auth.TokenFilter : refresh failed for sessionId=8f2c1e
+'''
+
+MARKUP = ('See <a href="https://example.com/docs/auth#refresh">the docs</a> and '
+          '[this issue](https://github.com/example/app/issues/1234) &amp; '
+          '`refreshToken()` for details.\n')
+
+
+def generate_problems(count: int, seed: int = 11):
+    """Build problems whose bodies mix prose with code, traces, logs and markup."""
+    rng = random.Random(seed)
+    problems = []
+    for i in range(count):
+        parts = [' '.join(rng.choices(PROSE, k=40)) + '\n']
+        for block in rng.choices([CODE, TRACE, LOGS, MARKUP], k=rng.randint(3, 8)):
+            parts.append(block)
+            parts.append(' '.join(rng.choices(PROSE, k=15)) + '\n')
+        problems.append({
+            'source': rng.choice(['github', 'reddit', 'stackoverflow']),
+            'title': ' '.join(rng.choices(PROSE, k=8)),
+            'text': ''.join(parts),
+            'url': f'https://example.com/{i}',
+            'score': rng.randint(0, 100),
+        })
+    return problems
+
+
+def run_benchmark(problems, repeat: int):
+    config = {'analysis': {'preprocess': {'enabled': False}}}
+    results = {}
+    for label, enabled in (('raw', False), ('preprocessed', True)):
+        config['analysis']['preprocess']['enabled'] = enabled
+        analyzer = ProblemAnalyzer(copy.deepcopy(config))
+
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            prepared = [analyzer.prepare_problem(problem) for problem in problems]
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+
+        chars = sum(len(analyzer.preprocess_problem(problem).get('text', ''))
+                    for problem in problems)
+        keywords = Counter()
+        for item in prepared:
+            keywords.update(item['keywords'])
+        results[label] = (best, chars, keywords)
+
+    print(f"{len(problems)} documents, best of {repeat}")
+    for label, (best, chars, _) in results.items():
+        print(f"  {label:<13} {best * 1000 / len(problems):8.3f} ms/doc   "
+              f"{chars / len(problems):9.0f} chars/doc")
+    speedup = results['raw'][0] / results['preprocessed'][0]
+    print(f"  speedup       {speedup:8.2f}x")
+
+    for label, (_, _, keywords) in results.items():
+        top = ', '.join(term for term, _ in keywords.most_common(15))
+        print(f"  top keywords ({label}): {top}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark analyzer text preprocessing.')
+    parser.add_argument('--docs', type=int, default=2000, help='Synthetic documents')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--input', help='Benchmark problems from this JSONL file instead')
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, 'r') as f:
+            data = [json.loads(line) for line in f if line.strip()]
+    else:
+        data = generate_problems(args.docs)
+    run_benchmark(data, args.repeat)
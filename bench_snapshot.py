@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+Benchmark the compact snapshot format against the indented JSON demo file.
+
+Compares file size and load time for:
+  - json.load of the indented JSON file (what app.py used to do per request)
+  - opening a snapshot and reading only the stats header
+  - opening a snapshot and decoding the top problems
+  - fully decoding a snapshot into a plain dict
+
+Usage:
+    python bench_snapshot.py [--groups N] [--examples N] [--repeat N]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from snapshot import Snapshot, write_snapshot
+
+
+def generate_analysis(groups: int, examples: int, seed: int = 7) -> dict:
+    """Build a synthetic analysis dict shaped like analyze_problems output."""
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(2000)]
+    categories = ['Authentication', 'Database', 'API', 'Frontend', 'Backend',
+                  'Deployment', 'Performance', 'Error Handling', 'Testing', 'Security']
+    sources = ['reddit', 'stackoverflow', 'github']
+
+    top_problems = []
+    for i in range(groups):
+        keywords = rng.sample(vocabulary, 3)
+        count = rng.randint(2, examples)
+        engagement = rng.randint(0, 5000)
+        top_problems.append({
+            'title': f"Problem {i}: {' '.join(keywords)} keeps failing in production",
+            'keywords': keywords,
+            'category': rng.choice(categories),
+            'count': count,
+            'total_engagement': engagement,
+            'examples': [{
+                'title': f"Report {j} of problem {i}",
+                'url': f"https://example.com/{rng.choice(sources)}/{i}/{j}",
+                'source': rng.choice(sources),
+            } for j in range(count)],
+            'priority': count * 10 + engagement / 10,
+            'users_affected': count,
+        })
+
+    return {
+        'total_problems': groups * examples,
+        'top_problems': top_problems,
+        'top_keywords': [(term, rng.randint(1, 1000)) for term in vocabulary[:50]],
+        'categories': {c: rng.randint(1, 1000) for c in categories},
+        'sources': {s: rng.randint(1, 1000) for s in sources},
+    }
+
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_benchmark(analysis: dict, repeat: int):
+    workdir = tempfile.mkdtemp(prefix='snapshot-bench-')
+    json_path = os.path.join(workdir, 'analysis.json')
+    snap_path = os.path.join(workdir, 'analysis.snap')
+    raw_path = os.path.join(workdir, 'analysis-raw.snap')
+
+    with open(json_path, 'w') as f:
+        json.dump({'analysis': analysis, 'timestamp': 'bench'}, f, indent=2)
+    write_snapshot(snap_path, analysis, timestamp='bench')
+    write_snapshot(raw_path, analysis, timestamp='bench', compress=False)
+
+    def load_json():
+        with open(json_path, 'r') as f:
+            json.load(f)['analysis']['top_problems']
+
+    def snapshot_stats(path):
+        snap = Snapshot.open(path)
+        snap['total_problems']
+        snap.close()
+
+    def snapshot_top(path):
+        snap = Snapshot.open(path)
+        snap['top_problems']
+        snap.close()
+
+    def snapshot_full(path):
+        snap = Snapshot.open(path)
+        snap.to_dict()
+        snap.close()
+
+    print(f"{'format':<28}{'size (KB)':>12}")
+    for label, path in (('JSON (indent=2)', json_path),
+                        ('snapshot (zlib)', snap_path),
+                        ('snapshot (raw, mmap)', raw_path)):
+        print(f"{label:<28}{os.path.getsize(path) / 1024:>12.1f}")
+
+    print(f"\n{'load path':<40}{'best (ms)':>12}")
+    rows = [('json.load (full file)', load_json)]
+    for label, path in (('zlib', snap_path), ('raw', raw_path)):
+        rows.append((f'snapshot {label}: stats only', lambda p=path: snapshot_stats(p)))
+        rows.append((f'snapshot {label}: top_problems', lambda p=path: snapshot_top(p)))
+        rows.append((f'snapshot {label}: full decode', lambda p=path: snapshot_full(p)))
+    for label, func in rows:
+        print(f"{label:<40}{best_of(repeat, func) * 1000:>12.3f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark snapshot vs JSON loading.')
+    parser.add_argument('--groups', type=int, default=5000,
+                        help='Number of synthetic top-problem groups')
+    parser.add_argument('--examples', type=int, default=20,
+                        help='Maximum examples per group')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--demo', action='store_true',
+                        help='Benchmark demo_data.json instead of synthetic data')
+    args = parser.parse_args()
+
+    if args.demo:
+        with open('demo_data.json', 'r') as f:
+            data = json.load(f)['analysis']
+    else:
+        data = generate_analysis(args.groups, args.examples)
+    run_benchmark(data, args.repeat)
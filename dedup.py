@@ -0,0 +1,217 @@
+"""
+Ingest-time deduplication of scraped problems.
+
+The same issue is often scraped several times: cross-posted to several
+subreddits, listed under several Stack Overflow tags, or carrying several
+GitHub labels. Duplicates are detected before analysis by
+
+  - canonical URL: scheme/host/path normalized per source, tracking
+    parameters and fragments dropped, and
+  - content fingerprint: a 64-bit hash of the normalized title and text,
+    which also catches cross-posts that live at different URLs.
+
+Seen keys are kept in a set of 64-bit integers, or in a Bloom filter of
+fixed size for very large corpora (with a configurable false-positive rate).
+"""
+import hashlib
+import math
+import re
+import threading
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+# Query parameters that never change what a URL points to
+TRACKING_PARAMS = {
+    'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content',
+    'ref', 'ref_source', 'ref_campaign', 'share_id', 'context', 'sort',
+    'answertab', 'noredirect', 'rdt',
+}
+
+_HOST_ALIASES = {
+    'old.reddit.com': 'reddit.com',
+    'new.reddit.com': 'reddit.com',
+    'np.reddit.com': 'reddit.com',
+    'm.reddit.com': 'reddit.com',
+    'redd.it': 'reddit.com',
+}
+
+_REDDIT_COMMENTS = re.compile(r'^(?:/r/[^/]+)?/comments/([a-z0-9]+)')
+_STACKOVERFLOW_QUESTION = re.compile(r'^/(?:questions|q)/(\d+)')
+_GITHUB_ISSUE = re.compile(r'^/([^/]+)/([^/]+)/(issues|pull)/(\d+)')
+
+_CROSSPOST_MARKERS = re.compile(r'\b(?:x-?post(?:ed)?|cross-?post(?:ed)?)\b(?:\s+(?:from|to))?(?:\s+/?r/\w+)?')
+_URLS = re.compile(r'https?://\S+|www\.\S+')
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a problem URL so that equivalent links compare equal."""
+    if not url:
+        return ''
+
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    host = _HOST_ALIASES.get(host, host)
+    path = parts.path.rstrip('/') or '/'
+
+    if host == 'reddit.com':
+        match = _REDDIT_COMMENTS.match(path.lower())
+        if match:
+            path = f"/comments/{match.group(1)}"
+    elif host == 'stackoverflow.com':
+        match = _STACKOVERFLOW_QUESTION.match(path)
+        if match:
+            path = f"/questions/{match.group(1)}"
+    elif host == 'github.com':
+        match = _GITHUB_ISSUE.match(path)
+        if match:
+            owner, repo, kind, number = match.groups()
+            path = f"/{owner.lower()}/{repo.lower()}/{kind}/{number}"
+
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query)
+        if key.lower() not in TRACKING_PARAMS
+    ))
+    return urlunsplit(('https', host, path, query, ''))
+
+
+def normalize_content(problem: Dict) -> str:
+    """Reduce a problem's title and text to a canonical word sequence."""
+    text = f"{problem.get('title') or ''} {problem.get('text') or ''}".lower()
+    text = _URLS.sub(' ', text)
+    text = _CROSSPOST_MARKERS.sub(' ', text)
+    return _NON_WORD.sub(' ', text).strip()
+
+
+def fingerprint(value: str) -> int:
+    """64-bit fingerprint of a string."""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 64-bit fingerprints."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: int):
+        # Kirsch-Mitzenmacher double hashing from the two 32-bit halves
+        h1, h2 = key & 0xFFFFFFFF, (key >> 32) | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: int) -> bool:
+        """Add a key; returns True if it was (probably) already present."""
+        present = True
+        for position in self._positions(key):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                present = False
+                self.bits[byte] |= 1 << bit
+        return present
+
+
+class Deduplicator:
+    """Drops or merges duplicate problems as they are ingested.
+
+    Thread-safe, so pipeline workers can share one instance. In ``merge``
+    mode the first copy of a problem is kept and later copies are recorded
+    in its ``duplicates`` list; ``drop`` mode simply discards them.
+    """
+
+    def __init__(self, dedup_config: dict):
+        self.mode = dedup_config.get('mode', 'drop')
+        self.index = dedup_config.get('index', 'set')
+        self.check_content = dedup_config.get('content', True)
+        # Very short posts ("Help!") are too generic to fingerprint safely
+        self.min_content_words = dedup_config.get('min_content_words', 5)
+        self._lock = threading.Lock()
+        self.stats = {'seen': 0, 'kept': 0, 'url_duplicates': 0, 'content_duplicates': 0}
+
+        if self.index == 'bloom':
+            if self.mode == 'merge':
+                raise ValueError("Dedup 'merge' mode needs the exact 'set' index")
+            self._seen = BloomFilter(dedup_config.get('bloom_capacity', 1_000_000),
+                                     dedup_config.get('bloom_error_rate', 0.001))
+        elif self.mode == 'merge':
+            # Merging needs to find the kept problem again
+            self._seen = {}
+        else:
+            self._seen = set()
+
+    def _keys(self, problem: Dict) -> List[tuple]:
+        keys = []
+        url = canonicalize_url(problem.get('url', ''))
+        if url:
+            keys.append(('url_duplicates', fingerprint('url:' + url)))
+        if self.check_content:
+            content = normalize_content(problem)
+            if content.count(' ') + 1 >= self.min_content_words:
+                keys.append(('content_duplicates', fingerprint('text:' + content)))
+        return keys
+
+    def add(self, problem: Dict) -> bool:
+        """Register a problem; returns True if it should be kept."""
+        keys = self._keys(problem)
+
+        with self._lock:
+            self.stats['seen'] += 1
+
+            if isinstance(self._seen, BloomFilter):
+                duplicate_of = None
+                for reason, key in keys:
+                    if self._seen.add(key) and duplicate_of is None:
+                        duplicate_of = reason
+            else:
+                duplicate_of = None
+                original = None
+                for reason, key in keys:
+                    if key in self._seen:
+                        duplicate_of = reason
+                        if self.mode == 'merge':
+                            original = self._seen[key]
+                        break
+                if duplicate_of is None:
+                    for _, key in keys:
+                        if isinstance(self._seen, set):
+                            self._seen.add(key)
+                        else:
+                            self._seen[key] = problem
+                elif self.mode == 'merge':
+                    original.setdefault('duplicates', []).append({
+                        'source': problem.get('source', 'unknown'),
+                        'url': problem.get('url', '')
+                    })
+
+            if duplicate_of is not None:
+                self.stats[duplicate_of] += 1
+                return False
+
+            self.stats['kept'] += 1
+            return True
+
+    def filter(self, problems: List[Dict]) -> List[Dict]:
+        """Return the problems that are not duplicates of earlier ones."""
+        return [problem for problem in problems if self.add(problem)]
+
+    @property
+    def dropped(self) -> int:
+        return self.stats['url_duplicates'] + self.stats['content_duplicates']
+
+    def report(self) -> str:
+        return (f"Deduplicated {self.stats['seen']} problems: kept {self.stats['kept']}, "
+                f"dropped {self.stats['url_duplicates']} URL and "
+                f"{self.stats['content_duplicates']} content duplicates")
+
+
+def create_deduplicator(config: dict) -> Optional[Deduplicator]:
+    """Build a deduplicator from ``scraping.dedup``, or None when disabled."""
+    dedup_config = config.get('scraping', {}).get('dedup', {})
+    if not dedup_config.get('enabled', False):
+        return None
+    return Deduplicator(dedup_config)
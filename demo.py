@@ -5,6 +5,7 @@ This is useful for testing when external APIs are not accessible.
 import json
 from datetime import datetime
 from analyzer import ProblemAnalyzer
+from snapshot import write_snapshot
 
 
 def generate_mock_data():
@@ -414,6 +415,8 @@ def run_demo():
     with open('demo_data.json', 'w') as f:
         json.dump(demo_data, f, indent=2)
     print("   ✅ Demo data saved to demo_data.json")
+    size = write_snapshot('demo_data.snap', analysis, timestamp=demo_data['timestamp'])
+    print(f"   ✅ Compact snapshot saved to demo_data.snap ({size} bytes)")
     
     print("\n" + "=" * 60)
     print("✅ Demo completed successfully!")
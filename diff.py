@@ -0,0 +1,85 @@
+"""
+Differences between two published analyses.
+
+Top-problem groups are matched by their group key, the sorted signature
+keywords that ``ProblemAnalyzer`` groups on, so a diff only walks the two
+top-K lists, the category and source counts and the top keywords. Its cost
+is proportional to K, not to the number of problems analyzed.
+"""
+from typing import Dict, Mapping, Optional
+
+
+def group_key(group: Mapping) -> str:
+    """Stable identity of a top-problem group across analyses."""
+    return ' '.join(sorted(group.get('keywords', [])))
+
+
+def _ranked(analysis: Mapping) -> Dict[str, tuple]:
+    ranked = {}
+    for rank, group in enumerate(analysis.get('top_problems', []), 1):
+        ranked.setdefault(group_key(group), (rank, group))
+    return ranked
+
+
+def _summary(key: str, rank: int, group: Mapping) -> Dict:
+    return {
+        'key': key,
+        'rank': rank,
+        'title': group.get('title'),
+        'category': group.get('category'),
+        'count': group.get('count'),
+        'priority': group.get('priority')
+    }
+
+
+def _count_deltas(old: Mapping, new: Mapping) -> Dict[str, Dict]:
+    deltas = {}
+    for name in list(old) + [name for name in new if name not in old]:
+        before, after = old.get(name, 0), new.get(name, 0)
+        if before != after:
+            deltas[name] = {'from': before, 'to': after, 'delta': after - before}
+    return deltas
+
+
+def diff_analyses(old: Mapping, new: Mapping, keyword_limit: Optional[int] = None) -> Dict:
+    """Return the new, dropped and moved top problems and the count deltas.
+
+    New groups are returned in full so a client can apply the diff to its
+    copy of ``old``; dropped and moved groups are identified by key and rank.
+    Keywords outside a top-keyword list count as 0 on that side.
+    """
+    old_ranked, new_ranked = _ranked(old), _ranked(new)
+
+    added, moved = [], []
+    for key, (rank, group) in new_ranked.items():
+        previous = old_ranked.get(key)
+        if previous is None:
+            added.append(dict(group, key=key, rank=rank))
+            continue
+        old_rank, old_group = previous
+        if old_rank != rank or old_group.get('count') != group.get('count'):
+            moved.append(dict(_summary(key, rank, group), from_rank=old_rank,
+                              count_delta=group.get('count', 0) - old_group.get('count', 0)))
+    dropped = [_summary(key, rank, group) for key, (rank, group) in old_ranked.items()
+               if key not in new_ranked]
+
+    keyword_deltas = [
+        {'keyword': keyword, **delta}
+        for keyword, delta in _count_deltas(dict(old.get('top_keywords', [])),
+                                            dict(new.get('top_keywords', []))).items()
+    ]
+    keyword_deltas.sort(key=lambda item: abs(item['delta']), reverse=True)
+    if keyword_limit is not None:
+        keyword_deltas = keyword_deltas[:keyword_limit]
+
+    return {
+        'total_problems': {
+            'from': old.get('total_problems', 0),
+            'to': new.get('total_problems', 0),
+            'delta': new.get('total_problems', 0) - old.get('total_problems', 0)
+        },
+        'top_problems': {'new': added, 'dropped': dropped, 'moved': moved},
+        'categories': _count_deltas(old.get('categories', {}), new.get('categories', {})),
+        'sources': _count_deltas(old.get('sources', {}), new.get('sources', {})),
+        'keywords': keyword_deltas
+    }
@@ -0,0 +1,77 @@
+"""
+Streaming NDJSON / CSV serialization for the export endpoints.
+
+Rows are encoded one at a time and yielded in chunks of about
+``CHUNK_BYTES``, optionally gzip-compressed on the fly, so an export holds
+one chunk in memory whatever its total size. The generators are meant to be
+wrapped in a Flask streaming ``Response`` (sent with chunked transfer).
+"""
+import csv
+import io
+import json
+import zlib
+from typing import Dict, Iterable, Iterator, List, Mapping
+
+
+CHUNK_BYTES = 64 * 1024
+
+PROBLEM_FIELDS = [
+    'source', 'title', 'text', 'url', 'score', 'num_comments', 'comments',
+    'answer_count', 'view_count', 'subreddit', 'tag', 'topic', 'question_id',
+    'created_utc', 'created_at', 'timestamp', 'comments_text'
+]
+
+GROUP_FIELDS = [
+    'rank', 'title', 'category', 'keywords', 'count', 'users_affected',
+    'priority', 'total_engagement', 'example_urls'
+]
+
+
+def group_rows(groups: Iterable[Mapping]) -> Iterator[Dict]:
+    """Flatten ranked top-problem groups into export rows."""
+    for rank, group in enumerate(groups, 1):
+        row = {key: value for key, value in group.items() if key != 'examples'}
+        row['rank'] = rank
+        row['example_urls'] = [example.get('url', '') for example in group.get('examples', [])]
+        yield row
+
+
+def iter_ndjson(rows: Iterable[Mapping]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, separators=(',', ':'), default=str) + '\n'
+
+
+def iter_csv(rows: Iterable[Mapping], fields: List[str]) -> Iterator[str]:
+    """Encode rows as CSV with a header; lists are joined with spaces."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([' '.join(map(str, value)) if isinstance(value, (list, tuple)) else value
+                         for value in (row.get(field, '') for field in fields)])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_chunks(lines: Iterable[str], compress: bool = False) -> Iterator[bytes]:
+    """Join encoded lines into ~``CHUNK_BYTES`` chunks, gzip-compressed if asked."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    parts, size = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        parts.append(data)
+        size += len(data)
+        if size >= CHUNK_BYTES:
+            chunk = b''.join(parts)
+            parts, size = [], 0
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+    chunk = b''.join(parts)
+    if compressor is not None:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
@@ -0,0 +1,229 @@
+"""
+Budgeted crawl frontier for comment threads.
+
+The listing pass only sees titles and top-level bodies, while the comments
+("me too", workarounds, variants of the same failure) carry much of the
+signal. Every fetched problem that has comments is pushed onto a priority
+queue keyed by its engagement. The frontier pops the most engaged posts
+first and fetches their comment threads until ``max_requests`` requests or
+``time_budget`` seconds are spent:
+
+  - Reddit: the post permalink with ``.json`` appended;
+  - GitHub: ``/repos/{owner}/{repo}/issues/{number}/comments`` derived from
+    the issue's ``html_url``;
+  - Stack Overflow: ``/questions/{ids}/comments`` for up to
+    ``stackoverflow_batch`` questions, following further pages (while a
+    page comes back full) within the budget.
+
+The comment text is stored on the problem as ``comments_text``, which the
+analyzer includes when extracting keywords.
+
+The budget belongs to a ``CommentFrontier`` and starts when it is created;
+``crawl`` can be called repeatedly, and from several threads, against it.
+The sequential scrape crawls all problems at once, the pipeline crawls each
+page in its producer thread under one budget for the run, and queue workers
+and the scheduler create a frontier per shard or per poll.
+"""
+import heapq
+import itertools
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+import requests
+
+from analyzer import calculate_engagement
+from jsonstream import iter_json_items, truncate_text
+
+
+_GITHUB_ISSUE = re.compile(r'github\.com/([^/]+)/([^/]+)/issues/(\d+)')
+
+
+class CommentFrontier:
+    """Fetches comment threads for the most engaged problems within a budget."""
+
+    STACKOVERFLOW_API = "https://api.stackexchange.com/2.3"
+    MAX_IDS_PER_REQUEST = 100
+    PAGE_SIZE = 100
+
+    def __init__(self, config: dict, session):
+        scraping_config = config.get('scraping', {})
+        comments_config = scraping_config.get('comments', {})
+        limits = scraping_config.get('limits', {})
+        self.session = session
+        self.max_requests = comments_config.get('max_requests', 20)
+        self.time_budget = comments_config.get('time_budget', 15)
+        self.max_comments = comments_config.get('max_comments_per_post', 20)
+        self.max_chars = comments_config.get('max_comment_chars', 4000)
+        # One comments page is shared by the whole batch, sorted by votes
+        self.stackoverflow_batch = max(1, min(self.MAX_IDS_PER_REQUEST,
+                                              comments_config.get('stackoverflow_batch', 10)))
+        self.max_response_bytes = limits.get('max_response_bytes')
+        self.chunk_size = limits.get('chunk_size', 65536)
+
+        self._ticket = itertools.count()
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'posts': 0, 'comments': 0, 'seconds': 0.0, 'skipped': 0}
+
+    def _queue(self, problems: List[Dict]) -> List[tuple]:
+        """Heap of the problems that may have comments, most engaged first."""
+        heap = []
+        for problem in problems:
+            source = problem.get('source')
+            if source == 'reddit' and not problem.get('num_comments'):
+                continue
+            if source == 'github' and not problem.get('comments'):
+                continue
+            if source == 'stackoverflow' and not problem.get('question_id'):
+                continue
+            if source not in ('reddit', 'github', 'stackoverflow'):
+                continue
+            engagement = calculate_engagement(problem)
+            heapq.heappush(heap, (-engagement, next(self._ticket), problem))
+        return heap
+
+    def _stream(self, response, path: List[str]) -> Iterator:
+        return iter_json_items(response.iter_content(self.chunk_size), path,
+                               max_bytes=self.max_response_bytes)
+
+    def _attach(self, problem: Dict, comments: List[str]):
+        comments = [comment.strip() for comment in comments if comment and comment.strip()]
+        if not comments:
+            return
+        problem['comments_text'] = truncate_text(' '.join(comments[:self.max_comments]),
+                                                 self.max_chars)
+        with self._lock:
+            self.stats['posts'] += 1
+            self.stats['comments'] += min(len(comments), self.max_comments)
+
+    def _take_request(self) -> bool:
+        """Reserve one request from the budget; False once it is spent."""
+        with self._lock:
+            if (self.stats['requests'] >= self.max_requests
+                    or time.monotonic() - self._started >= self.time_budget):
+                return False
+            self.stats['requests'] += 1
+            return True
+
+    def _get(self, url: str, **kwargs):
+        # The caller has already reserved this request with _take_request
+        return self.session.get(url, timeout=10, stream=True, **kwargs)
+
+    def _fetch_reddit(self, problem: Dict):
+        url = problem.get('url', '').replace('https://reddit.com', 'https://www.reddit.com', 1)
+        headers = {'User-Agent': 'AutonomousAppBuilder/1.0'}
+        params = {'limit': self.max_comments, 'depth': 2, 'sort': 'top'}
+        response = self._get(url.rstrip('/') + '.json', params=params, headers=headers)
+        with response:
+            if response.status_code != 200:
+                return
+            # [post listing, comment listing]
+            listings = list(itertools.islice(self._stream(response, []), 2))
+
+        comments = []
+        pending = listings[1].get('data', {}).get('children', []) if len(listings) > 1 else []
+        while pending and len(comments) < self.max_comments:
+            child = pending.pop(0)
+            data = child.get('data', {})
+            if child.get('kind') != 't1':
+                continue
+            comments.append(data.get('body', ''))
+            replies = data.get('replies')
+            if isinstance(replies, dict):
+                pending.extend(replies.get('data', {}).get('children', []))
+        self._attach(problem, comments)
+
+    def _fetch_github(self, problem: Dict):
+        match = _GITHUB_ISSUE.search(problem.get('url', ''))
+        if match is None:
+            return
+        owner, repo, number = match.groups()
+        url = f"https://api.github.com/repos/{owner}/{repo}/issues/{number}/comments"
+        headers = {'Accept': 'application/vnd.github.v3+json'}
+        response = self._get(url, params={'per_page': self.max_comments}, headers=headers)
+        with response:
+            if response.status_code != 200:
+                return
+            comments = [comment.get('body', '') for comment in
+                        itertools.islice(self._stream(response, []), self.max_comments)]
+        self._attach(problem, comments)
+
+    def _fetch_stackoverflow(self, problems: List[Dict]):
+        from scraper import html_to_text
+
+        by_id = {problem['question_id']: problem for problem in problems}
+        url = f"{self.STACKOVERFLOW_API}/questions/{';'.join(str(i) for i in by_id)}/comments"
+        comments = {}
+        page = 1
+        while True:
+            params = {'site': 'stackoverflow', 'filter': 'withbody', 'sort': 'votes',
+                      'order': 'desc', 'pagesize': self.PAGE_SIZE, 'page': page}
+            response = self._get(url, params=params)
+            received = 0
+            with response:
+                if response.status_code != 200:
+                    break
+                for comment in self._stream(response, ['items']):
+                    received += 1
+                    texts = comments.setdefault(comment.get('post_id'), [])
+                    if len(texts) < self.max_comments:
+                        texts.append(html_to_text(comment.get('body', '')))
+            # A full page means there may be more; stop once every question
+            # has enough comments or the budget is spent
+            complete = (len(comments) == len(by_id)
+                        and all(len(texts) >= self.max_comments for texts in comments.values()))
+            if received < self.PAGE_SIZE or complete or not self._take_request():
+                break
+            page += 1
+        for question_id, texts in comments.items():
+            if question_id in by_id:
+                self._attach(by_id[question_id], texts)
+
+    def _pop_stackoverflow_batch(self, heap: List[tuple], first: Dict) -> List[Dict]:
+        # One request covers the next most engaged questions as well
+        batch = [first]
+        rest = []
+        for entry in sorted(heap):
+            if (entry[2].get('source') == 'stackoverflow'
+                    and len(batch) < self.stackoverflow_batch):
+                batch.append(entry[2])
+            else:
+                rest.append(entry)
+        heap[:] = rest
+        heapq.heapify(heap)
+        return batch
+
+    def crawl(self, problems: List[Dict]) -> Dict:
+        """Fetch comment threads in engagement order until the budget is spent."""
+        heap = self._queue(problems)
+        while heap and self._take_request():
+            _, _, problem = heapq.heappop(heap)
+            source = problem['source']
+            try:
+                if source == 'reddit':
+                    self._fetch_reddit(problem)
+                elif source == 'github':
+                    self._fetch_github(problem)
+                else:
+                    self._fetch_stackoverflow(self._pop_stackoverflow_batch(heap, problem))
+            except Exception as e:
+                print(f"Error fetching comments for {problem.get('url', '')}: {str(e)}")
+
+        with self._lock:
+            self.stats['seconds'] = round(time.monotonic() - self._started, 3)
+            self.stats['skipped'] += len(heap)
+        return self.stats
+
+    def report(self) -> str:
+        return (f"Comments: {self.stats['comments']} comments on {self.stats['posts']} posts "
+                f"({self.stats['requests']} requests, {self.stats['seconds']}s, "
+                f"{self.stats['skipped']} posts over budget)")
+
+
+def create_frontier(config: dict, session=None) -> Optional[CommentFrontier]:
+    """Build a comment frontier from ``scraping.comments``, or None when disabled."""
+    if not config.get('scraping', {}).get('comments', {}).get('enabled', False):
+        return None
+    return CommentFrontier(config, session or requests.Session())
@@ -0,0 +1,220 @@
+"""
+Hedged requests and adaptive timeouts for the scrapers.
+
+Scrape wall time is dominated by the slowest responses, not the median, and
+a fixed ``timeout=10`` lets one stalled Stack Exchange or GitHub call hold
+up its whole source loop. ``HedgedSession`` wraps a ``requests.Session``:
+
+  - per-host latency is tracked as an EWMA and a p95 over recent requests,
+    together with a p95 of the time until the response headers arrived;
+  - read timeouts are derived from the latency p95 and connect timeouts
+    from the headers p95 instead of constants. ``requests`` does not expose
+    the connect phase on its own, but it is part of the time to headers,
+    so that p95 bounds it from above;
+  - once a host has enough samples, a GET still outstanding after its p95
+    delay is duplicated ("hedged") and whichever response arrives first is
+    used; the loser is closed when it completes.
+
+Only idempotent GETs are hedged. Hedge rate and win counts are kept so the
+extra load can be monitored.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+
+class LatencyTracker:
+    """EWMA and rolling p95 of one host's response latency, and rolling p95
+    of its time to response headers."""
+
+    def __init__(self, alpha: float = 0.2, window: int = 200):
+        self.alpha = alpha
+        self.samples = deque(maxlen=window)
+        self.header_samples = deque(maxlen=window)
+        self.ewma = None
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, headers: Optional[float] = None):
+        with self._lock:
+            self.samples.append(seconds)
+            self.ewma = seconds if self.ewma is None else (
+                self.alpha * seconds + (1 - self.alpha) * self.ewma)
+            if headers is not None:
+                self.header_samples.append(headers)
+
+    def observe_headers(self, seconds: float):
+        with self._lock:
+            self.header_samples.append(seconds)
+
+    def _p95(self, samples: deque) -> Optional[float]:
+        with self._lock:
+            if not samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def p95(self) -> Optional[float]:
+        return self._p95(self.samples)
+
+    def header_p95(self) -> Optional[float]:
+        return self._p95(self.header_samples)
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+
+class LatencyRegistry:
+    """Latency trackers by host, shared by every session in the process."""
+
+    def __init__(self):
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str) -> LatencyTracker:
+        tracker = self._trackers.get(host)
+        if tracker is None:
+            with self._lock:
+                tracker = self._trackers.setdefault(host, LatencyTracker())
+        return tracker
+
+    def items(self):
+        return list(self._trackers.items())
+
+
+# Latency history survives across scrape runs
+LATENCY = LatencyRegistry()
+
+
+class HedgedSession:
+    """``requests.Session`` wrapper issuing hedged GETs with adaptive timeouts."""
+
+    def __init__(self, session=None, hedging_config: Optional[dict] = None,
+                 registry: LatencyRegistry = LATENCY):
+        hedging_config = hedging_config or {}
+        self.session = session or requests.Session()
+        self.registry = registry
+        self.connect_timeout = hedging_config.get('connect_timeout', 3.05)
+        self.min_connect_timeout = hedging_config.get('min_connect_timeout', 0.5)
+        self.min_timeout = hedging_config.get('min_read_timeout', 2.0)
+        self.max_timeout = hedging_config.get('max_read_timeout', 10.0)
+        self.timeout_multiplier = hedging_config.get('timeout_multiplier', 3.0)
+        self.min_samples = hedging_config.get('min_samples', 5)
+        self.min_hedge_delay = hedging_config.get('min_hedge_delay', 0.05)
+        self._pool = ThreadPoolExecutor(max_workers=hedging_config.get('max_workers', 16),
+                                        thread_name_prefix='hedged-get')
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'hedged': 0, 'hedge_wins': 0,
+                         'timeouts': 0, 'retries': 0, 'errors': 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _timeout(self, tracker: LatencyTracker, requested) -> tuple:
+        enough = len(tracker) >= self.min_samples
+        p95 = tracker.p95() if enough else None
+        if p95 is None:
+            read = requested[1] if isinstance(requested, tuple) else (requested or self.max_timeout)
+        else:
+            read = min(self.max_timeout, max(self.min_timeout, p95 * self.timeout_multiplier))
+        # ``connect_timeout`` is the ceiling; fast hosts get a tighter one
+        header_p95 = tracker.header_p95() if enough else None
+        if header_p95 is None:
+            connect = self.connect_timeout
+        else:
+            connect = min(self.connect_timeout,
+                          max(self.min_connect_timeout, header_p95 * self.timeout_multiplier))
+        return (connect, read)
+
+    def _attempt(self, tracker: LatencyTracker, url: str, params, kwargs):
+        started = time.monotonic()
+        try:
+            response = self.session.get(url, params=params, **kwargs)
+        except requests.exceptions.Timeout as e:
+            # A timeout is a lower bound on the latency; count it so the
+            # timeout and hedge delay widen for a host that got slower
+            waited = time.monotonic() - started
+            if isinstance(e, requests.exceptions.ConnectTimeout):
+                tracker.observe_headers(waited)
+            tracker.observe(waited)
+            self._count('timeouts')
+            raise
+        except Exception:
+            self._count('errors')
+            raise
+        elapsed = getattr(response, 'elapsed', None)
+        tracker.observe(time.monotonic() - started,
+                        elapsed.total_seconds() if elapsed else None)
+        return response
+
+    @staticmethod
+    def _discard(future):
+        if not future.cancelled() and future.exception() is None:
+            future.result().close()
+
+    def get(self, url: str, params: Optional[dict] = None, **kwargs) -> requests.Response:
+        """GET with an adaptive timeout, hedged after the host's p95 latency."""
+        tracker = self.registry.get(urlsplit(url).netloc)
+        kwargs['timeout'] = self._timeout(tracker, kwargs.get('timeout'))
+        self._count('requests')
+
+        attempts = [self._pool.submit(self._attempt, tracker, url, params, kwargs)]
+        if len(tracker) >= self.min_samples:
+            done, _ = wait(attempts, timeout=max(self.min_hedge_delay, tracker.p95()))
+            if not done:
+                self._count('hedged')
+                attempts.append(self._pool.submit(self._attempt, tracker, url, params, kwargs))
+
+        pending = set(attempts)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                if len(attempts) > 1 and future is attempts[1]:
+                    self._count('hedge_wins')
+                for loser in pending:
+                    loser.add_done_callback(self._discard)
+                return future.result()
+
+        # An unhedged request that hit the adaptive timeout gets one more
+        # try with the full timeout rather than dropping the target
+        if (isinstance(error, requests.exceptions.Timeout) and len(attempts) == 1
+                and kwargs['timeout'][1] < self.max_timeout):
+            self._count('retries')
+            kwargs['timeout'] = (self.connect_timeout, self.max_timeout)
+            return self._attempt(tracker, url, params, kwargs)
+        raise error
+
+    def metrics(self) -> Dict:
+        """Hedge-rate counters and per-host latency estimates."""
+        with self._lock:
+            counters = dict(self.counters)
+        requests_made = counters['requests'] or 1
+        counters['hedge_rate'] = round(counters['hedged'] / requests_made, 4)
+        counters['hedge_win_rate'] = round(counters['hedge_wins'] / max(1, counters['hedged']), 4)
+        counters['hosts'] = {
+            host: {
+                'samples': len(tracker),
+                'ewma_ms': round((tracker.ewma or 0) * 1000, 1),
+                'p95_ms': round((tracker.p95() or 0) * 1000, 1),
+                'headers_p95_ms': round((tracker.header_p95() or 0) * 1000, 1),
+            }
+            for host, tracker in self.registry.items()
+        }
+        return counters
+
+    def close(self):
+        # Losing hedges may still be reading from the session's pool
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self.session.close()
+        metrics = self.metrics()
+        print(f"HTTP: {metrics['requests']} requests, hedge rate {metrics['hedge_rate']:.1%}, "
+              f"{metrics['hedge_wins']} hedge wins, {metrics['timeouts']} timeouts")
@@ -0,0 +1,158 @@
+"""
+Incremental parsing of large JSON API responses.
+
+``response.json()`` buffers and parses a whole page before the first item
+can be used. ``iter_json_items`` instead walks the response bytes as they
+stream in, descends along a key path (``['items']`` for Stack Exchange and
+GitHub, ``['data', 'children']`` for Reddit) and yields the elements of the
+array found there one at a time. Everything outside that path is decoded
+only to be skipped. Peak memory per fetch is therefore bounded by one item
+plus one network chunk rather than by the page.
+
+A per-response byte cap stops reading once exceeded; the items that were
+complete before the cap are still yielded.
+"""
+import codecs
+import json
+from typing import Iterable, Iterator, List, Optional
+
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+class _StreamReader:
+    """Text buffer over a byte stream that refills on demand."""
+
+    def __init__(self, chunks: Iterable[bytes], max_bytes: Optional[int] = None):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        self.truncated = False
+        self.eof = False
+        self.buf = ''
+        self.pos = 0
+
+    def fill(self, wanted: int = 1) -> bool:
+        """Append at least ``wanted`` characters; returns False at end of stream."""
+        if self.eof:
+            return False
+
+        # Drop consumed text so the buffer only holds the current item
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+
+        added = 0
+        parts = [self.buf]
+        while added < wanted:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self.eof = True
+                parts.append(self.decoder.decode(b'', final=True))
+                break
+            if self.max_bytes is not None and self.bytes_read + len(chunk) > self.max_bytes:
+                chunk = chunk[:self.max_bytes - self.bytes_read]
+                self.truncated = self.eof = True
+            self.bytes_read += len(chunk)
+            text = self.decoder.decode(chunk)
+            parts.append(text)
+            added += len(text)
+            if self.eof:
+                break
+        self.buf = ''.join(parts)
+        return added > 0
+
+    def peek(self) -> Optional[str]:
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            buf, pos = self.buf, self.pos
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self.fill():
+                return None
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting {char!r}", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+                # A number or literal at the very end of the buffer may
+                # continue in the next chunk, or past the byte cap
+                if end < len(self.buf) or self.eof and not self.truncated:
+                    self.pos = end
+                    return value
+                if self.eof:
+                    raise json.JSONDecodeError("Value cut off by byte cap", self.buf, end)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow geometrically so a large item is not re-parsed per chunk
+            self.fill(max(len(self.buf) - self.pos, 4096))
+
+
+def _walk(reader: _StreamReader, path: List[str]) -> Iterator:
+    if not path:
+        reader.expect('[')
+        while True:
+            char = reader.peek()
+            if char == ']':
+                return
+            if char is None:
+                raise json.JSONDecodeError("Unterminated array", reader.buf, reader.pos)
+            if char == ',':
+                reader.pos += 1
+                continue
+            yield reader.value()
+
+    reader.expect('{')
+    while True:
+        char = reader.peek()
+        if char == '}':
+            return
+        if char is None:
+            raise json.JSONDecodeError("Unterminated object", reader.buf, reader.pos)
+        if char == ',':
+            reader.pos += 1
+            continue
+        key = reader.value()
+        reader.expect(':')
+        if key == path[0]:
+            yield from _walk(reader, path[1:])
+            return
+        reader.value()
+
+
+def iter_json_items(chunks: Iterable[bytes], path: List[str],
+                    max_bytes: Optional[int] = None) -> Iterator:
+    """Yield the elements of the array at ``path`` inside a streamed JSON document.
+
+    ``chunks`` is any iterable of bytes, e.g. ``response.iter_content(65536)``
+    for a response requested with ``stream=True``. If ``max_bytes`` is
+    exceeded, iteration ends after the last complete item.
+    """
+    reader = _StreamReader(chunks, max_bytes)
+    try:
+        yield from _walk(reader, list(path))
+    except json.JSONDecodeError:
+        if not reader.truncated:
+            raise
+        print(f"Response truncated at {reader.bytes_read} bytes")
+
+
+def truncate_text(text: Optional[str], limit: Optional[int]) -> str:
+    """Cap a text field at ``limit`` characters (no cap when limit is falsy)."""
+    text = text or ''
+    if limit and len(text) > limit:
+        return text[:limit]
+    return text
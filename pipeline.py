@@ -0,0 +1,149 @@
+"""
+Pipelined scrape -> analyze mode.
+
+Scrapers run in producer threads and push each fetched page onto a bounded
+queue; analyzer workers pull pages off the queue and tokenize/categorize
+them while the remaining pages are still downloading. When the queue is
+full producers block, so at most ``queue_size`` pages are buffered and
+memory stays bounded. End-to-end wall time approaches
+max(fetch, analyze) instead of their sum. With ``scraping.comments.enabled``
+each producer fetches the comment threads of its page before queueing it,
+under one frontier budget for the whole run.
+
+If an analyzer worker fails, the remaining workers stop analyzing but keep
+draining the queue so the producers never block on a full queue, and the
+first error is re-raised from ``run``.
+
+Pages are analyzed in arrival order, which depends on network timing. Counts
+and rankings match the sequential analysis; a group's representative title
+and the order of its examples may differ.
+"""
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from analyzer import AnalysisState, ProblemAnalyzer
+from frontier import create_frontier
+from scraper import create_scrapers
+
+
+_DONE = object()
+
+
+class ScrapePipeline:
+    """Bounded producer/consumer pipeline between scrapers and the analyzer."""
+
+    def __init__(self, config: dict, session=None, analyzer: Optional[ProblemAnalyzer] = None,
+                 deduplicator=None):
+        self.config = config
+        self.session = session
+        self.analyzer = analyzer or ProblemAnalyzer(config)
+        self.deduplicator = deduplicator
+
+        pipeline_config = config.get('scraping', {}).get('pipeline', {})
+        self.queue_size = pipeline_config.get('queue_size', 8)
+        self.workers = max(1, pipeline_config.get('analyzer_workers', 2))
+        self.keep_problems = pipeline_config.get('keep_problems', False)
+
+        self.problems: List[Dict] = []
+        self.stats = {}
+        self.frontier = None
+        self._error: Optional[BaseException] = None
+
+    def _produce(self, scraper, pages: queue.Queue, fetch_seconds: List[float]):
+        print(f"Scraping {scraper.label}...")
+        started = time.perf_counter()
+        for page in scraper.iter_pages():
+            if self.deduplicator is not None:
+                page = self.deduplicator.filter(page)
+            if page and self.frontier is not None:
+                self.frontier.crawl(page)
+            if page:
+                pages.put(page)
+        fetch_seconds.append(time.perf_counter() - started)
+
+    def _consume(self, pages: queue.Queue, state: AnalysisState, busy: List[float]):
+        analyzer = self.analyzer
+        while True:
+            page = pages.get()
+            if page is _DONE:
+                break
+            if self._error is not None:
+                # Keep draining so producers don't block on a full queue
+                continue
+            started = time.perf_counter()
+            try:
+                for problem in page:
+                    analyzer.accumulate(state, analyzer.prepare_problem(problem))
+            except Exception as e:
+                if self._error is None:
+                    self._error = e
+                print(f"Error analyzing page in {threading.current_thread().name}: {str(e)}")
+                continue
+            if self.keep_problems:
+                self.problems.extend(page)
+            busy[0] += time.perf_counter() - started
+
+    def run(self) -> Dict:
+        """Scrape all enabled sources and analyze pages as they arrive."""
+        started = time.perf_counter()
+        self._error = None
+        self.frontier = create_frontier(self.config, self.session)
+        pages = queue.Queue(maxsize=self.queue_size)
+
+        states = [self.analyzer.new_state() for _ in range(self.workers)]
+        busy = [[0.0] for _ in range(self.workers)]
+        consumers = [
+            threading.Thread(target=self._consume, args=(pages, states[i], busy[i]),
+                             name=f'analyzer-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for consumer in consumers:
+            consumer.start()
+
+        fetch_seconds: List[float] = []
+        producers = [
+            threading.Thread(target=self._produce, args=(scraper, pages, fetch_seconds),
+                             name=f'scraper-{scraper.name}', daemon=True)
+            for scraper in create_scrapers(self.config, self.session)
+        ]
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join()
+
+        for _ in consumers:
+            pages.put(_DONE)
+        for consumer in consumers:
+            consumer.join()
+        if self._error is not None:
+            raise self._error
+
+        state = states[0]
+        for other in states[1:]:
+            state.merge(other)
+        analysis = self.analyzer.finalize(state)
+
+        self.stats = {
+            'problems': state.total,
+            'fetch_seconds': round(max(fetch_seconds, default=0.0), 3),
+            'analyze_seconds': round(sum(b[0] for b in busy), 3),
+            'wall_seconds': round(time.perf_counter() - started, 3),
+        }
+        if self.deduplicator is not None:
+            self.stats['dedup'] = dict(self.deduplicator.stats)
+            print(self.deduplicator.report())
+        if self.frontier is not None:
+            self.stats['comments'] = dict(self.frontier.stats)
+            print(self.frontier.report())
+        print(f"Total problems scraped: {state.total} "
+              f"(fetch {self.stats['fetch_seconds']}s, "
+              f"analyze {self.stats['analyze_seconds']}s, "
+              f"wall {self.stats['wall_seconds']}s)")
+        return analysis
+
+
+def run_pipeline(config: dict, session=None, deduplicator=None) -> Dict:
+    """Convenience wrapper: run a pipelined scrape and return the analysis."""
+    return ScrapePipeline(config, session, deduplicator=deduplicator).run()
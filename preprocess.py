@@ -0,0 +1,104 @@
+"""
+Text preprocessing between the scrapers and ``ProblemAnalyzer``.
+
+Issue bodies and posts are mostly code blocks, stack traces, log output,
+links and markup by volume. Tokenizing them costs most of the analyzer's
+time and fills ``top_keywords`` with identifiers. ``TextPreprocessor``
+removes that content with precompiled patterns:
+
+  - fenced (```/~~~), indented and HTML ``<pre>``/``<code>`` code blocks
+    (an unclosed block runs to the end of the text) and inline code spans;
+  - Python, Java/JVM and JavaScript stack trace lines;
+  - log lines (a timestamp and a log level, or runs of lines starting with
+    either);
+  - markdown links and images (the link text is kept), bare URLs and HTML
+    tags; entities are unescaped;
+
+and finally keeps at most ``max_tokens`` whitespace-separated tokens.
+
+Input is first cut to ``max_tokens * CHARS_PER_TOKEN`` characters. Each
+pattern either bounds how far it scans from one starting point or, once
+started, runs to the end of the text, so an unclosed bracket, ``<`` or
+stack-trace path costs linear time rather than a rescan of the rest of the
+text from each occurrence.
+"""
+import html
+import re
+from typing import Optional
+
+
+# Characters kept per token before the regex passes; generous enough that
+# code and traces stripped first rarely crowd out the prose after them
+CHARS_PER_TOKEN = 20
+
+# Line-level patterns start with a literal newline (``clean`` prepends one)
+# rather than a MULTILINE ``^``, so the regex engine can scan for it instead
+# of attempting a match at every character
+_FENCED_CODE = re.compile(r'\n[ \t]*(```|~~~)[^\n]*\n.*?(?:\n[ \t]*\1[^\n]*|\Z)', re.DOTALL)
+# An unclosed block runs to the end, as an unclosed fence does
+_HTML_CODE = re.compile(r'<(pre|code)\b[^<>]{0,200}>.*?(?:</\1\s*>|\Z)',
+                        re.IGNORECASE | re.DOTALL)
+_INDENTED_CODE = re.compile(r'\n(?: {4}|\t)[^\n]*(?:\n(?: {4}|\t)[^\n]*)+')
+_INLINE_CODE = re.compile(r'`[^`\n]+`')
+_STACK_TRACE = re.compile(
+    r'\n[ \t]*(?:'
+    r'Traceback \(most recent call last\):'
+    r'|File "[^"\n]{0,500}", line \d+[^\n]*(?:\n[ \t]+(?!File ")[^\n]*)?'  # Python frame + source
+    r'|at [\w$.<>/]{1,300}\('                                             # JVM frame
+    r'(?=[^)\n]{0,300}(?:\.java|\.kt|\.scala|Native Method|Unknown Source))[^)\n]{0,300}\)'
+    r'|at (?:async )?(?:[\w$.<>\[\]]{1,300} )?\(?'                         # JavaScript frame:
+    r'(?:[\w-]{1,50}:)?(?=[^\s():]{0,300}(?:[/\\]|\.[cm]?[jt]sx?\b))'     # path:line:col
+    r'[^\s():]{1,300}:\d+:\d+\)?'
+    r'|\.\.\. \d+ more'
+    r')[^\n]*')
+_TIMESTAMP = r'\[?\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(?::\d{2})?\S{0,40}\]?'
+_LEVEL = r'(?:TRACE|DEBUG|INFO|WARN|WARNING|ERROR|FATAL|CRITICAL)'
+# A timestamped line naming a level, or three or more consecutive lines that
+# start with a timestamp or a level; single "ERROR: ..." prose lines survive
+_LOG_START = r'(?:' + _TIMESTAMP + r'|\[?' + _LEVEL + r'\]?[ :])'
+_LOG_LINE = re.compile(
+    r'\n[ \t]*(?:' + _TIMESTAMP + r'[^\n]*?\b' + _LEVEL + r'\b[^\n]*'
+    r'|' + _LOG_START + r'[^\n]*(?:\n[ \t]*' + _LOG_START + r'[^\n]*){2,})')
+# Also matches images; the leftover "!" is dropped by the tokenizer
+_MARKDOWN_LINK = re.compile(
+    r'\[([^\[\]\n]{0,200})\]\([^()\s]{0,2000}(?:\s+"[^"\n]{0,200}")?\)')
+_URL = re.compile(r'(?:https?://|www\.)\S+')
+# A tag name must follow "<" directly, so comparisons like "a < b" survive
+_HTML_TAG = re.compile(r'<(?:/?[A-Za-z]|!)[^<>\n]{0,200}>')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class TextPreprocessor:
+    """Strips code, traces, logs, links and markup and caps the token count."""
+
+    def __init__(self, preprocess_config: Optional[dict] = None):
+        preprocess_config = preprocess_config or {}
+        self.max_tokens = preprocess_config.get('max_tokens', 300)
+        self.strip_code = preprocess_config.get('strip_code', True)
+        self.strip_traces = preprocess_config.get('strip_traces', True)
+        self.strip_logs = preprocess_config.get('strip_logs', True)
+
+    def clean(self, text: str) -> str:
+        """Return ``text`` reduced to its prose, at most ``max_tokens`` tokens."""
+        if not text:
+            return ''
+        if self.max_tokens:
+            text = text[:self.max_tokens * CHARS_PER_TOKEN]
+        text = '\n' + text
+        if self.strip_code:
+            text = _FENCED_CODE.sub('\n', text)
+            text = _HTML_CODE.sub(' ', text)
+            text = _INDENTED_CODE.sub('\n', text)
+            text = _INLINE_CODE.sub(' ', text)
+        if self.strip_traces:
+            text = _STACK_TRACE.sub('\n', text)
+        if self.strip_logs:
+            text = _LOG_LINE.sub('\n', text)
+        text = _MARKDOWN_LINK.sub(r' \1 ', text)
+        text = _URL.sub(' ', text)
+        text = html.unescape(_HTML_TAG.sub(' ', text))
+
+        if self.max_tokens:
+            tokens = text.split(None, self.max_tokens)
+            return ' '.join(tokens[:self.max_tokens])
+        return _WHITESPACE.sub(' ', text).strip()
@@ -0,0 +1,233 @@
+"""
+Fast approximate preview analysis by stratified sampling.
+
+Problems are stratified by (source, category), categorized on the raw text:
+a cheap substring scan, while text preprocessing and keyword extraction are
+the expensive part of the analysis. The problems are then processed in an
+order whose every prefix is a proportional stratified sample (each stratum
+contributes at least two items first), until ``time_budget`` seconds are
+spent. Stratification counts against the budget, but the two-per-stratum
+prefix is always analyzed, so a preview is never empty. Counts, engagement,
+priorities and category counts are estimated with the stratified estimator
+of a total, together with 95% confidence intervals. Source counts are exact
+because sources are strata; category counts are exact too unless
+preprocessing moves problems between categories.
+
+``refine_in_background`` then computes the exact analysis, reusing the
+problems already prepared for the preview, and publishes it.
+"""
+import math
+import random
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from analyzer import ProblemAnalyzer
+
+
+Z_95 = 1.96
+
+
+class PreviewAnalyzer:
+    """Estimates an analysis from a time-bounded stratified sample."""
+
+    def __init__(self, config: dict, analyzer: Optional[ProblemAnalyzer] = None):
+        preview_config = config.get('analysis', {}).get('preview', {})
+        self.analyzer = analyzer or ProblemAnalyzer(config)
+        self.time_budget = preview_config.get('time_budget', 2.0)
+        self.examples = preview_config.get('examples', 5)
+        self.random = random.Random(preview_config.get('seed'))
+        self.prepared: Dict[int, Dict] = {}
+        self.strata: Dict[Tuple[str, str], int] = {}
+        self.sampled: Counter = Counter()
+
+    def sample_order(self, problems: List[Dict]
+                     ) -> Tuple[List[int], List[Tuple[str, str]], int]:
+        """Return problem indexes in sampling order, each problem's stratum
+        and the length of the prefix that samples every stratum twice."""
+        members: Dict[Tuple[str, str], List[int]] = {}
+        stratum_of = []
+        for i, problem in enumerate(problems):
+            category = self.analyzer.categorize_problem(problem)
+            stratum = (problem.get('source', 'unknown'), category)
+            stratum_of.append(stratum)
+            members.setdefault(stratum, []).append(i)
+        self.strata = {stratum: len(indexes) for stratum, indexes in members.items()}
+
+        # Item j of a shuffled stratum of size N sorts at (j + 0.5) / N, so
+        # any prefix holds every stratum in proportion to its size
+        keyed = []
+        minimum = 0
+        for indexes in members.values():
+            self.random.shuffle(indexes)
+            size = len(indexes)
+            minimum += min(2, size)
+            for j, i in enumerate(indexes):
+                keyed.append((j - 2 if j < 2 else (j + 0.5) / size, i))
+        keyed.sort()
+        return [i for _, i in keyed], stratum_of, minimum
+
+    def _estimate(self, moments: Dict[Tuple[str, str], List[float]]) -> Tuple[float, float]:
+        """Stratified estimate of a total and its 95% half-width.
+
+        ``moments`` maps a stratum to the sum and sum of squares of the
+        per-problem values over its sampled problems.
+        """
+        total = variance = 0.0
+        for stratum, (value_sum, square_sum) in moments.items():
+            size, n = self.strata[stratum], self.sampled[stratum]
+            mean = value_sum / n
+            total += size * mean
+            if n > 1:
+                sample_variance = max(0.0, (square_sum - n * mean * mean) / (n - 1))
+                variance += size * size * (1 - n / size) * sample_variance / n
+        return total, Z_95 * math.sqrt(variance)
+
+    def run(self, problems: List[Dict]) -> Dict:
+        """Return the preview analysis estimated within the time budget."""
+        started = time.perf_counter()
+        analyzer = self.analyzer
+        self.prepared, self.sampled = {}, Counter()
+        order, stratum_of, minimum = self.sample_order(problems)
+        stratify_seconds = time.perf_counter() - started
+
+        keyword_moments: Dict[str, Dict] = {}
+        category_moments: Dict[str, Dict] = {}
+        groups: Dict[str, Dict] = {}
+        for position, i in enumerate(order):
+            if position >= minimum and time.perf_counter() - started > self.time_budget:
+                break
+            stratum = stratum_of[i]
+            prepared = self.prepared[i] = analyzer.prepare_problem(problems[i])
+            self.sampled[stratum] += 1
+
+            for term, count in Counter(prepared['keywords']).items():
+                moment = keyword_moments.setdefault(term, {}).setdefault(stratum, [0, 0])
+                moment[0] += count
+                moment[1] += count * count
+            # Indicator of the analyzed category, which preprocessing may
+            # change from the stratum's raw-text category
+            moment = category_moments.setdefault(prepared['category'], {}).setdefault(
+                stratum, [0, 0])
+            moment[0] += 1
+            moment[1] += 1
+
+            if not prepared['title']:
+                continue
+            signature = ' '.join(sorted(prepared['keywords'][:3]))
+            group = groups.get(signature)
+            if group is None:
+                group = groups[signature] = {
+                    'title': prepared['title'],
+                    'keywords': prepared['keywords'][:3],
+                    'category': prepared['category'],
+                    'examples': [],
+                    'moments': {}
+                }
+            if len(group['examples']) < self.examples:
+                group['examples'].append({'title': prepared['title'], 'url': prepared['url'],
+                                          'source': prepared['source']})
+            # members, engagement sum, engagement sum of squares
+            moment = group['moments'].setdefault(stratum, [0, 0, 0])
+            moment[0] += 1
+            moment[1] += prepared['engagement']
+            moment[2] += prepared['engagement'] ** 2
+
+        preview = self._build(problems, groups, keyword_moments, category_moments,
+                              time.perf_counter() - started)
+        preview['preview']['stratify_seconds'] = round(stratify_seconds, 3)
+        return preview
+
+    def _build(self, problems: List[Dict], groups: Dict, keyword_moments: Dict,
+               category_moments: Dict, elapsed: float) -> Dict:
+        top_problems = []
+        for group in groups.values():
+            moments = group.pop('moments')
+            count, count_ci = self._estimate({h: [m[0], m[0]] for h, m in moments.items()})
+            engagement, _ = self._estimate({h: [m[1], m[2]] for h, m in moments.items()})
+            # Priority sums 10 + engagement / 10 over the group's problems
+            priority, priority_ci = self._estimate({
+                h: [10 * m[0] + m[1] / 10, 100 * m[0] + 2 * m[1] + m[2] / 100]
+                for h, m in moments.items()
+            })
+            if round(count) < self.analyzer.min_mentions:
+                continue
+            group.update({
+                'count': round(count),
+                'users_affected': round(count),
+                'total_engagement': round(engagement, 1),
+                'priority': round(priority, 1),
+                'ci': {
+                    'users_affected': [round(max(0.0, count - count_ci), 1),
+                                       round(count + count_ci, 1)],
+                    'priority': [round(max(0.0, priority - priority_ci), 1),
+                                 round(priority + priority_ci, 1)]
+                }
+            })
+            top_problems.append(group)
+        top_problems.sort(key=lambda group: group['priority'], reverse=True)
+
+        keywords = {term: self._estimate(moments) for term, moments in keyword_moments.items()}
+        top_keywords = sorted(keywords.items(), key=lambda item: item[1][0], reverse=True)[:50]
+
+        categories = {name: self._estimate(moments) for name, moments in category_moments.items()}
+        sources = Counter()
+        for (source, _), size in self.strata.items():
+            sources[source] += size
+
+        sampled = sum(self.sampled.values())
+        return {
+            'total_problems': len(problems),
+            'top_problems': top_problems[:self.analyzer.top_count],
+            'top_keywords': [(term, round(estimate)) for term, (estimate, _) in top_keywords],
+            'categories': {name: round(estimate) for name, (estimate, _) in
+                           sorted(categories.items(), key=lambda item: item[1][0], reverse=True)},
+            'sources': dict(sources),
+            'preview': {
+                'sampled': sampled,
+                'fraction': round(sampled / len(problems), 4) if problems else 1.0,
+                'seconds': round(elapsed, 3),
+                'confidence': 0.95,
+                'keyword_intervals': {
+                    term: [round(max(0.0, estimate - half), 1), round(estimate + half, 1)]
+                    for term, (estimate, half) in top_keywords
+                },
+                'category_intervals': {
+                    name: [round(max(0.0, estimate - half), 1), round(estimate + half, 1)]
+                    for name, (estimate, half) in categories.items()
+                }
+            }
+        }
+
+    def refine(self, problems: List[Dict]) -> Dict:
+        """Compute the exact analysis, reusing the problems prepared so far."""
+        analyzer = self.analyzer
+        state = analyzer.new_state()
+        for i, problem in enumerate(problems):
+            prepared = self.prepared.get(i) or analyzer.prepare_problem(problem)
+            analyzer.accumulate(state, prepared)
+        return analyzer.finalize(state)
+
+    def refine_in_background(self, problems: List[Dict], store, preview_version: int
+                             ) -> threading.Thread:
+        """Publish the exact analysis from a background thread.
+
+        The exact result only replaces the preview if nothing newer was
+        published in the meantime; the store checks this under its publish
+        lock.
+        """
+        def work():
+            started = time.perf_counter()
+            analysis = self.refine(problems)
+            published = store.publish(analysis, problems=problems,
+                                      expected_version=preview_version)
+            if published is None:
+                print("Preview superseded; exact analysis not published")
+                return
+            print(f"Refined preview to exact analysis (version {published.version}, "
+                  f"{time.perf_counter() - started:.1f}s)")
+
+        thread = threading.Thread(target=work, name='preview-refine', daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,205 @@
+"""
+Record/replay layer for scraper HTTP traffic.
+
+A recording session wraps a real HTTP session and captures every response
+into a gzip-compressed JSON Lines archive. A replay session serves those
+responses back without touching the network, either with their original
+latency or as fast as possible, so the full scrape -> analyze pipeline can
+be exercised reproducibly on an isolated machine.
+"""
+import base64
+import gzip
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, Optional
+
+import requests
+
+
+ARCHIVE_VERSION = 1
+
+
+def request_key(method: str, url: str, params: Optional[dict] = None) -> str:
+    """Build the lookup key for a request (method plus fully encoded URL)."""
+    prepared = requests.Request(method.upper(), url, params=params).prepare()
+    return f"{method.upper()} {prepared.url}"
+
+
+class TrafficRecorder:
+    """HTTP session wrapper that records every response to an archive."""
+
+    def __init__(self, archive_path: str, session=None):
+        self.archive_path = archive_path
+        self.session = session or requests.Session()
+        self.started = time.monotonic()
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._archive = gzip.open(archive_path, 'wt', encoding='utf-8')
+        self._write({'version': ARCHIVE_VERSION, 'created': time.time()})
+
+    def _write(self, entry: Dict):
+        with self._lock:
+            self._archive.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+    def get(self, url: str, params: Optional[dict] = None, **kwargs) -> requests.Response:
+        """Perform a real GET request and record the response."""
+        sent = time.monotonic()
+        response = self.session.get(url, params=params, **kwargs)
+        body = response.content
+        elapsed = time.monotonic() - sent
+
+        entry = {
+            'key': request_key('GET', url, params),
+            'offset': round(sent - self.started, 4),
+            'elapsed': round(elapsed, 4),
+            'status': response.status_code,
+            'content_type': response.headers.get('Content-Type', ''),
+            'encoding': response.encoding,
+        }
+        try:
+            entry['body'] = body.decode('utf-8')
+        except UnicodeDecodeError:
+            entry['body_b64'] = base64.b64encode(body).decode('ascii')
+
+        self._write(entry)
+        self.recorded += 1
+        return response
+
+    def close(self):
+        """Flush the archive and close the underlying session."""
+        with self._lock:
+            self._archive.close()
+        self.session.close()
+        print(f"Recorded {self.recorded} responses to {self.archive_path}")
+
+
+class TrafficReplayer:
+    """HTTP session stand-in that serves responses from a recorded archive.
+
+    Responses recorded for the same request are served in recording order;
+    once they are exhausted the last one is repeated. With ``realtime=True``
+    the recorded timeline is reproduced: a response is not returned before
+    its recorded offset plus latency, divided by ``speed``, has passed since
+    the first replayed request, nor before its latency has passed since it
+    was requested.
+    """
+
+    def __init__(self, archive_path: str, realtime: bool = False, speed: float = 1.0):
+        self.archive_path = archive_path
+        self.realtime = realtime
+        self.speed = speed if speed > 0 else 1.0
+        self.served = 0
+        self.misses = 0
+        self.started = None
+        self._lock = threading.Lock()
+        self._responses = defaultdict(deque)
+        self._load()
+
+    def _load(self):
+        with gzip.open(self.archive_path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline() or '{}')
+            if header.get('version') != ARCHIVE_VERSION:
+                raise ValueError(
+                    f"Unsupported traffic archive version: {header.get('version')}"
+                )
+            for line in f:
+                entry = json.loads(line)
+                self._responses[entry['key']].append(entry)
+
+    def _build_response(self, entry: Dict, url: str) -> requests.Response:
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.url = url
+        response.encoding = entry.get('encoding')
+        response.headers['Content-Type'] = entry.get('content_type', '')
+        if 'body_b64' in entry:
+            response._content = base64.b64decode(entry['body_b64'])
+        else:
+            response._content = entry.get('body', '').encode('utf-8')
+        response._content_consumed = True
+        return response
+
+    def get(self, url: str, params: Optional[dict] = None, **kwargs) -> requests.Response:
+        """Serve the recorded response for a GET request."""
+        key = request_key('GET', url, params)
+        requested = time.monotonic()
+        with self._lock:
+            if self.started is None:
+                self.started = requested
+            recorded = self._responses.get(key)
+            if not recorded:
+                self.misses += 1
+                raise requests.exceptions.ConnectionError(
+                    f"No recorded response for {key}"
+                )
+            entry = recorded.popleft() if len(recorded) > 1 else recorded[0]
+            self.served += 1
+
+        if self.realtime:
+            elapsed = entry.get('elapsed', 0)
+            due = requested + elapsed / self.speed
+            if 'offset' in entry:
+                due = max(due, self.started + (entry['offset'] + elapsed) / self.speed)
+            time.sleep(max(0.0, due - time.monotonic()))
+
+        return self._build_response(entry, key.split(' ', 1)[1])
+
+    def close(self):
+        print(f"Replayed {self.served} responses ({self.misses} misses) from {self.archive_path}")
+
+
+def run_replay_benchmark(config: dict, archive_path: str, realtime: bool = False,
+                         speed: float = 1.0, repeat: int = 1):
+    """Replay an archive through the full scrape -> analyze pipeline and time it."""
+    from scraper import scrape_all_sources
+    from analyzer import ProblemAnalyzer
+
+    analyzer = ProblemAnalyzer(config)
+    for run in range(1, repeat + 1):
+        session = TrafficReplayer(archive_path, realtime=realtime, speed=speed)
+        started = time.perf_counter()
+        problems = scrape_all_sources(config, session=session)
+        scraped = time.perf_counter()
+        analysis = analyzer.analyze_problems(problems)
+        finished = time.perf_counter()
+        session.close()
+
+        print(f"Run {run}: {len(problems)} problems, "
+              f"{len(analysis['top_problems'])} top problems | "
+              f"scrape {scraped - started:.3f}s, "
+              f"analyze {finished - scraped:.3f}s, "
+              f"total {finished - started:.3f}s")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Record or replay scraper HTTP traffic.')
+    parser.add_argument('mode', choices=['record', 'replay'])
+    parser.add_argument('archive', help='Path to the traffic archive (.jsonl.gz)')
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--realtime', action='store_true',
+                        help='Replay with the recorded request timing and latencies '
+                             'instead of full speed')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Speed-up factor applied to the recorded timeline')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Number of replay runs')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = json.load(f)
+
+    if args.mode == 'record':
+        from scraper import scrape_all_sources
+
+        recorder = TrafficRecorder(args.archive)
+        try:
+            scrape_all_sources(config, session=recorder)
+        finally:
+            recorder.close()
+    else:
+        run_replay_benchmark(config, args.archive, realtime=args.realtime,
+                             speed=args.speed, repeat=args.repeat)
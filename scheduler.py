@@ -0,0 +1,266 @@
+"""
+Adaptive per-feed polling scheduler.
+
+Instead of scraping everything on demand, a long-running scheduler polls
+each feed (one subreddit, Stack Overflow tag or GitHub label) on its own
+interval. After every poll the interval is adapted to how much new content
+the feed produced: busy feeds are polled more often, quiet ones are backed
+off, between ``min_interval`` and ``max_interval``. Every outbound request
+(a poll may make several, e.g. Stack Overflow body backfills) draws from a
+global token bucket of ``requests_per_hour`` so the API quota is spent
+where the new data is.
+
+With ``scraping.comments.enabled``, comment threads of a poll's new
+problems are fetched within a per-poll frontier budget; those requests are
+charged to the token bucket like any other.
+
+New problems are folded into a rolling corpus that is periodically
+re-analyzed and published through the shared analysis store, so
+``server.shared_snapshot`` must be enabled for running web workers to pick
+it up.
+
+Usage:
+    python scheduler.py [--max-polls N]
+"""
+import heapq
+import itertools
+import json
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from dedup import canonicalize_url
+
+
+class Feed:
+    """Polling state of a single scraper target."""
+
+    def __init__(self, scraper, target: str, interval: float, seen_limit: int):
+        self.scraper = scraper
+        self.target = target
+        self.interval = interval
+        self.seen = OrderedDict()
+        self.seen_limit = seen_limit
+        self.polls = 0
+        self.last_new = 0
+
+    @property
+    def name(self) -> str:
+        return self.scraper.describe(self.target)
+
+    def new_items(self, problems: List[Dict]) -> List[Dict]:
+        """Return the problems this feed has not produced before."""
+        fresh = []
+        for problem in problems:
+            key = canonicalize_url(problem.get('url', '')) or problem.get('title', '')
+            if key in self.seen:
+                self.seen.move_to_end(key)
+                continue
+            self.seen[key] = True
+            fresh.append(problem)
+        while len(self.seen) > self.seen_limit:
+            self.seen.popitem(last=False)
+        return fresh
+
+
+class TokenBucket:
+    """Global request budget, refilled continuously."""
+
+    def __init__(self, per_hour: float, burst: float, clock: Callable[[], float]):
+        self.rate = per_hour / 3600.0
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+
+class BudgetedSession:
+    """HTTP session wrapper that takes a budget token before every GET.
+
+    Hedged duplicates sent by a ``HedgedSession`` underneath are not
+    charged; they only go out for requests that are already slow.
+    """
+
+    def __init__(self, session, budget: TokenBucket, sleep: Callable[[float], None]):
+        self.session = session
+        self.budget = budget
+        self.sleep = sleep
+        self.requests = 0
+
+    def get(self, url: str, **kwargs):
+        delay = self.budget.wait_time()
+        if delay > 0:
+            self.sleep(delay)
+        self.budget.take()
+        self.requests += 1
+        return self.session.get(url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class FeedScheduler:
+    """Polls feeds at adaptive intervals within a global request budget."""
+
+    def __init__(self, config: dict, session=None, store=None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        from scraper import create_scrapers, create_session
+        from analyzer import ProblemAnalyzer
+        from store import SharedAnalysisStore, create_store
+
+        self.config = config
+        scheduler_config = config.get('scraping', {}).get('scheduler', {})
+        self.min_interval = scheduler_config.get('min_interval', 60)
+        self.max_interval = scheduler_config.get('max_interval', 3600)
+        self.target_new = scheduler_config.get('target_new_per_poll', 5)
+        self.publish_interval = scheduler_config.get('publish_interval', 300)
+        self.max_corpus = scheduler_config.get('max_corpus', 20000)
+        initial_interval = scheduler_config.get('initial_interval', 300)
+        seen_limit = scheduler_config.get('seen_per_feed', 5000)
+
+        if store is None:
+            store = create_store(config)
+            # A process-local store would publish where no web worker can see it
+            if not isinstance(store, SharedAnalysisStore):
+                raise ValueError("The scheduler publishes through the shared snapshot store; "
+                                 "enable server.shared_snapshot in the configuration")
+
+        self.clock = clock
+        self.sleep = sleep
+        self.store = store
+        self.analyzer = ProblemAnalyzer(config)
+        self.budget = TokenBucket(scheduler_config.get('requests_per_hour', 600),
+                                  scheduler_config.get('burst', 10), clock)
+        self.session = BudgetedSession(session or create_session(config), self.budget, sleep)
+
+        self.feeds = [Feed(scraper, target, initial_interval, seen_limit)
+                      for scraper in create_scrapers(config, self.session)
+                      for target in scraper.targets()]
+        # Every feed is due immediately; the token bucket paces the first round
+        now = clock()
+        self._ticket = itertools.count()
+        self._queue = [(now, next(self._ticket), feed) for feed in self.feeds]
+        heapq.heapify(self._queue)
+
+        self.corpus = OrderedDict()
+        self.dirty = False
+        self.last_publish = now
+        self.polls = 0
+
+    def adapt(self, feed: Feed, fetched: int, new: int):
+        """Adjust a feed's interval towards ``target_new`` new items per poll."""
+        if fetched == 0 or new == 0:
+            factor = 2.0
+        else:
+            factor = min(2.0, max(0.5, self.target_new / new))
+        feed.interval = min(self.max_interval, max(self.min_interval, feed.interval * factor))
+
+    def poll(self, feed: Feed) -> int:
+        """Poll one feed, fold its new problems into the corpus; returns new count."""
+        from frontier import create_frontier
+
+        problems = feed.scraper.fetch_safely(feed.target)
+        fresh = feed.new_items(problems)
+        frontier = create_frontier(self.config, self.session)
+        if frontier is not None and fresh:
+            frontier.crawl(fresh)
+
+        for problem in fresh:
+            key = canonicalize_url(problem.get('url', '')) or problem.get('title', '')
+            self.corpus[key] = problem
+            self.corpus.move_to_end(key)
+        while len(self.corpus) > self.max_corpus:
+            self.corpus.popitem(last=False)
+
+        feed.polls += 1
+        feed.last_new = len(fresh)
+        self.polls += 1
+        self.dirty = self.dirty or bool(fresh)
+        self.adapt(feed, len(problems), len(fresh))
+        print(f"Polled {feed.name}: {len(fresh)}/{len(problems)} new, "
+              f"next in {feed.interval:.0f}s")
+        return len(fresh)
+
+    def publish(self):
+        """Analyze the rolling corpus and publish it."""
+        from dedup import create_deduplicator
+
+        problems = list(self.corpus.values())
+        deduplicator = create_deduplicator(self.config)
+        if deduplicator is not None:
+            problems = deduplicator.filter(problems)
+        analysis = self.analyzer.analyze_problems(problems)
+        published = self.store.publish(analysis)
+        self.dirty = False
+        self.last_publish = self.clock()
+        print(f"Published {analysis['total_problems']} problems as version {published.version}")
+
+    def step(self):
+        """Wait for the next due feed, then poll it.
+
+        The session waits for a budget token before each request the poll makes.
+        """
+        due, _, feed = heapq.heappop(self._queue)
+        delay = due - self.clock()
+        if delay > 0:
+            self.sleep(delay)
+
+        self.poll(feed)
+        heapq.heappush(self._queue, (self.clock() + feed.interval, next(self._ticket), feed))
+
+        if self.dirty and self.clock() - self.last_publish >= self.publish_interval:
+            self.publish()
+
+    def run(self, max_polls: Optional[int] = None):
+        """Run until interrupted (or until ``max_polls`` polls were made)."""
+        print(f"Scheduling {len(self.feeds)} feeds")
+        try:
+            while self.feeds and (max_polls is None or self.polls < max_polls):
+                self.step()
+        except KeyboardInterrupt:
+            print("Scheduler stopped")
+        finally:
+            if self.dirty:
+                self.publish()
+            self.session.close()
+
+    def report(self) -> List[Dict]:
+        """Current interval and last yield of every feed."""
+        return [{'feed': feed.name, 'interval': round(feed.interval, 1),
+                 'polls': feed.polls, 'last_new': feed.last_new}
+                for feed in self.feeds]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Adaptive per-feed polling scheduler.')
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--max-polls', type=int, help='Stop after this many polls')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = json.load(f)
+
+    scheduler = FeedScheduler(config)
+    scheduler.run(max_polls=args.max_polls)
+    for row in scheduler.report():
+        print(f"{row['feed']:<45} every {row['interval']:>7}s  "
+              f"polls {row['polls']:>4}  last new {row['last_new']}")
@@ -4,65 +4,171 @@ Supports Reddit, Stack Overflow, and GitHub Issues.
 """
 import requests
 from bs4 import BeautifulSoup
+import atexit
+import itertools
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict
 from datetime import datetime
+from jsonstream import iter_json_items, truncate_text
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+
+def html_to_text(html: str) -> str:
+    """Strip HTML markup (e.g. Stack Exchange question bodies) to plain text.
+    
+    Code is kept in markdown form, ``<pre>`` blocks as fenced blocks and
+    ``<code>`` as inline spans, so text preprocessing can still find it.
+    """
+    if not html:
+        return ''
+    soup = BeautifulSoup(html, HTML_PARSER)
+    for block in soup.find_all('pre'):
+        block.replace_with(f"\n```\n{block.get_text()}\n```\n")
+    for span in soup.find_all('code'):
+        span.replace_with(f"`{span.get_text()}`")
+    lines = (' '.join(line.split()) for line in soup.get_text(' ').splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+_html_pool = None
+
+
+def _get_html_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the shared process pool used to strip HTML bodies."""
+    global _html_pool
+    if _html_pool is None:
+        _html_pool = ProcessPoolExecutor(max_workers=workers)
+        atexit.register(_html_pool.shutdown)
+    return _html_pool
 
 
 class ForumScraper:
-    """Base class for forum scrapers."""
+    """Base class for forum scrapers.
     
-    def __init__(self, config: dict):
+    Each scraper works through a list of targets (subreddits, tags or
+    labels). ``fetch`` retrieves a single target, which lets callers
+    scrape targets independently, e.g. as pipeline pages or queue shards.
+    """
+    
+    name = 'forum'
+    label = 'Forum'
+    
+    def __init__(self, config: dict, session=None):
         self.config = config
         self.problems = []
+        self.session = session or requests.Session()
+        
+        # Bounds on what a single response may cost in memory
+        limits = config.get('limits', {})
+        self.max_response_bytes = limits.get('max_response_bytes')
+        self.max_title_chars = limits.get('max_title_chars')
+        self.max_text_chars = limits.get('max_text_chars')
+        self.chunk_size = limits.get('chunk_size', 65536)
+    
+    def stream_items(self, response, path: List[str]):
+        """Yield the items of the JSON array at ``path`` as the body streams in."""
+        return iter_json_items(response.iter_content(self.chunk_size), path,
+                               max_bytes=self.max_response_bytes)
+    
+    def targets(self) -> List[str]:
+        """Return the targets (subreddits, tags, labels) to scrape."""
+        raise NotImplementedError("Subclasses must implement targets()")
+    
+    def fetch(self, target: str, strict: bool = False) -> List[Dict]:
+        """Scrape a single target and return its problems.
+        
+        A failed request yields no problems, or raises when ``strict`` is
+        set so callers that retry (e.g. queue workers) can tell an error
+        from an empty target.
+        """
+        raise NotImplementedError("Subclasses must implement fetch()")
+    
+    def check_response(self, response, strict: bool) -> bool:
+        """Return whether a response is usable; with ``strict``, raise instead."""
+        if response.status_code == 200:
+            return True
+        if strict:
+            raise requests.HTTPError(
+                f"HTTP {response.status_code} from {response.url}", response=response)
+        return False
+    
+    def describe(self, target: str) -> str:
+        """Human-readable name of a target for log messages."""
+        return f"{self.name} '{target}'"
+    
+    def fetch_safely(self, target: str) -> List[Dict]:
+        """Scrape a single target, logging and swallowing errors."""
+        try:
+            return self.fetch(target)
+        except Exception as e:
+            print(f"Error scraping {self.describe(target)}: {str(e)}")
+            return []
+    
+    def iter_pages(self):
+        """Yield the problems of each target as soon as it is fetched."""
+        for target in self.targets():
+            yield self.fetch_safely(target)
     
     def scrape(self) -> List[Dict]:
         """Scrape problems from the forum."""
-        raise NotImplementedError("Subclasses must implement scrape()")
+        problems = []
+        for page in self.iter_pages():
+            problems.extend(page)
+        return problems
 
 
 class RedditScraper(ForumScraper):
     """Scraper for Reddit posts."""
     
-    def __init__(self, config: dict):
-        super().__init__(config)
+    name = 'reddit'
+    label = 'Reddit'
+    
+    def __init__(self, config: dict, session=None):
+        super().__init__(config, session)
         self.subreddits = config.get('subreddits', [])
         self.max_posts = config.get('max_posts_per_source', 100)
     
-    def scrape(self) -> List[Dict]:
-        """Scrape problems from Reddit subreddits."""
+    def targets(self) -> List[str]:
+        return list(self.subreddits)
+    
+    def describe(self, target: str) -> str:
+        return f"r/{target}"
+    
+    def fetch(self, subreddit: str, strict: bool = False) -> List[Dict]:
+        """Scrape hot posts from a single subreddit."""
         problems = []
         
-        for subreddit in self.subreddits:
-            try:
-                # Using Reddit JSON API (no auth required for public posts)
-                url = f"https://www.reddit.com/r/{subreddit}/hot.json"
-                headers = {'User-Agent': 'AutonomousAppBuilder/1.0'}
-                
-                response = requests.get(url, headers=headers, timeout=10)
-                if response.status_code == 200:
-                    data = response.json()
-                    posts = data.get('data', {}).get('children', [])
-                    
-                    for post in posts[:self.max_posts // len(self.subreddits)]:
-                        post_data = post.get('data', {})
-                        problem = {
-                            'source': 'reddit',
-                            'subreddit': subreddit,
-                            'title': post_data.get('title', ''),
-                            'text': post_data.get('selftext', ''),
-                            'url': f"https://reddit.com{post_data.get('permalink', '')}",
-                            'score': post_data.get('score', 0),
-                            'num_comments': post_data.get('num_comments', 0),
-                            'created_utc': post_data.get('created_utc', 0),
-                            'timestamp': datetime.now().isoformat()
-                        }
-                        problems.append(problem)
-                        
-            except Exception as e:
-                print(f"Error scraping r/{subreddit}: {str(e)}")
-                continue
+        # Using Reddit JSON API (no auth required for public posts)
+        url = f"https://www.reddit.com/r/{subreddit}/hot.json"
+        headers = {'User-Agent': 'AutonomousAppBuilder/1.0'}
+        
+        response = self.session.get(url, headers=headers, timeout=10, stream=True)
+        with response:
+            if not self.check_response(response, strict):
+                return problems
+            
+            posts = self.stream_items(response, ['data', 'children'])
+            for post in itertools.islice(posts, self.max_posts // len(self.subreddits)):
+                post_data = post.get('data', {})
+                problem = {
+                    'source': 'reddit',
+                    'subreddit': subreddit,
+                    'title': truncate_text(post_data.get('title'), self.max_title_chars),
+                    'text': truncate_text(post_data.get('selftext'), self.max_text_chars),
+                    'url': f"https://reddit.com{post_data.get('permalink', '')}",
+                    'score': post_data.get('score', 0),
+                    'num_comments': post_data.get('num_comments', 0),
+                    'created_utc': post_data.get('created_utc', 0),
+                    'timestamp': datetime.now().isoformat()
+                }
+                problems.append(problem)
         
         return problems
 
@@ -70,50 +176,111 @@ class RedditScraper(ForumScraper):
 class StackOverflowScraper(ForumScraper):
     """Scraper for Stack Overflow questions."""
     
-    def __init__(self, config: dict):
-        super().__init__(config)
+    name = 'stackoverflow'
+    label = 'Stack Overflow'
+    
+    API_URL = "https://api.stackexchange.com/2.3"
+    # The API accepts at most 100 semicolon-separated ids per request
+    MAX_IDS_PER_REQUEST = 100
+    
+    def __init__(self, config: dict, session=None):
+        super().__init__(config, session)
         self.tags = config.get('stackoverflow_tags', [])
         self.max_posts = config.get('max_posts_per_source', 100)
+        # Worker processes for HTML stripping; 0 strips inline
+        self.html_workers = config.get('html_workers', 0)
     
-    def scrape(self) -> List[Dict]:
-        """Scrape problems from Stack Overflow."""
+    def targets(self) -> List[str]:
+        return list(self.tags)
+    
+    def describe(self, target: str) -> str:
+        return f"Stack Overflow tag '{target}'"
+    
+    def _strip_bodies(self, bodies: List[str]) -> List[str]:
+        """Convert HTML bodies to text, in worker processes when configured."""
+        if self.html_workers > 1 and len(bodies) > 1:
+            pool = _get_html_pool(self.html_workers)
+            chunksize = max(1, len(bodies) // (self.html_workers * 4))
+            return list(pool.map(html_to_text, bodies, chunksize=chunksize))
+        return [html_to_text(body) for body in bodies]
+    
+    def fetch_bodies(self, question_ids: List[int], strict: bool = False) -> Dict[int, str]:
+        """Fetch HTML bodies for questions in batches of up to 100 ids."""
+        bodies = {}
+        
+        for start in range(0, len(question_ids), self.MAX_IDS_PER_REQUEST):
+            batch = question_ids[start:start + self.MAX_IDS_PER_REQUEST]
+            url = f"{self.API_URL}/questions/{';'.join(str(i) for i in batch)}"
+            params = {
+                'site': 'stackoverflow',
+                'filter': 'withbody',
+                'pagesize': len(batch)
+            }
+            
+            response = self.session.get(url, params=params, timeout=10, stream=True)
+            with response:
+                if self.check_response(response, strict):
+                    for question in self.stream_items(response, ['items']):
+                        bodies[question.get('question_id')] = truncate_text(
+                            question.get('body'), self.max_text_chars)
+        
+        return bodies
+    
+    def fetch(self, tag: str, strict: bool = False) -> List[Dict]:
+        """Scrape recently active questions, with bodies, for a single tag."""
         problems = []
         
-        for tag in self.tags:
-            try:
-                # Stack Overflow API (no auth required for basic queries)
-                url = f"https://api.stackexchange.com/2.3/questions"
-                params = {
-                    'order': 'desc',
-                    'sort': 'activity',
-                    'tagged': tag,
-                    'site': 'stackoverflow',
-                    'pagesize': min(100, self.max_posts // len(self.tags))
-                }
-                
-                response = requests.get(url, params=params, timeout=10)
-                if response.status_code == 200:
-                    data = response.json()
-                    questions = data.get('items', [])
-                    
-                    for question in questions:
-                        problem = {
-                            'source': 'stackoverflow',
-                            'tag': tag,
-                            'title': question.get('title', ''),
-                            'text': '',  # Would need separate API call for body
-                            'url': question.get('link', ''),
-                            'score': question.get('score', 0),
-                            'view_count': question.get('view_count', 0),
-                            'answer_count': question.get('answer_count', 0),
-                            'created_utc': question.get('creation_date', 0),
-                            'timestamp': datetime.now().isoformat()
-                        }
-                        problems.append(problem)
-                        
-            except Exception as e:
-                print(f"Error scraping Stack Overflow tag '{tag}': {str(e)}")
-                continue
+        # Stack Overflow API (no auth required for basic queries). The
+        # built-in 'withbody' filter returns question bodies in the same call.
+        url = f"{self.API_URL}/questions"
+        params = {
+            'order': 'desc',
+            'sort': 'activity',
+            'tagged': tag,
+            'site': 'stackoverflow',
+            'filter': 'withbody',
+            'pagesize': min(100, self.max_posts // len(self.tags))
+        }
+        
+        response = self.session.get(url, params=params, timeout=10, stream=True)
+        with response:
+            if not self.check_response(response, strict):
+                return problems
+            
+            # Bodies are capped while parsing so a page holds at most
+            # pagesize truncated bodies
+            questions = []
+            for question in self.stream_items(response, ['items']):
+                if 'body' in question:
+                    question['body'] = truncate_text(question['body'], self.max_text_chars)
+                questions.append(question)
+        
+        # Backfill any bodies the list call did not return, batched
+        missing = [q['question_id'] for q in questions
+                   if 'body' not in q and 'question_id' in q]
+        if missing:
+            backfilled = self.fetch_bodies(missing, strict)
+            for question in questions:
+                if question.get('question_id') in backfilled:
+                    question['body'] = backfilled[question['question_id']]
+        
+        texts = self._strip_bodies([q.get('body', '') for q in questions])
+        
+        for question, text in zip(questions, texts):
+            problem = {
+                'source': 'stackoverflow',
+                'tag': tag,
+                'question_id': question.get('question_id'),
+                'title': truncate_text(question.get('title'), self.max_title_chars),
+                'text': truncate_text(text, self.max_text_chars),
+                'url': question.get('link', ''),
+                'score': question.get('score', 0),
+                'view_count': question.get('view_count', 0),
+                'answer_count': question.get('answer_count', 0),
+                'created_utc': question.get('creation_date', 0),
+                'timestamp': datetime.now().isoformat()
+            }
+            problems.append(problem)
         
         return problems
 
@@ -121,71 +288,129 @@ class StackOverflowScraper(ForumScraper):
 class GitHubScraper(ForumScraper):
     """Scraper for GitHub issues."""
     
-    def __init__(self, config: dict):
-        super().__init__(config)
+    name = 'github'
+    label = 'GitHub'
+    
+    def __init__(self, config: dict, session=None):
+        super().__init__(config, session)
         self.topics = config.get('github_topics', [])
         self.max_posts = config.get('max_posts_per_source', 100)
     
-    def scrape(self) -> List[Dict]:
-        """Scrape problems from GitHub issues."""
+    def targets(self) -> List[str]:
+        return list(self.topics)
+    
+    def describe(self, target: str) -> str:
+        return f"GitHub issues labelled '{target}'"
+    
+    def fetch(self, topic: str, strict: bool = False) -> List[Dict]:
+        """Search open issues across all repositories for a single label."""
         problems = []
         
-        # Search for issues across all repositories
-        try:
-            for topic in self.topics:
-                url = "https://api.github.com/search/issues"
-                params = {
-                    'q': f'is:issue is:open label:{topic}',
-                    'sort': 'updated',
-                    'order': 'desc',
-                    'per_page': min(100, self.max_posts // len(self.topics))
+        url = "https://api.github.com/search/issues"
+        params = {
+            'q': f'is:issue is:open label:{topic}',
+            'sort': 'updated',
+            'order': 'desc',
+            'per_page': min(100, self.max_posts // len(self.topics))
+        }
+        headers = {'Accept': 'application/vnd.github.v3+json'}
+        
+        response = self.session.get(url, params=params, headers=headers, timeout=10,
+                                    stream=True)
+        with response:
+            if not self.check_response(response, strict):
+                return problems
+            
+            # Issue bodies can be huge: they are capped item by item
+            for issue in self.stream_items(response, ['items']):
+                problem = {
+                    'source': 'github',
+                    'topic': topic,
+                    'title': truncate_text(issue.get('title'), self.max_title_chars),
+                    'text': truncate_text(issue.get('body'), self.max_text_chars),
+                    'url': issue.get('html_url', ''),
+                    'comments': issue.get('comments', 0),
+                    'created_at': issue.get('created_at', ''),
+                    'timestamp': datetime.now().isoformat()
                 }
-                headers = {'Accept': 'application/vnd.github.v3+json'}
-                
-                response = requests.get(url, params=params, headers=headers, timeout=10)
-                if response.status_code == 200:
-                    data = response.json()
-                    issues = data.get('items', [])
-                    
-                    for issue in issues:
-                        problem = {
-                            'source': 'github',
-                            'topic': topic,
-                            'title': issue.get('title', ''),
-                            'text': issue.get('body', ''),
-                            'url': issue.get('html_url', ''),
-                            'comments': issue.get('comments', 0),
-                            'created_at': issue.get('created_at', ''),
-                            'timestamp': datetime.now().isoformat()
-                        }
-                        problems.append(problem)
-                        
-        except Exception as e:
-            print(f"Error scraping GitHub issues: {str(e)}")
+                problems.append(problem)
         
         return problems
 
 
-def scrape_all_sources(config: dict) -> List[Dict]:
-    """Scrape all enabled sources and return combined problems."""
-    all_problems = []
-    enabled_sources = config.get('scraping', {}).get('enabled_sources', [])
+# Scraper classes by source name, in scraping order
+SCRAPERS = {
+    'reddit': RedditScraper,
+    'stackoverflow': StackOverflowScraper,
+    'github': GitHubScraper,
+}
+
+
+def create_scrapers(config: dict, session=None) -> List[ForumScraper]:
+    """Instantiate a scraper for every enabled source."""
     scraping_config = config.get('scraping', {})
+    enabled_sources = scraping_config.get('enabled_sources', [])
+    return [scraper_class(scraping_config, session)
+            for name, scraper_class in SCRAPERS.items()
+            if name in enabled_sources]
+
+
+def create_session(config: dict):
+    """Create the HTTP session used by the scrapers.
+
+    Honours the optional ``scraping.replay`` block of the configuration:
+    ``mode`` is ``"record"`` to capture live traffic into ``archive``,
+    ``"replay"`` to serve it back offline, or ``"off"`` (the default).
+    Live traffic goes through a ``hedging.HedgedSession`` when
+    ``scraping.hedging.enabled`` is set; replayed traffic never does.
+    """
+    replay_config = config.get('scraping', {}).get('replay', {})
+    hedging_config = config.get('scraping', {}).get('hedging', {})
+    mode = replay_config.get('mode', 'off')
+    archive = replay_config.get('archive', 'traffic.jsonl.gz')
+
+    if mode == 'replay':
+        from replay import TrafficReplayer
+        return TrafficReplayer(archive,
+                               realtime=replay_config.get('realtime', False),
+                               speed=replay_config.get('speed', 1.0))
+
+    session = requests.Session()
+    if hedging_config.get('enabled', False):
+        from hedging import HedgedSession
+        session = HedgedSession(session, hedging_config)
+    if mode == 'record':
+        from replay import TrafficRecorder
+        # Record above the hedging layer so hedged duplicates are not archived
+        return TrafficRecorder(archive, session=session)
+    return session
+
+
+def scrape_all_sources(config: dict, session=None, deduplicator=None) -> List[Dict]:
+    """Scrape all enabled sources and return combined problems.
+    
+    When a ``dedup.Deduplicator`` is given, duplicates (cross-posts, the same
+    question under several tags, ...) are dropped as each source is ingested.
+    With ``scraping.comments.enabled``, comment threads of the most engaged
+    problems are then fetched within the configured budget.
+    """
+    all_problems = []
     
-    if 'reddit' in enabled_sources:
-        print("Scraping Reddit...")
-        reddit_scraper = RedditScraper(scraping_config)
-        all_problems.extend(reddit_scraper.scrape())
+    for scraper in create_scrapers(config, session):
+        print(f"Scraping {scraper.label}...")
+        problems = scraper.scrape()
+        if deduplicator is not None:
+            problems = deduplicator.filter(problems)
+        all_problems.extend(problems)
     
-    if 'stackoverflow' in enabled_sources:
-        print("Scraping Stack Overflow...")
-        stackoverflow_scraper = StackOverflowScraper(scraping_config)
-        all_problems.extend(stackoverflow_scraper.scrape())
+    if deduplicator is not None:
+        print(deduplicator.report())
     
-    if 'github' in enabled_sources:
-        print("Scraping GitHub...")
-        github_scraper = GitHubScraper(scraping_config)
-        all_problems.extend(github_scraper.scrape())
+    from frontier import create_frontier
+    frontier = create_frontier(config, session)
+    if frontier is not None:
+        frontier.crawl(all_problems)
+        print(frontier.report())
     
     print(f"Total problems scraped: {len(all_problems)}")
     return all_problems
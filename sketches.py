@@ -0,0 +1,239 @@
+"""
+Fixed-memory heavy-hitter sketches for keyword counting.
+
+An exact ``Counter`` of keywords grows with the corpus vocabulary, and the
+long tail dominates memory at millions of posts although only the top 50
+are reported. These sketches keep a bounded number of counters instead and
+can stand in for the ``Counter`` in ``AnalysisState``: they offer
+``update``, ``most_common`` and ``merge`` (across pipeline workers, batch
+chunks or incremental runs).
+
+- ``SpaceSaving`` keeps ``ceil(1 / epsilon)`` counters. Reported counts
+  overestimate by at most ``epsilon * N`` (``N`` keywords seen), and every
+  keyword occurring more than ``epsilon * N`` times is kept. While the
+  vocabulary fits in the counters the counts are exact.
+- ``CountMinTopK`` is a Count-Min sketch of ``ceil(e / epsilon)`` x
+  ``ceil(ln(1 / delta))`` counters plus a small candidate heap; counts
+  overestimate by at most ``epsilon * N`` with probability ``1 - delta``.
+  The table is a numpy array allocated on the first update, so empty
+  sketches are cheap to create, pickle and merge.
+
+Per-slice counters (cube cells) only report a handful of keywords, so they
+are sized from ``cell_epsilon`` rather than the global ``epsilon``.
+"""
+import hashlib
+import heapq
+import math
+from collections import Counter
+from operator import itemgetter
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+
+def _pop_minimum(heap: List[Tuple[int, str]], counts: Dict[str, int]) -> Tuple[int, str]:
+    """Remove and return the smallest ``(count, key)`` still current in ``counts``.
+
+    Counts only grow, so a heap entry is either current or an underestimate.
+    Stale entries are re-pushed with their current count; the first current
+    entry popped is therefore a true minimum.
+    """
+    while True:
+        count, key = heapq.heappop(heap)
+        current = counts.get(key)
+        if current == count:
+            return count, key
+        if current is not None:
+            heapq.heappush(heap, (current, key))
+
+
+class SpaceSaving:
+    """Space-Saving summary of the most frequent keywords."""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.total = 0
+        self._heap: List[Tuple[int, str]] = []
+
+    def add(self, key: str, count: int = 1):
+        self.total += count
+        counts = self.counts
+        if key in counts:
+            counts[key] += count
+            return
+        if len(counts) < self.capacity:
+            counts[key] = count
+            self.errors[key] = 0
+        else:
+            # Replace the smallest counter; its count becomes the error bound
+            minimum, evicted = _pop_minimum(self._heap, counts)
+            del counts[evicted]
+            del self.errors[evicted]
+            counts[key] = minimum + count
+            self.errors[key] = minimum
+        heapq.heappush(self._heap, (counts[key], key))
+
+    def update(self, keys: Iterable[str]):
+        for key in keys:
+            self.add(key)
+
+    def _minimum(self) -> int:
+        # Absent keys may have occurred up to this many times
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def merge(self, other):
+        """Fold another summary (or an exact ``Counter``) into this one."""
+        if isinstance(other, Mapping):
+            for key, count in other.items():
+                self.add(key, count)
+            return
+
+        own_min, other_min = self._minimum(), other._minimum()
+        merged = {}
+        for key in self.counts.keys() | other.counts.keys():
+            merged[key] = (self.counts.get(key, own_min) + other.counts.get(key, other_min),
+                           self.errors.get(key, own_min) + other.errors.get(key, other_min))
+        kept = heapq.nlargest(self.capacity, merged.items(), key=lambda item: item[1][0])
+        self.counts = {key: count for key, (count, _) in kept}
+        self.errors = {key: error for key, (_, error) in kept}
+        self.total += other.total
+        self._heap = [(count, key) for key, count in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        if n is None:
+            return sorted(self.counts.items(), key=itemgetter(1), reverse=True)
+        return heapq.nlargest(n, self.counts.items(), key=itemgetter(1))
+
+    def error_bound(self) -> int:
+        """Maximum overestimate of any reported count."""
+        return self.total // self.capacity
+
+
+class CountMinTopK:
+    """Count-Min sketch with a bounded heap of top-keyword candidates."""
+
+    def __init__(self, epsilon: float, delta: float, candidates: int):
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = max(1, math.ceil(math.log(1 / delta)))
+        # depth x width table, allocated on first use
+        self.rows: Optional[np.ndarray] = None
+        self.capacity = max(1, candidates)
+        self.candidates: Dict[str, int] = {}
+        self.total = 0
+        self._heap: List[Tuple[int, str]] = []
+
+    def _indexes(self, key: str) -> List[int]:
+        # Double hashing from one stable 64-bit digest, so sketches built in
+        # different processes agree and can be merged
+        digest = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(),
+                                'little')
+        h1, h2 = digest & 0xFFFFFFFF, (digest >> 32) | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def _table(self) -> np.ndarray:
+        if self.rows is None:
+            self.rows = np.zeros((self.depth, self.width), dtype=np.int64)
+        return self.rows
+
+    def estimate(self, key: str) -> int:
+        if self.rows is None:
+            return 0
+        rows = self.rows
+        return int(min(rows[d, i] for d, i in enumerate(self._indexes(key))))
+
+    def _offer(self, key: str, estimate: int):
+        candidates = self.candidates
+        if key in candidates:
+            candidates[key] = estimate
+            return
+        if len(candidates) >= self.capacity:
+            if self._heap[0][0] >= estimate:
+                return
+            _, evicted = _pop_minimum(self._heap, candidates)
+            if candidates[evicted] >= estimate:
+                heapq.heappush(self._heap, (candidates[evicted], evicted))
+                return
+            del candidates[evicted]
+        candidates[key] = estimate
+        heapq.heappush(self._heap, (estimate, key))
+
+    def add(self, key: str, count: int = 1):
+        self.total += count
+        rows = self._table()
+        estimate = None
+        for d, i in enumerate(self._indexes(key)):
+            rows[d, i] += count
+            value = int(rows[d, i])
+            estimate = value if estimate is None else min(estimate, value)
+        self._offer(key, estimate)
+
+    def update(self, keys: Iterable[str]):
+        # One hash and table update per distinct keyword
+        for key, count in Counter(keys).items():
+            self.add(key, count)
+
+    def merge(self, other):
+        """Fold another sketch of the same shape (or an exact ``Counter``) in."""
+        if isinstance(other, Mapping):
+            for key, count in other.items():
+                self.add(key, count)
+            return
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Count-Min sketches of different shapes cannot be merged")
+
+        if other.rows is None:
+            return
+        if self.rows is None:
+            self.rows = other.rows.copy()
+        else:
+            self.rows += other.rows
+        self.total += other.total
+        keys = self.candidates.keys() | other.candidates.keys()
+        estimates = {key: self.estimate(key) for key in keys}
+        self.candidates = dict(heapq.nlargest(self.capacity, estimates.items(), key=itemgetter(1)))
+        self._heap = [(count, key) for key, count in self.candidates.items()]
+        heapq.heapify(self._heap)
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        if n is None:
+            return sorted(self.candidates.items(), key=itemgetter(1), reverse=True)
+        return heapq.nlargest(n, self.candidates.items(), key=itemgetter(1))
+
+    def error_bound(self) -> int:
+        """Overestimate bound that holds with probability ``1 - delta``."""
+        return math.ceil(math.e * self.total / self.width)
+
+
+def create_keyword_counter(sketch_config: Optional[dict], top_k: int, cell: bool = False):
+    """Build the keyword counter configured by ``analysis.keyword_sketch``.
+
+    Returns an exact ``Counter`` unless the sketch is enabled. ``cell``
+    counters (one per cube cell) use ``cell_epsilon``, by default
+    ``1 / (10 * top_k)``, instead of the global ``epsilon``.
+    """
+    sketch_config = sketch_config or {}
+    if not sketch_config.get('enabled', False):
+        return Counter()
+
+    if cell:
+        epsilon = sketch_config.get('cell_epsilon', 1 / (10 * max(1, top_k)))
+    else:
+        epsilon = sketch_config.get('epsilon', 0.0001)
+    algorithm = sketch_config.get('algorithm', 'space_saving')
+    if algorithm == 'space_saving':
+        return SpaceSaving(max(math.ceil(1 / epsilon), top_k))
+    if algorithm == 'count_min':
+        return CountMinTopK(epsilon, sketch_config.get('delta', 0.01),
+                            candidates=max(4 * top_k, sketch_config.get('candidates', 0)))
+    raise ValueError(f"Unknown keyword sketch algorithm: {algorithm}")
+
+
+def merge_counts(counts, other):
+    """Merge keyword counts that are either exact ``Counter``s or sketches."""
+    if isinstance(counts, Counter) and isinstance(other, Counter):
+        counts.update(other)
+    else:
+        counts.merge(other)
@@ -0,0 +1,504 @@
+"""
+Compact binary snapshot format for analysis results.
+
+A snapshot stores an analysis dict (as returned by
+``ProblemAnalyzer.analyze_problems``) in a versioned, columnar layout:
+
+    magic (8 bytes) | header length (u32) | header (JSON) | column sections
+
+Every column is a typed array (``array`` typecodes ``I``, ``q``, ``d`` or
+``B``) stored either raw or zlib-compressed, and aligned to 8 bytes so raw
+columns can be read straight out of a memory map. Repeated strings
+(titles, categories, sources, URLs, keywords) are interned into a single
+string table and referenced by id; an offsets column lets each string be
+decoded on its own. Sections are decoded lazily: serving the top problems
+never touches the keyword or category columns.
+
+Other analysis keys are stored as one JSON section each. Cube cells
+(``cubes``) get a section per cell plus a small index of cell names, so a
+slice lookup parses one cell. In uncompressed snapshots the string table and
+JSON sections are read straight from the mapped file, so a process holds
+only what the current request decodes.
+"""
+import json
+import mmap
+import os
+import sys
+import threading
+import zlib
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Dict, List, Optional, Union
+
+
+MAGIC = b'AABSNAP\x00'
+FORMAT_VERSION = 2
+# Version 1 stored all non-core keys in a single 'extra' JSON section
+READABLE_VERSIONS = (1, 2)
+ALIGNMENT = 8
+
+# Keys of a top-problem group stored as dedicated columns.
+_GROUP_KEYS = ('title', 'keywords', 'category', 'count', 'total_engagement',
+               'examples', 'priority', 'users_affected')
+_CORE_KEYS = ('total_problems', 'top_problems', 'top_keywords', 'categories', 'sources')
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot cannot be decoded."""
+
+
+class _StringTable:
+    """Interns strings into sequential ids while building a snapshot."""
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def intern(self, value) -> int:
+        value = '' if value is None else str(value)
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = len(self.values)
+            self.ids[value] = string_id
+            self.values.append(value)
+        return string_id
+
+
+def _numeric_column(values) -> array:
+    """Store integers as int64 and anything else as float64."""
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        return array('q', values)
+    return array('d', (float(v) for v in values))
+
+
+def _encode_columns(analysis: Dict) -> Dict[str, object]:
+    """Split an analysis dict into named columns plus an interned string table."""
+    strings = _StringTable()
+    columns = {}
+
+    groups = analysis.get('top_problems', [])
+    kw_offsets, kw_ids = [0], []
+    ex_offsets, ex_title, ex_url, ex_source = [0], [], [], []
+    group_extra = []
+    for group in groups:
+        kw_ids.extend(strings.intern(k) for k in group.get('keywords', []))
+        kw_offsets.append(len(kw_ids))
+        for example in group.get('examples', []):
+            ex_title.append(strings.intern(example.get('title')))
+            ex_url.append(strings.intern(example.get('url')))
+            ex_source.append(strings.intern(example.get('source')))
+        ex_offsets.append(len(ex_title))
+        group_extra.append({k: v for k, v in group.items() if k not in _GROUP_KEYS} or None)
+
+    columns['tp.title'] = array('I', (strings.intern(g.get('title')) for g in groups))
+    columns['tp.category'] = array('I', (strings.intern(g.get('category')) for g in groups))
+    columns['tp.count'] = _numeric_column([g.get('count', 0) for g in groups])
+    columns['tp.total_engagement'] = _numeric_column([g.get('total_engagement', 0) for g in groups])
+    columns['tp.priority'] = _numeric_column([g.get('priority', 0) for g in groups])
+    columns['tp.users_affected'] = _numeric_column([g.get('users_affected', 0) for g in groups])
+    columns['tp.kw_offsets'] = array('I', kw_offsets)
+    columns['tp.kw_ids'] = array('I', kw_ids)
+    columns['tp.ex_offsets'] = array('I', ex_offsets)
+    columns['tp.ex_title'] = array('I', ex_title)
+    columns['tp.ex_url'] = array('I', ex_url)
+    columns['tp.ex_source'] = array('I', ex_source)
+    if any(group_extra):
+        columns['tp.extra'] = group_extra
+
+    keywords = analysis.get('top_keywords', [])
+    columns['kw.term'] = array('I', (strings.intern(term) for term, _ in keywords))
+    columns['kw.count'] = _numeric_column([count for _, count in keywords])
+
+    for prefix, key in (('cat', 'categories'), ('src', 'sources')):
+        counts = analysis.get(key, {})
+        columns[f'{prefix}.name'] = array('I', (strings.intern(name) for name in counts))
+        columns[f'{prefix}.count'] = _numeric_column(list(counts.values()))
+
+    for key, value in analysis.items():
+        if key in _CORE_KEYS:
+            continue
+        if key == 'cubes' and isinstance(value, Mapping):
+            columns['cubes.index'] = _encode_cells(value, columns)
+        else:
+            columns[f'extra.{key}'] = value
+
+    # The string table is one NUL-separated blob, so a full decode is a
+    # single split; string i spans offsets[i]:offsets[i + 1] - 1, so single
+    # strings can be decoded without touching the rest
+    blob = bytearray()
+    offsets = array('I', [0])
+    for value in strings.values:
+        blob.extend(value.encode('utf-8'))
+        blob.append(0)
+        offsets.append(len(blob))
+    columns['str.offsets'] = offsets
+    columns['str.data'] = array('B', bytes(blob))
+
+    return columns
+
+
+def _encode_cells(tree: Mapping, columns: Dict[str, object]) -> Dict:
+    """Store each cube cell as its own JSON section; return the name index.
+
+    A cell is a mapping with ``total_problems``; anything else (a cube, or
+    the sources of a category in ``category_source``) is descended into.
+    """
+    index = {}
+    for name, value in tree.items():
+        if isinstance(value, Mapping) and 'total_problems' not in value:
+            index[name] = _encode_cells(value, columns)
+        else:
+            section = f'cube.{len(columns)}'
+            columns[section] = value
+            index[name] = section
+    return index
+
+
+def dumps_snapshot(analysis: Dict, timestamp: Optional[str] = None,
+                   compress: bool = True, meta: Optional[Dict] = None) -> bytes:
+    """Serialize an analysis dict to snapshot bytes.
+
+    With ``compress=False`` every column is stored raw so readers can map
+    it without copying; otherwise columns are zlib-compressed.
+    """
+    columns = _encode_columns(analysis)
+
+    payloads = []
+    for name, column in columns.items():
+        if isinstance(column, array):
+            typecode = column.typecode
+            raw = column.tobytes()
+        else:
+            typecode = 'json'
+            raw = json.dumps(column, separators=(',', ':')).encode('utf-8')
+        codec = 'raw'
+        if compress:
+            packed = zlib.compress(raw, 6)
+            if len(packed) < len(raw):
+                raw, codec = packed, 'zlib'
+        payloads.append((name, typecode, codec, raw))
+
+    header = {
+        'version': FORMAT_VERSION,
+        'byteorder': sys.byteorder,
+        'total_problems': analysis.get('total_problems', 0),
+        'timestamp': timestamp,
+        'keys': list(analysis.keys()),
+        'meta': meta or {},
+        'sections': {},
+    }
+
+    # Offsets depend on the header length, so lay the sections out relative
+    # to the start of the data area and fix them up once the header is sized.
+    layout, position = [], 0
+    for name, typecode, codec, raw in payloads:
+        position += -position % ALIGNMENT
+        layout.append((name, typecode, codec, position, raw))
+        position += len(raw)
+
+    data_start = 0
+    while True:
+        header['sections'] = {
+            name: [data_start + offset, len(raw), typecode, codec]
+            for name, typecode, codec, offset, raw in layout
+        }
+        header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        prefix_len = len(MAGIC) + 4 + len(header_bytes)
+        aligned_start = prefix_len + (-prefix_len % ALIGNMENT)
+        if aligned_start <= data_start:
+            break
+        data_start = aligned_start
+
+    out = bytearray(MAGIC)
+    out.extend(len(header_bytes).to_bytes(4, 'little'))
+    out.extend(header_bytes)
+    for name, typecode, codec, offset, raw in layout:
+        out.extend(b'\x00' * (data_start + offset - len(out)))
+        out.extend(raw)
+    return bytes(out)
+
+
+def write_snapshot(path: str, analysis: Dict, timestamp: Optional[str] = None,
+                   compress: bool = True, meta: Optional[Dict] = None) -> int:
+    """Atomically write an analysis snapshot to ``path``; returns its size."""
+    data = dumps_snapshot(analysis, timestamp=timestamp, compress=compress, meta=meta)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+class Snapshot(Mapping):
+    """Read-only, lazily decoded view of a snapshot.
+
+    Behaves like the analysis dict it was written from: sections are only
+    decoded the first time their key is accessed, and decoded values are
+    cached on the instance.
+    """
+
+    def __init__(self, buffer, mapped_file=None):
+        self._buffer = buffer
+        self._mapped_file = mapped_file
+        self._cache = {}
+        self._views = []
+        self._lock = threading.Lock()
+
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise SnapshotError('Not an analysis snapshot')
+        header_len = int.from_bytes(buffer[len(MAGIC):len(MAGIC) + 4], 'little')
+        start = len(MAGIC) + 4
+        self.header = json.loads(bytes(buffer[start:start + header_len]))
+        if self.header.get('version') not in READABLE_VERSIONS:
+            raise SnapshotError(f"Unsupported snapshot version: {self.header.get('version')}")
+        self._sections = self.header['sections']
+        self._swap = self.header.get('byteorder', sys.byteorder) != sys.byteorder
+
+    @classmethod
+    def open(cls, path: str) -> 'Snapshot':
+        """Memory-map a snapshot file."""
+        f = open(path, 'rb')
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+        return cls(mapped, mapped_file=mapped)
+
+    @property
+    def timestamp(self) -> Optional[str]:
+        return self.header.get('timestamp')
+
+    @property
+    def meta(self) -> Dict:
+        return self.header.get('meta', {})
+
+    def close(self):
+        """Unmap the file; decoded sections must not be used afterwards."""
+        for view in self._views:
+            view.release()
+        self._views.clear()
+        self._cache.clear()
+        if self._mapped_file is not None:
+            self._mapped_file.close()
+            self._mapped_file = None
+
+    # Column access -----------------------------------------------------
+
+    def _column(self, name: str, zero_copy: bool = False):
+        """Decode a column to a list.
+        
+        With ``zero_copy=True`` raw array columns are returned as typed
+        memoryviews over the mapped file instead, so processes mapping the
+        same snapshot share its pages rather than holding private copies.
+        """
+        if name not in self._sections:
+            return None
+        offset, length, typecode, codec = self._sections[name]
+        if (zero_copy and codec == 'raw' and typecode != 'json'
+                and (typecode == 'B' or not self._swap)):
+            view = memoryview(self._buffer)[offset:offset + length].cast(typecode)
+            self._views.append(view)
+            return view
+        with memoryview(self._buffer)[offset:offset + length] as view:
+            raw = zlib.decompress(view) if codec == 'zlib' else view
+            if typecode == 'json':
+                return json.loads(bytes(raw))
+            if typecode == 'B':
+                return bytes(raw)
+            if codec == 'raw' and not self._swap:
+                with view.cast(typecode) as typed:
+                    return typed.tolist()
+            column = array(typecode)
+            column.frombytes(raw)
+            if self._swap:
+                column.byteswap()
+            return column.tolist()
+
+    def _string_table(self) -> Union['StringTable', List[str]]:
+        strings = self._cache.get('strings')
+        if strings is None:
+            data = self._column('str.data', zero_copy=True)
+            offsets = self._column('str.offsets', zero_copy=True)
+            if self.header['version'] >= 2:
+                strings = StringTable(data, offsets)
+            elif offsets is None:
+                # Version 1: a NUL-separated blob...
+                strings = bytes(data).decode('utf-8').split('\x00')
+            else:
+                # ...or, if a string contained NUL, unseparated with offsets
+                strings = [bytes(data[offsets[i]:offsets[i + 1]]).decode('utf-8')
+                           for i in range(len(offsets) - 1)]
+            self._cache['strings'] = strings
+        return strings
+
+    # Section decoders --------------------------------------------------
+
+    def _decode_top_problems(self) -> 'TopProblems':
+        columns = {name[3:]: self._column(name, zero_copy=True) for name in self._sections
+                   if name.startswith('tp.')}
+        return TopProblems(columns, self._string_table())
+
+    def _decode(self, key: str):
+        if key == 'total_problems':
+            return self.header.get('total_problems', 0)
+        if key == 'top_problems':
+            return self._decode_top_problems()
+        strings = self._string_table()
+        if key == 'top_keywords':
+            return [(strings[t], c) for t, c in zip(self._column('kw.term'), self._column('kw.count'))]
+        if key == 'categories':
+            return {strings[n]: c for n, c in zip(self._column('cat.name'), self._column('cat.count'))}
+        if key == 'sources':
+            return {strings[n]: c for n, c in zip(self._column('src.name'), self._column('src.count'))}
+        if key == 'cubes' and 'cubes.index' in self._sections:
+            return CubeCells(self, self._column('cubes.index'))
+        if f'extra.{key}' in self._sections:
+            return self._column(f'extra.{key}')
+        extra = self._cache.get('extra')
+        if extra is None:
+            extra = self._cache['extra'] = self._column('extra') or {}
+        return extra[key]
+
+    # Mapping interface -------------------------------------------------
+
+    def __getitem__(self, key: str):
+        if key not in self.header['keys']:
+            raise KeyError(key)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = self._decode(key)
+            return self._cache[key]
+
+    def __iter__(self):
+        return iter(self.header['keys'])
+
+    def __len__(self) -> int:
+        return len(self.header['keys'])
+
+    def to_dict(self) -> Dict:
+        """Fully decode the snapshot into a plain analysis dict."""
+        return {key: _materialize(value) for key, value in self.items()}
+
+
+def _materialize(value):
+    if isinstance(value, TopProblems):
+        # Decode each interned string once rather than once per reference
+        return list(TopProblems(value._columns, list(value._strings)))
+    if isinstance(value, CubeCells):
+        return {name: _materialize(cell) for name, cell in value.items()}
+    return value
+
+
+class StringTable(Sequence):
+    """Interned strings decoded one at a time from the snapshot blob."""
+
+    def __init__(self, data, offsets):
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return str(self._data[self._offsets[index]:self._offsets[index + 1] - 1], 'utf-8')
+
+    def __iter__(self):
+        strings = str(self._data, 'utf-8').split('\x00')[:-1]
+        if len(strings) != len(self):
+            # Some strings contain NUL themselves
+            strings = [self[i] for i in range(len(self))]
+        return iter(strings)
+
+
+class CubeCells(Mapping):
+    """Cube cells by name; each cell is parsed from its section on access
+    and not cached, so serving one slice never decodes the others."""
+
+    def __init__(self, snapshot: 'Snapshot', index: Dict):
+        self._snapshot = snapshot
+        self._index = index
+
+    def __getitem__(self, name: str):
+        entry = self._index[name]
+        if isinstance(entry, dict):
+            return CubeCells(self._snapshot, entry)
+        return self._snapshot._column(entry)
+
+    def __contains__(self, name) -> bool:
+        return name in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class TopProblems(Sequence):
+    """Top-problem groups backed by decoded columns.
+
+    Rows are only turned into dicts when they are accessed, and are not
+    cached, so serving ``/api/top-problems?limit=N`` costs O(N) regardless of
+    snapshot size and leaves nothing behind.
+    """
+
+    def __init__(self, columns: Dict[str, list], strings: Sequence):
+        self._columns = columns
+        self._strings = strings
+        self._extras = columns.get('extra')
+
+    def __len__(self) -> int:
+        return len(self._columns['title'])
+
+    def _row(self, i: int) -> Dict:
+        c, s = self._columns, self._strings
+        kw_start, kw_end = c['kw_offsets'][i], c['kw_offsets'][i + 1]
+        ex_start, ex_end = c['ex_offsets'][i], c['ex_offsets'][i + 1]
+        group = {
+            'title': s[c['title'][i]],
+            'keywords': [s[k] for k in c['kw_ids'][kw_start:kw_end]],
+            'category': s[c['category'][i]],
+            'count': c['count'][i],
+            'total_engagement': c['total_engagement'][i],
+            'examples': [
+                {'title': s[t], 'url': s[u], 'source': s[src]}
+                for t, u, src in zip(c['ex_title'][ex_start:ex_end],
+                                     c['ex_url'][ex_start:ex_end],
+                                     c['ex_source'][ex_start:ex_end])
+            ],
+            'priority': c['priority'][i],
+            'users_affected': c['users_affected'][i],
+        }
+        if self._extras and self._extras[i]:
+            group.update(self._extras[i])
+        return group
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('top problem index out of range')
+        return self._row(index)
+
+
+_cache_lock = threading.Lock()
+_snapshot_cache = {}
+
+
+def load_snapshot(path: str) -> Snapshot:
+    """Open a snapshot file, reusing the cached instance while it is unchanged."""
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _snapshot_cache.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        snapshot = Snapshot.open(path)
+        _snapshot_cache[path] = (signature, snapshot)
+        return snapshot
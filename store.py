@@ -0,0 +1,252 @@
+"""
+Copy-on-write publication of analysis results.
+
+Each analysis is wrapped in an immutable, versioned ``AnalysisSnapshot``
+that is published by swapping a single reference. Readers grab the current
+snapshot once and use only that object for the rest of the request, so they
+never block, never take a lock, and can never see a new analysis paired
+with an old timestamp. Only publishers serialize among themselves.
+
+For multi-process deployments (e.g. gunicorn with several workers)
+``SharedAnalysisStore`` keeps the published snapshot in a memory-mapped file
+instead, so every worker maps the same pages and serves the same data.
+"""
+import glob
+import gzip
+import itertools
+import json
+import mmap
+import os
+import tempfile
+import threading
+from collections import deque
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Mapping, Optional
+
+from snapshot import Snapshot, write_snapshot
+
+
+@dataclass(frozen=True)
+class AnalysisSnapshot:
+    """An analysis result together with its version and publication time.
+
+    The analysis mapping is shared by every reader and must not be mutated
+    after publication; build a new one and publish it instead. ``problems``
+    holds the raw problems behind the analysis when they were retained.
+    """
+    version: int
+    analysis: Optional[Mapping]
+    timestamp: Optional[str]
+    problems: Optional[Iterable[Dict]] = None
+
+    @property
+    def empty(self) -> bool:
+        return self.analysis is None
+
+
+class ProblemArchive:
+    """Raw problems stored as gzipped NDJSON, re-read on each iteration."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @staticmethod
+    def write(path: str, problems: Iterable[Dict]):
+        tmp_path = path + '.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=5) as f:
+            for problem in problems:
+                f.write(json.dumps(problem, separators=(',', ':')) + '\n')
+        os.replace(tmp_path, path)
+
+    def __iter__(self) -> Iterator[Dict]:
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+
+class AnalysisStore:
+    """Holds the current analysis snapshot for concurrent API readers.
+
+    The last ``history`` snapshots stay available through ``get`` so clients
+    can ask what changed between versions. Raw problems are only kept on the
+    current snapshot; older versions drop them when they are superseded.
+    """
+
+    def __init__(self, history: int = 8):
+        self._versions = itertools.count(1)
+        self._publish_lock = threading.Lock()
+        self._current = AnalysisSnapshot(version=0, analysis=None, timestamp=None)
+        self._history = deque(maxlen=max(1, history))
+
+    def current(self) -> AnalysisSnapshot:
+        """Return the latest snapshot. Lock-free: a single reference read."""
+        return self._current
+
+    def publish(self, analysis: Mapping, timestamp: Optional[str] = None,
+                problems: Optional[Iterable[Dict]] = None,
+                expected_version: Optional[int] = None) -> Optional[AnalysisSnapshot]:
+        """Publish a new analysis as the next version and return its snapshot.
+
+        With ``expected_version``, nothing is published (and None returned)
+        unless that version is still the current one.
+        """
+        with self._publish_lock:
+            if expected_version is not None and self._current.version != expected_version:
+                return None
+            snapshot = AnalysisSnapshot(
+                version=next(self._versions),
+                analysis=analysis,
+                timestamp=timestamp or datetime.now().isoformat(),
+                problems=problems
+            )
+            previous = self._current
+            if previous.problems is not None and self._history and self._history[-1] is previous:
+                # Readers already holding the old snapshot keep its problems
+                self._history[-1] = replace(previous, problems=None)
+            self._history.append(snapshot)
+            # The swap itself is one atomic reference assignment
+            self._current = snapshot
+        return snapshot
+
+    def get(self, version: int) -> Optional[AnalysisSnapshot]:
+        """Return a retained snapshot by version, or None if it is gone."""
+        for snapshot in list(self._history):
+            if snapshot.version == version:
+                return snapshot
+        return None
+
+
+class SharedAnalysisStore:
+    """Analysis store shared by every process that opens the same directory.
+
+    Each publication writes an uncompressed snapshot file
+    ``analysis-<generation>.snap`` and then bumps a 64-bit generation
+    counter held in a small memory-mapped file. Readers compare the counter
+    with the generation they last mapped and, when it moved, map the new
+    snapshot read-only. Raw columns are read straight from the page cache,
+    so memory stays flat as workers are added. The generation doubles as
+    the snapshot version. Raw problems, when given, are written alongside
+    as ``problems-<generation>.jsonl.gz``.
+    """
+
+    GENERATION_FILE = 'generation'
+    LOCK_FILE = 'publish.lock'
+
+    def __init__(self, directory: str, keep: int = 8):
+        import fcntl
+        self._fcntl = fcntl
+
+        self.directory = directory
+        self.keep = max(1, keep)
+        os.makedirs(directory, exist_ok=True)
+
+        generation_path = os.path.join(directory, self.GENERATION_FILE)
+        fd = os.open(generation_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < 8:
+                os.ftruncate(fd, 8)
+            self._generation = mmap.mmap(fd, 8)
+        finally:
+            os.close(fd)
+
+        self._lock_path = os.path.join(directory, self.LOCK_FILE)
+        self._publish_lock = threading.Lock()
+        self._current = AnalysisSnapshot(version=0, analysis=None, timestamp=None)
+
+    def _snapshot_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"analysis-{generation}.snap")
+
+    def _problems_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"problems-{generation}.jsonl.gz")
+
+    def generation(self) -> int:
+        """Return the latest published generation."""
+        return int.from_bytes(self._generation[:8], 'little')
+
+    def _map(self, generation: int) -> Optional[AnalysisSnapshot]:
+        try:
+            snap = Snapshot.open(self._snapshot_path(generation))
+        except FileNotFoundError:
+            return None
+        problems_path = self._problems_path(generation)
+        problems = ProblemArchive(problems_path) if os.path.exists(problems_path) else None
+        return AnalysisSnapshot(version=generation, analysis=snap, timestamp=snap.timestamp,
+                                problems=problems)
+
+    def current(self) -> AnalysisSnapshot:
+        """Return the latest snapshot, mapping a new generation if needed.
+
+        Lock-free: concurrent readers that notice a new generation may each
+        map it, and the last reference swap wins.
+        """
+        current = self._current
+        generation = self.generation()
+        if generation == current.version:
+            return current
+        mapped = self._map(generation)
+        if mapped is None:
+            return current
+        self._current = mapped
+        return mapped
+
+    def get(self, version: int) -> Optional[AnalysisSnapshot]:
+        """Return one of the last ``keep`` generations, or None if pruned."""
+        current = self.current()
+        if version == current.version:
+            return current
+        if version <= 0 or version > current.version:
+            return None
+        return self._map(version)
+
+    def publish(self, analysis: Mapping, timestamp: Optional[str] = None,
+                problems: Optional[Iterable[Dict]] = None,
+                expected_version: Optional[int] = None) -> Optional[AnalysisSnapshot]:
+        """Write the analysis as the next generation visible to all processes.
+
+        With ``expected_version``, nothing is published (and None returned)
+        unless that generation is still the latest one.
+        """
+        timestamp = timestamp or datetime.now().isoformat()
+        with self._publish_lock, open(self._lock_path, 'w') as lock_file:
+            self._fcntl.flock(lock_file, self._fcntl.LOCK_EX)
+            try:
+                if expected_version is not None and self.generation() != expected_version:
+                    return None
+                generation = self.generation() + 1
+                if problems is not None:
+                    ProblemArchive.write(self._problems_path(generation), problems)
+                write_snapshot(self._snapshot_path(generation), analysis,
+                               timestamp=timestamp, compress=False)
+                self._generation[:8] = generation.to_bytes(8, 'little')
+                self._generation.flush()
+                self._prune(generation)
+            finally:
+                self._fcntl.flock(lock_file, self._fcntl.LOCK_UN)
+        return self.current()
+
+    def _prune(self, generation: int):
+        # Processes that still map (or stream) an unlinked file keep reading
+        # it safely
+        for pattern, prefix, suffix in (('analysis-*.snap', 'analysis-', '.snap'),
+                                        ('problems-*.jsonl.gz', 'problems-', '.jsonl.gz')):
+            for path in glob.glob(os.path.join(self.directory, pattern)):
+                try:
+                    old = int(os.path.basename(path)[len(prefix):-len(suffix)])
+                except ValueError:
+                    continue
+                if old <= generation - self.keep:
+                    os.remove(path)
+
+
+def create_store(config: dict):
+    """Build the analysis store configured under ``server.shared_snapshot``."""
+    shared_config = config.get('server', {}).get('shared_snapshot', {})
+    if not shared_config.get('enabled', False):
+        return AnalysisStore(history=config.get('server', {}).get('history', 8))
+
+    directory = shared_config.get('directory')
+    if not directory:
+        base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        directory = os.path.join(base, 'autonomous-app-builder')
+    return SharedAnalysisStore(directory, keep=shared_config.get('keep', 8))
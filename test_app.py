@@ -101,6 +101,26 @@ def test_scraping():
         print(f"❌ Categories test failed: {e}")
         return False
     
+    # Test 6: Check per-category and per-source analysis
+    print("\n6. Testing per-category and per-source analysis...")
+    try:
+        if categories:
+            category = next(iter(categories))
+            response = requests.get(f"{base_url}/api/categories/{category}/analysis")
+            cell = response.json().get('analysis', {})
+            print(f"   {category}: {cell.get('total_problems', 0)} problems, "
+                  f"{len(cell.get('top_problems', []))} top groups")
+        response = requests.get(f"{base_url}/api/stats")
+        for source in response.json().get('sources', {}):
+            response = requests.get(f"{base_url}/api/sources/{source}/analysis")
+            cell = response.json().get('analysis', {})
+            print(f"   {source}: {cell.get('total_problems', 0)} problems, "
+                  f"engagement {cell.get('total_engagement', 0)}")
+        print("✅ Slice endpoints working")
+    except Exception as e:
+        print(f"❌ Slice analysis test failed: {e}")
+        return False
+    
     print("\n" + "=" * 50)
     print("✅ All tests passed successfully!")
     print("\n📊 You can now view the dashboard at http://localhost:5000")
@@ -0,0 +1,57 @@
+"""
+Tests for headless batch analysis (batch.py).
+"""
+import json
+import os
+import tempfile
+
+from analyzer import ProblemAnalyzer
+from batch import BatchAnalyzer
+
+
+CONFIG = {'analysis': {'min_problem_mentions': 2}}
+
+
+def problems(count=40):
+    return [{'title': 'Login fails after password reset', 'text': '', 'source': 'reddit',
+             'url': f'https://example.com/{i}', 'score': i}
+            for i in range(count)]
+
+
+def write_jsonl(items):
+    path = os.path.join(tempfile.mkdtemp(), 'dump.jsonl')
+    with open(path, 'w') as f:
+        for item in items:
+            f.write(json.dumps(item) + '\n')
+        f.write('not json\n')
+    return path
+
+
+def test_web_analysis_keeps_every_example():
+    analysis = ProblemAnalyzer(CONFIG).analyze_problems(problems())
+    assert len(analysis['top_problems'][0]['examples']) == 40
+
+
+def test_batch_caps_examples_and_matches_sequential():
+    path = write_jsonl(problems())
+    for workers in (1, 2):
+        batch = BatchAnalyzer(CONFIG, workers=workers, chunk_size=7, group_examples=3)
+        analysis = batch.run([path])
+        assert batch.stats['lines'] == 41 and batch.stats['bad_lines'] == 1
+
+        analyzer = ProblemAnalyzer(CONFIG)
+        analyzer.group_examples = 3
+        expected = analyzer.analyze_problems(problems())
+        assert analysis['top_problems'] == expected['top_problems']
+        assert [e['url'] for e in analysis['top_problems'][0]['examples']] == [
+            'https://example.com/0', 'https://example.com/1', 'https://example.com/2']
+
+
+def test_batch_caps_text_fields():
+    config = dict(CONFIG, scraping={'limits': {'max_title_chars': 5, 'max_text_chars': 8}})
+    path = write_jsonl([dict(problem, text='crashes ' + 'padding ' * 100 + 'zebra')
+                        for problem in problems(4)])
+    analysis = BatchAnalyzer(config, group_examples=1).run([path])
+    assert analysis['top_problems'][0]['examples'][0]['title'] == 'Login'
+    keywords = dict(analysis['top_keywords'])
+    assert 'crashes' in keywords and 'padding' not in keywords and 'zebra' not in keywords
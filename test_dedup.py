@@ -0,0 +1,86 @@
+"""
+Tests for URL canonicalisation and content fingerprinting (dedup.py).
+"""
+from dedup import (BloomFilter, Deduplicator, canonicalize_url, fingerprint,
+                   normalize_content)
+
+
+def test_canonical_reddit_urls():
+    canonical = 'https://reddit.com/comments/abc123'
+    for url in ('https://www.reddit.com/r/webdev/comments/abc123/login_fails/',
+                'http://old.reddit.com/r/WebDev/comments/abc123/?utm_source=share',
+                'https://np.reddit.com/comments/abc123#thing'):
+        assert canonicalize_url(url) == canonical
+
+
+def test_canonical_stackoverflow_urls():
+    canonical = 'https://stackoverflow.com/questions/42'
+    for url in ('https://stackoverflow.com/questions/42/why-does-login-fail',
+                'https://stackoverflow.com/q/42',
+                'https://www.stackoverflow.com/questions/42/slug?noredirect=1#answer-7'):
+        assert canonicalize_url(url) == canonical
+
+
+def test_canonical_github_urls():
+    assert (canonicalize_url('https://github.com/Owner/Repo/issues/7/')
+            == canonicalize_url('https://github.com/owner/repo/issues/7#issuecomment-1'))
+    assert (canonicalize_url('https://github.com/owner/repo/issues/7')
+            != canonicalize_url('https://github.com/owner/repo/pull/7'))
+
+
+def test_meaningful_query_is_kept():
+    assert (canonicalize_url('https://example.com/search?q=a&utm_medium=x')
+            != canonicalize_url('https://example.com/search?q=b'))
+    assert canonicalize_url('') == ''
+
+
+def test_content_normalization():
+    first = {'title': 'Login FAILS after upgrade!', 'text': 'https://example.com/x'}
+    second = {'title': '[x-post from r/webdev] login fails, after upgrade', 'text': None}
+    assert normalize_content(first) == normalize_content(second) == 'login fails after upgrade'
+
+
+def test_fingerprint_is_stable_64_bit():
+    value = fingerprint('text:login fails after upgrade')
+    assert value == fingerprint('text:login fails after upgrade')
+    assert 0 <= value < 2 ** 64
+    assert value != fingerprint('text:login fails after upgrading')
+
+
+def test_drop_mode():
+    dedup = Deduplicator({'mode': 'drop'})
+    problems = [
+        {'url': 'https://www.reddit.com/r/a/comments/x1/t/', 'title': 'Database migrations hang forever on startup'},
+        {'url': 'https://old.reddit.com/r/b/comments/x1/', 'title': 'Something else'},
+        {'url': 'https://reddit.com/comments/x2', 'title': 'Database migrations hang forever on startup'},
+        {'url': 'https://reddit.com/comments/x3', 'title': 'Help!'},
+        {'url': 'https://reddit.com/comments/x4', 'title': 'Help!'},
+    ]
+    kept = dedup.filter(problems)
+    assert kept == [problems[0], problems[3], problems[4]]
+    assert dedup.stats['url_duplicates'] == 1
+    assert dedup.stats['content_duplicates'] == 1
+    assert dedup.dropped == 2
+
+
+def test_merge_mode_records_duplicates():
+    dedup = Deduplicator({'mode': 'merge'})
+    first = {'source': 'stackoverflow', 'url': 'https://stackoverflow.com/q/1', 'title': 'x'}
+    second = {'source': 'stackoverflow', 'url': 'https://stackoverflow.com/questions/1/x', 'title': 'x'}
+    assert dedup.add(first)
+    assert not dedup.add(second)
+    assert first['duplicates'] == [{'source': 'stackoverflow', 'url': second['url']}]
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(1000, 0.01)
+    keys = [fingerprint(str(i)) for i in range(1000)]
+    assert sum(bloom.add(key) for key in keys) < 20
+    assert all(bloom.add(key) for key in keys)
+    # Probe unseen keys against the filled filter without growing it
+    filled = bytes(bloom.bits)
+    false_positives = 0
+    for i in range(1000):
+        false_positives += bloom.add(fingerprint(f'other-{i}'))
+        bloom.bits = bytearray(filled)
+    assert false_positives < 30
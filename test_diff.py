@@ -0,0 +1,59 @@
+"""
+Tests for differences between published analyses (diff.py).
+"""
+from diff import diff_analyses, group_key
+
+
+def group(keywords, count, title=None):
+    return {'title': title or ' '.join(keywords), 'keywords': keywords, 'category': 'General',
+            'count': count, 'priority': count * 10.0}
+
+
+OLD = {
+    'total_problems': 10,
+    'top_problems': [group(['login', 'fails'], 5), group(['slow', 'query'], 3),
+                     group(['docker', 'crash'], 2)],
+    'top_keywords': [('login', 6), ('slow', 3)],
+    'categories': {'Authentication': 6, 'Database': 4},
+    'sources': {'reddit': 10},
+}
+NEW = {
+    'total_problems': 14,
+    # Same group with its keywords in another order and a new representative title
+    'top_problems': [group(['slow', 'query'], 6), group(['fails', 'login'], 5, 'Cannot log in'),
+                     group(['react', 'render'], 3)],
+    'top_keywords': [('login', 6), ('slow', 7), ('react', 3)],
+    'categories': {'Authentication': 6, 'Database': 5, 'Frontend': 3},
+    'sources': {'reddit': 11, 'github': 3},
+}
+
+
+def test_group_key_ignores_keyword_order():
+    assert group_key({'keywords': ['login', 'fails']}) == group_key({'keywords': ['fails', 'login']})
+    assert group_key({}) == ''
+
+
+def test_top_problems_matched_by_group_key():
+    changes = diff_analyses(OLD, NEW)['top_problems']
+    assert [(g['key'], g['rank']) for g in changes['new']] == [('react render', 3)]
+    assert changes['new'][0]['count'] == 3
+    assert [(g['key'], g['rank']) for g in changes['dropped']] == [('crash docker', 3)]
+    moved = {g['key']: (g['from_rank'], g['rank'], g['count_delta']) for g in changes['moved']}
+    assert moved == {'query slow': (2, 1, 3), 'fails login': (1, 2, 0)}
+
+
+def test_count_deltas():
+    diff = diff_analyses(OLD, NEW, keyword_limit=2)
+    assert diff['total_problems'] == {'from': 10, 'to': 14, 'delta': 4}
+    assert diff['categories'] == {'Database': {'from': 4, 'to': 5, 'delta': 1},
+                                  'Frontend': {'from': 0, 'to': 3, 'delta': 3}}
+    assert diff['sources'] == {'reddit': {'from': 10, 'to': 11, 'delta': 1},
+                               'github': {'from': 0, 'to': 3, 'delta': 3}}
+    assert [(k['keyword'], k['delta']) for k in diff['keywords']] == [('slow', 4), ('react', 3)]
+
+
+def test_identical_analyses():
+    diff = diff_analyses(OLD, OLD)
+    assert diff['top_problems'] == {'new': [], 'dropped': [], 'moved': []}
+    assert diff['categories'] == diff['sources'] == {}
+    assert diff['keywords'] == []
@@ -0,0 +1,75 @@
+"""
+Tests for the streaming NDJSON / CSV exports (export.py).
+"""
+import csv
+import gzip
+import io
+import json
+
+import app as web
+import export
+from export import GROUP_FIELDS, group_rows, iter_chunks, iter_csv, iter_ndjson
+from store import AnalysisStore
+
+
+PROBLEMS = [{'title': 'Login fails, again', 'text': 'line one\nline "two"', 'source': 'reddit',
+             'url': f'https://example.com/{i}', 'score': i}
+            for i in range(50)]
+
+GROUPS = [{'title': 'Login fails', 'category': 'Authentication', 'keywords': ['login', 'fails'],
+           'count': 3, 'users_affected': 3, 'priority': 9.5, 'total_engagement': 12,
+           'examples': [{'url': 'https://example.com/1'}, {'url': 'https://example.com/2'}]}]
+
+
+def test_ndjson_round_trips():
+    lines = list(iter_ndjson(PROBLEMS))
+    assert all(line.endswith('\n') and line.count('\n') == 1 for line in lines)
+    assert [json.loads(line) for line in lines] == PROBLEMS
+
+
+def test_csv_header_and_quoting():
+    rows = list(csv.reader(io.StringIO(''.join(iter_csv(PROBLEMS, ['title', 'text', 'score'])))))
+    assert rows[0] == ['title', 'text', 'score']
+    assert rows[1] == ['Login fails, again', 'line one\nline "two"', '0']
+    assert len(rows) == 51
+
+    assert ''.join(iter_csv([], ['title'])) == 'title\r\n'
+
+
+def test_group_rows_flatten_examples():
+    rows = list(csv.DictReader(io.StringIO(''.join(iter_csv(group_rows(GROUPS), GROUP_FIELDS)))))
+    assert rows[0]['rank'] == '1'
+    assert rows[0]['keywords'] == 'login fails'
+    assert rows[0]['example_urls'] == 'https://example.com/1 https://example.com/2'
+
+
+def test_chunks_are_bounded_and_gzip_matches(monkeypatch):
+    monkeypatch.setattr(export, 'CHUNK_BYTES', 256)
+    plain = list(iter_chunks(iter_ndjson(PROBLEMS)))
+    assert len(plain) > 1
+    assert all(len(chunk) < 256 + 200 for chunk in plain)
+
+    compressed = b''.join(iter_chunks(iter_ndjson(PROBLEMS), compress=True))
+    assert gzip.decompress(compressed) == b''.join(plain)
+
+
+def test_export_endpoints(monkeypatch):
+    store = AnalysisStore()
+    monkeypatch.setattr(web, 'store', store)
+    client = web.app.test_client()
+    assert client.get('/api/export/problems').status_code == 404
+
+    store.publish({'total_problems': 50, 'top_problems': GROUPS}, problems=PROBLEMS)
+    response = client.get('/api/export/problems')
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['X-Analysis-Version'] == '1'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="problems-v1.ndjson"'
+    assert [json.loads(line) for line in response.data.decode().splitlines()] == PROBLEMS
+
+    response = client.get('/api/export/groups?format=csv&fields=rank,title&gzip=1')
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="groups-v1.csv"'
+    assert gzip.decompress(response.data).decode() == 'rank,title\r\n1,Login fails\r\n'
+
+    assert client.get('/api/export/groups?format=xml').status_code == 400
@@ -0,0 +1,122 @@
+"""
+Tests for the comment-thread crawl frontier (frontier.py) and its use by the runners.
+"""
+import io
+import json
+import os
+import tempfile
+
+import requests
+
+import pipeline
+import scraper
+from frontier import CommentFrontier, create_frontier
+from pipeline import ScrapePipeline
+from workqueue import ShardQueue, run_worker
+
+
+COMMENTS = {'scraping': {'comments': {'enabled': True, 'max_requests': 3, 'time_budget': 60}},
+            'analysis': {'min_problem_mentions': 1}}
+
+
+class FakeSession:
+    """Answers every Reddit thread request with the same two comments."""
+
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, params=None, **kwargs):
+        self.urls.append(url)
+        thread = [{'kind': 'Listing', 'data': {'children': []}},
+                  {'kind': 'Listing', 'data': {'children': [
+                      {'kind': 't1', 'data': {'body': 'same kubernetes crash here'}},
+                      {'kind': 't1', 'data': {'body': 'workaround: pin the version'}}]}}]
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = io.BytesIO(json.dumps(thread).encode('utf-8'))
+        return response
+
+    def close(self):
+        pass
+
+
+def reddit_posts(count, prefix='post'):
+    return [{'title': f'Deploy fails on startup {prefix} {i}', 'text': '', 'source': 'reddit',
+             'url': f'https://reddit.com/r/devops/comments/{prefix}{i}/t', 'score': i,
+             'num_comments': 2}
+            for i in range(count)]
+
+
+def test_disabled_by_default():
+    assert create_frontier({}) is None
+
+
+def test_most_engaged_first_within_budget():
+    session = FakeSession()
+    frontier = CommentFrontier(COMMENTS, session)
+    posts = reddit_posts(5) + [dict(reddit_posts(1, 'quiet')[0], num_comments=0)]
+    frontier.crawl(posts)
+
+    assert frontier.stats['requests'] == 3
+    assert frontier.stats['skipped'] == 2
+    assert [post.get('comments_text') is not None for post in posts] == [
+        False, False, True, True, True, False]
+    assert posts[4]['comments_text'] == 'same kubernetes crash here workaround: pin the version'
+
+
+def test_budget_is_shared_across_crawls():
+    frontier = CommentFrontier(COMMENTS, FakeSession())
+    frontier.crawl(reddit_posts(2, 'first'))
+    later = reddit_posts(2, 'second')
+    frontier.crawl(later)
+    assert frontier.stats['requests'] == 3
+    assert frontier.stats['posts'] == 3
+    assert frontier.stats['skipped'] == 1
+
+
+class PagedScraper:
+    name = label = 'reddit'
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def iter_pages(self):
+        yield from self.pages
+
+    def targets(self):
+        return ['devops']
+
+    def describe(self, target):
+        return f"r/{target}"
+
+    def fetch(self, target, strict=False):
+        return [problem for page in self.pages for problem in page]
+
+
+def test_pipeline_fetches_comments():
+    session = FakeSession()
+    pages = [reddit_posts(2, 'a'), reddit_posts(2, 'b')]
+    original = pipeline.create_scrapers
+    pipeline.create_scrapers = lambda config, session=None: [PagedScraper(pages)]
+    try:
+        scrape_pipeline = ScrapePipeline(COMMENTS, session)
+        analysis = scrape_pipeline.run()
+    finally:
+        pipeline.create_scrapers = original
+
+    assert scrape_pipeline.stats['comments']['requests'] == 3
+    assert 'kubernetes' in dict(analysis['top_keywords'])
+
+
+def test_queue_worker_fetches_comments(monkeypatch):
+    config = {'scraping': dict(COMMENTS['scraping'], enabled_sources=['reddit'], queue={
+        'path': os.path.join(tempfile.mkdtemp(), 'queue.db')})}
+    monkeypatch.setattr(scraper, 'create_scrapers',
+                        lambda config, session=None: [PagedScraper([reddit_posts(2)])])
+    monkeypatch.setattr(scraper, 'create_session', lambda config: FakeSession())
+
+    work_queue = ShardQueue.from_config(config)
+    run_id = work_queue.enqueue_run(config)
+    assert run_worker(config, worker_id='w1') == 1
+    assert all('kubernetes' in problem['comments_text']
+               for problem in work_queue.iter_problems(run_id))
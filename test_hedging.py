@@ -0,0 +1,82 @@
+"""
+Tests for hedged requests and adaptive timeouts (hedging.py).
+"""
+import threading
+import time
+from datetime import timedelta
+
+import requests
+
+from hedging import HedgedSession, LatencyRegistry
+
+
+class FakeSession:
+    """Answers GETs after ``delay`` seconds with headers after ``headers`` seconds."""
+
+    def __init__(self, delay=0.0, headers=0.0):
+        self.delay = delay
+        self.headers = headers
+        self.timeouts = []
+        self.in_flight = 0
+        self.closed_while_in_flight = False
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        with self._lock:
+            self.in_flight += 1
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        response = requests.Response()
+        response.status_code = 200
+        response.elapsed = timedelta(seconds=self.headers)
+        return response
+
+    def close(self):
+        self.closed_while_in_flight = self.in_flight > 0
+
+
+def test_timeouts_adapt_to_host_latency():
+    fake = FakeSession(headers=0.4)
+    session = HedgedSession(fake, {'min_samples': 3, 'min_hedge_delay': 1.0},
+                            registry=LatencyRegistry())
+    for _ in range(4):
+        session.get('https://api.example.com/items', timeout=10)
+
+    # Defaults until the host has enough samples
+    assert fake.timeouts[0] == (3.05, 10)
+    connect, read = fake.timeouts[-1]
+    # Connect: 3 x the headers p95 of 0.4s; read: clamped up to the 2s minimum
+    assert abs(connect - 1.2) < 1e-9
+    assert read == 2.0
+    assert session.metrics()['hosts']['api.example.com']['headers_p95_ms'] == 400.0
+
+
+def test_connect_timeout_stays_within_bounds():
+    fake = FakeSession(headers=5.0)
+    session = HedgedSession(fake, {'min_samples': 1, 'min_hedge_delay': 1.0},
+                            registry=LatencyRegistry())
+    session.get('https://slow.example.com/')
+    session.get('https://slow.example.com/')
+    assert fake.timeouts[-1][0] == 3.05
+
+    fake.headers = 0.001
+    session = HedgedSession(fake, {'min_samples': 1, 'min_hedge_delay': 1.0},
+                            registry=LatencyRegistry())
+    session.get('https://fast.example.com/')
+    session.get('https://fast.example.com/')
+    assert fake.timeouts[-1][0] == 0.5
+
+
+def test_close_waits_for_outstanding_hedges():
+    fake = FakeSession()
+    session = HedgedSession(fake, {'min_samples': 1, 'min_hedge_delay': 0.01},
+                            registry=LatencyRegistry())
+    session.get('https://api.example.com/')
+    # The next request outlasts the p95, so it is hedged; one attempt is still running
+    fake.delay = 0.2
+    session.get('https://api.example.com/')
+    assert session.counters['hedged'] == 1
+    session.close()
+    assert not fake.closed_while_in_flight
@@ -0,0 +1,85 @@
+"""
+Tests for the streaming JSON parser (jsonstream.py).
+"""
+import json
+
+from jsonstream import iter_json_items, truncate_text
+
+
+def _chunks(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def reddit_page():
+    """A Reddit-shaped listing with decoy keys and awkward strings before the items."""
+    return {
+        'kind': 'Listing',
+        'before': {'children': [{'decoy': True}], 'note': 'brackets ] } [ { and "quotes"'},
+        'data': {
+            'after': 't3_xyz',
+            'dist': 3,
+            'modhash': '',
+            'children': [
+                {'kind': 't3', 'data': {'title': 'Login fails ] after upgrade', 'score': 12}},
+                {'kind': 't3', 'data': {'title': 'Ünïcode — 日本語 🚀', 'score': -1.5e3}},
+                {'kind': 't3', 'data': {'title': 'Escapes \\" \\\\ \n', 'score': 1234567890123}},
+            ],
+            'trailing': [1, 2, 3],
+        },
+    }
+
+
+def test_every_chunk_size():
+    page = reddit_page()
+    data = json.dumps(page, ensure_ascii=False).encode('utf-8')
+    expected = page['data']['children']
+    for size in range(1, len(data) + 1):
+        items = list(iter_json_items(_chunks(data, size), ['data', 'children']))
+        assert items == expected, size
+
+
+def test_top_level_items():
+    data = b'{"quota_remaining": 299, "items": [{"a": 1}, [], "x", null, 3.25], "has_more": true}'
+    for size in (1, 2, 7, len(data)):
+        assert list(iter_json_items(_chunks(data, size), ['items'])) == [{'a': 1}, [], 'x', None, 3.25]
+
+
+def test_number_split_at_chunk_boundary():
+    data = b'{"items": [12345, 67890]}'
+    for cut in range(len(data)):
+        assert list(iter_json_items([data[:cut], data[cut:]], ['items'])) == [12345, 67890]
+
+
+def test_missing_path_and_empty_array():
+    assert list(iter_json_items([b'{"other": [1, 2]}'], ['items'])) == []
+    assert list(iter_json_items([b'{"items": []}'], ['items'])) == []
+
+
+def test_byte_cap_yields_complete_items():
+    data = json.dumps({'items': [{'n': i, 'pad': 'x' * 50} for i in range(20)]}).encode('utf-8')
+    limit = len(data) // 2
+    items = list(iter_json_items(_chunks(data, 64), ['items'], max_bytes=limit))
+    assert 0 < len(items) < 20
+    assert items == [{'n': i, 'pad': 'x' * 50} for i in range(len(items))]
+    # Items hold no nested objects, so each '}' before the cap closes one
+    assert len(items) == data[:limit].count(b'}')
+
+    # A number cut off by the cap is not a complete item
+    assert list(iter_json_items([b'{"items": [1, 12345]}'], ['items'], max_bytes=16)) == [1]
+
+
+def test_malformed_input_raises():
+    for data in (b'{"items": [{"a": 1}, {"a": }]}', b'["items"]', b'{"items": [1, 2'):
+        try:
+            list(iter_json_items(_chunks(data, 4), ['items']))
+        except json.JSONDecodeError:
+            pass
+        else:
+            raise AssertionError(f'expected JSONDecodeError for {data!r}')
+
+
+def test_truncate_text():
+    assert truncate_text(None, 10) == ''
+    assert truncate_text('abcdef', 3) == 'abc'
+    assert truncate_text('abcdef', None) == 'abcdef'
+    assert truncate_text('abcdef', 0) == 'abcdef'
@@ -0,0 +1,102 @@
+"""
+Tests for the pipelined scrape -> analyze mode (pipeline.py).
+"""
+import threading
+
+import pipeline
+from analyzer import ProblemAnalyzer
+from pipeline import ScrapePipeline
+
+
+CONFIG = {
+    'scraping': {'pipeline': {'queue_size': 1, 'analyzer_workers': 2}},
+    'analysis': {'min_problem_mentions': 2},
+}
+
+TITLES = ['Login fails after password reset', 'Database query is slow on postgres',
+          'React component renders twice', 'Docker deploy crashes on startup']
+
+
+class FakeScraper:
+    def __init__(self, name, pages):
+        self.name = self.label = name
+        self.pages = pages
+        self.served = 0
+
+    def iter_pages(self):
+        for page in self.pages:
+            self.served += 1
+            yield page
+
+
+def make_pages(source, pages=6, per_page=5):
+    return [[{'title': TITLES[(p + i) % len(TITLES)], 'text': '', 'source': source,
+              'url': f'https://example.com/{source}/{p}/{i}', 'score': p + i}
+             for i in range(per_page)]
+            for p in range(pages)]
+
+
+def use_scrapers(monkeypatch, scrapers):
+    monkeypatch.setattr(pipeline, 'create_scrapers', lambda config, session=None: scrapers)
+
+
+def run_with_timeout(scrape_pipeline, timeout=10):
+    """Run the pipeline in a thread so a hang fails the test instead of blocking it."""
+    outcome = {}
+
+    def target():
+        try:
+            outcome['analysis'] = scrape_pipeline.run()
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), 'pipeline did not finish'
+    return outcome
+
+
+def test_counts_match_sequential_analysis(monkeypatch):
+    scrapers = [FakeScraper('reddit', make_pages('reddit')),
+                FakeScraper('github', make_pages('github', pages=4))]
+    use_scrapers(monkeypatch, scrapers)
+    analysis = run_with_timeout(ScrapePipeline(CONFIG))['analysis']
+
+    problems = [problem for scraper in scrapers for page in scraper.pages for problem in page]
+    expected = ProblemAnalyzer(CONFIG).analyze_problems(problems)
+    assert analysis['total_problems'] == expected['total_problems'] == 50
+    assert analysis['categories'] == expected['categories']
+    assert analysis['sources'] == expected['sources']
+
+    def ranking(result):
+        # Sorted so ties in priority may come out in either arrival order
+        return sorted((group['priority'], group['count'], sorted(group['keywords']))
+                      for group in result['top_problems'])
+    assert ranking(analysis) == ranking(expected)
+
+
+class FailingAnalyzer(ProblemAnalyzer):
+    def prepare_problem(self, problem):
+        if problem['url'].endswith('/2/3'):
+            raise ValueError('bad problem')
+        return super().prepare_problem(problem)
+
+
+def test_worker_error_is_raised_without_hanging(monkeypatch):
+    # With a one-page queue the producer blocks unless the failed workers keep draining
+    scraper = FakeScraper('reddit', make_pages('reddit', pages=20))
+    use_scrapers(monkeypatch, [scraper])
+    outcome = run_with_timeout(ScrapePipeline(CONFIG, analyzer=FailingAnalyzer(CONFIG)))
+
+    assert isinstance(outcome.get('error'), ValueError)
+    assert scraper.served == 20
+    assert not [thread for thread in threading.enumerate()
+                if thread.name.startswith(('analyzer-', 'scraper-'))]
+
+
+def test_error_is_reset_between_runs(monkeypatch):
+    use_scrapers(monkeypatch, [FakeScraper('reddit', make_pages('reddit'))])
+    scrape_pipeline = ScrapePipeline(CONFIG)
+    scrape_pipeline._error = ValueError('left over from an earlier run')
+    assert run_with_timeout(scrape_pipeline)['analysis']['total_problems'] == 30
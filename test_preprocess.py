@@ -0,0 +1,52 @@
+"""
+Tests for text preprocessing (preprocess.py).
+"""
+import time
+
+from preprocess import CHARS_PER_TOKEN, TextPreprocessor
+
+
+PATHOLOGICAL = {
+    'unclosed links': 'see [note (a) ' * 6000,
+    'C-like code': 'if (a < b && c[i] <= d) { x = y; } ' * 2500,
+    'run of <': '<' * 20000,
+    'unclosed <pre>': '<pre>x ' * 20000,
+    'JavaScript frame without line:col': '\n    at ' + 'a/' * 20000,
+}
+
+
+def test_pathological_input_is_linear():
+    for config in ({}, {'max_tokens': 0}):
+        preprocessor = TextPreprocessor(config)
+        for name, text in PATHOLOGICAL.items():
+            started = time.perf_counter()
+            preprocessor.clean(text)
+            # Each case took seconds when the patterns could backtrack
+            assert time.perf_counter() - started < 0.5, name
+
+
+def test_input_cut_before_stripping():
+    preprocessor = TextPreprocessor({'max_tokens': 10})
+    text = 'word ' * 10 + 'x' * 1000
+    assert preprocessor.clean(text) == ' '.join(['word'] * 10)
+    assert len(preprocessor.clean('y' * 1000)) == 10 * CHARS_PER_TOKEN
+
+
+def test_prose_survives():
+    preprocessor = TextPreprocessor({'max_tokens': 0})
+    assert preprocessor.clean('it fails when a < b and c > d') == 'it fails when a < b and c > d'
+    assert preprocessor.clean('the docs say [sic] it works') == 'the docs say [sic] it works'
+    assert preprocessor.clean('if (a < b && c[i] <= d) crash') == 'if (a < b && c[i] <= d) crash'
+
+
+def test_markup_code_and_traces_stripped():
+    preprocessor = TextPreprocessor({'max_tokens': 0})
+    text = ('Login <b>breaks</b> after the [upgrade](https://example.com/notes "v2").\n'
+            '<pre class="x">SELECT 1;</pre>\n'
+            '    at handler (/app/src/server.js:12:5)\n'
+            '    at com.example.Main.run(Main.java:42)\n'
+            '  File "app.py", line 3, in main\n'
+            '    main()\n'
+            'Any ideas?')
+    assert preprocessor.clean(text) == 'Login breaks after the upgrade . Any ideas?'
+    assert preprocessor.clean('<pre>never closed\nSELECT 1;') == ''
@@ -0,0 +1,100 @@
+"""
+Tests for the stratified-sampling preview (preview.py).
+"""
+import math
+import tempfile
+from collections import Counter
+
+from analyzer import ProblemAnalyzer
+from preview import Z_95, PreviewAnalyzer
+from store import AnalysisStore, SharedAnalysisStore
+
+
+CONFIG = {'analysis': {'min_problem_mentions': 2, 'preview': {'seed': 1}}}
+
+TITLES = [('Login fails after password reset', 'reddit'),
+          ('Database query is slow on postgres', 'stackoverflow'),
+          ('React component renders twice', 'github'),
+          ('Login token expires too early', 'stackoverflow')]
+
+
+def problems(count=400):
+    items = []
+    for i in range(count):
+        # i % 7 % 4 makes the first three strata twice the size of the last
+        title, source = TITLES[i % 7 % 4]
+        items.append({'title': title, 'text': '', 'source': source,
+                      'url': f'https://example.com/{i}', 'score': i % 13})
+    return items
+
+
+def test_stratified_estimate_and_interval():
+    preview = PreviewAnalyzer(CONFIG)
+    preview.strata = {'a': 100, 'b': 10}
+    preview.sampled = Counter({'a': 4, 'b': 10})
+    # Stratum a samples 1, 2, 3, 4; stratum b is a census of ten 5s
+    total, half = preview._estimate({'a': [10, 30], 'b': [50, 250]})
+    assert total == 100 * 2.5 + 50
+    # Only the sampled stratum adds variance, with finite-population correction
+    variance = 100 ** 2 * (1 - 4 / 100) * (5 / 3) / 4
+    assert math.isclose(half, Z_95 * math.sqrt(variance))
+
+
+def test_sample_order_is_proportional():
+    preview = PreviewAnalyzer(CONFIG)
+    items = problems()
+    order, stratum_of, minimum = preview.sample_order(items)
+    assert sorted(order) == list(range(len(items)))
+    assert minimum == 2 * len(preview.strata)
+    assert Counter(stratum_of[i] for i in order[:minimum]) == {s: 2 for s in preview.strata}
+
+    prefix = Counter(stratum_of[i] for i in order[:minimum + 100])
+    for stratum, size in preview.strata.items():
+        assert abs(prefix[stratum] - (minimum + 100) * size / len(items)) <= 3
+
+
+def test_zero_budget_still_samples_every_stratum():
+    config = {'analysis': {'min_problem_mentions': 2, 'preview': {'seed': 1, 'time_budget': 0}}}
+    preview = PreviewAnalyzer(config)
+    result = preview.run(problems())
+    assert result['preview']['sampled'] == 2 * len(preview.strata)
+    assert result['sources'] == dict(Counter(p['source'] for p in problems()))
+
+
+def test_full_sample_matches_exact_analysis():
+    config = {'analysis': {'min_problem_mentions': 2, 'preview': {'seed': 1, 'time_budget': 60}}}
+    items = problems()
+    preview = PreviewAnalyzer(config)
+    result = preview.run(items)
+    exact = ProblemAnalyzer(config).analyze_problems(items)
+
+    assert result['preview']['fraction'] == 1.0
+    assert result['categories'] == exact['categories']
+    counts = {' '.join(sorted(g['keywords'])): g['count'] for g in exact['top_problems']}
+    for group in result['top_problems']:
+        assert group['count'] == counts[' '.join(sorted(group['keywords']))]
+        # A census has no sampling error
+        low, high = group['ci']['users_affected']
+        assert low == high == group['count']
+
+    assert preview.refine(items)['top_problems'] == exact['top_problems']
+
+
+def test_publish_only_if_version_unchanged():
+    for store in (AnalysisStore(), SharedAnalysisStore(tempfile.mkdtemp())):
+        preview = store.publish({'total_problems': 1})
+        newer = store.publish({'total_problems': 2})
+        assert store.publish({'total_problems': 3}, expected_version=preview.version) is None
+        assert store.current().version == newer.version
+        refined = store.publish({'total_problems': 3}, expected_version=newer.version)
+        assert refined.version == newer.version + 1
+
+
+def test_refinement_is_dropped_when_superseded():
+    store = AnalysisStore()
+    items = problems(40)
+    preview = PreviewAnalyzer(CONFIG)
+    published = store.publish(preview.run(items))
+    store.publish({'total_problems': 0})
+    preview.refine_in_background(items, store, published.version).join()
+    assert store.current().version == 2
@@ -0,0 +1,69 @@
+"""
+Tests for recording and replaying scraper HTTP traffic (replay.py).
+"""
+import os
+import tempfile
+import time
+
+import requests
+
+from replay import TrafficRecorder, TrafficReplayer
+
+
+class FakeSession:
+    """Answers every GET with a body naming the URL, after ``delay`` seconds."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def get(self, url, params=None, **kwargs):
+        time.sleep(self.delay)
+        response = requests.Response()
+        response.status_code = 200
+        response.encoding = 'utf-8'
+        response._content = f"body of {url}".encode('utf-8')
+        return response
+
+    def close(self):
+        pass
+
+
+def record(urls, gap=0.0, delay=0.0):
+    path = os.path.join(tempfile.mkdtemp(), 'traffic.jsonl.gz')
+    recorder = TrafficRecorder(path, session=FakeSession(delay))
+    for url in urls:
+        recorder.get(url)
+        time.sleep(gap)
+    recorder.close()
+    return path
+
+
+def test_round_trip():
+    path = record(['https://example.com/a', 'https://example.com/b'])
+    replayer = TrafficReplayer(path)
+    assert replayer.get('https://example.com/b').text == 'body of https://example.com/b'
+    assert replayer.get('https://example.com/a').status_code == 200
+    try:
+        replayer.get('https://example.com/missing')
+    except requests.exceptions.ConnectionError:
+        pass
+    else:
+        raise AssertionError('expected a replay miss')
+    assert (replayer.served, replayer.misses) == (2, 1)
+
+
+def test_realtime_reproduces_request_spacing():
+    path = record([f'https://example.com/{i}' for i in range(3)], gap=0.1, delay=0.02)
+
+    replayer = TrafficReplayer(path, realtime=True, speed=2.0)
+    started = time.monotonic()
+    for i in range(3):
+        replayer.get(f'https://example.com/{i}')
+    # The recording spans 3 latencies and 2 gaps (~0.26s); at 2x about 0.13s
+    assert 0.1 < time.monotonic() - started < 0.5
+
+    replayer = TrafficReplayer(path)
+    started = time.monotonic()
+    for i in range(3):
+        replayer.get(f'https://example.com/{i}')
+    assert time.monotonic() - started < 0.05
@@ -0,0 +1,95 @@
+"""
+Tests for the adaptive polling scheduler (scheduler.py).
+"""
+import scraper
+from scheduler import FeedScheduler
+from store import AnalysisStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeSession:
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+
+    def close(self):
+        pass
+
+
+class BackfillScraper:
+    """Makes ``requests`` GETs per poll, like a Stack Overflow listing plus body backfills."""
+    name = 'stackoverflow'
+
+    def __init__(self, session, requests):
+        self.session = session
+        self.requests = requests
+
+    def targets(self):
+        return ['python', 'react']
+
+    def describe(self, target):
+        return target
+
+    def fetch_safely(self, target):
+        for i in range(self.requests):
+            self.session.get(f'https://api.example.com/{target}/{i}')
+        return [{'title': f'{target} question', 'url': f'https://example.com/{target}'}]
+
+
+def make_scheduler(monkeypatch, requests_per_poll, store=None, **scheduler_config):
+    monkeypatch.setattr(scraper, 'create_scrapers',
+                        lambda config, session=None: [BackfillScraper(session, requests_per_poll)])
+    config = {'scraping': {'scheduler': scheduler_config}}
+    clock = FakeClock()
+    session = FakeSession()
+    scheduler = FeedScheduler(config, session=session, store=store or AnalysisStore(),
+                              clock=clock, sleep=clock.sleep)
+    return scheduler, clock, session
+
+
+def test_requires_shared_store(monkeypatch):
+    monkeypatch.setattr(scraper, 'create_scrapers', lambda config, session=None: [])
+    try:
+        FeedScheduler({'server': {'shared_snapshot': {'enabled': False}}}, session=FakeSession())
+    except ValueError as e:
+        assert 'shared_snapshot' in str(e)
+    else:
+        raise AssertionError('expected ValueError')
+
+
+def test_budget_is_charged_per_request(monkeypatch):
+    scheduler, clock, session = make_scheduler(monkeypatch, requests_per_poll=3,
+                                               requests_per_hour=3600, burst=1)
+    scheduler.run(max_polls=2)
+
+    assert len(session.urls) == scheduler.session.requests == 6
+    # One token per second after the first: the sixth request goes out at t=5
+    assert clock.now >= 5.0
+
+
+def test_interval_adapts_to_new_items(monkeypatch):
+    scheduler, clock, _ = make_scheduler(monkeypatch, requests_per_poll=1, initial_interval=100,
+                                         min_interval=10, max_interval=1000, target_new_per_poll=5)
+    feed = scheduler.feeds[0]
+    # Fewer new items than targeted backs off, at most doubling
+    scheduler.poll(feed)
+    assert feed.last_new == 1 and feed.interval == 200
+    scheduler.poll(feed)
+    assert feed.last_new == 0 and feed.interval == 400
+    # A busy feed is polled more often, at most twice as often
+    scheduler.adapt(feed, fetched=20, new=20)
+    assert feed.interval == 200
+    scheduler.adapt(feed, fetched=20, new=10)
+    assert feed.interval == 100
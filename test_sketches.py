@@ -0,0 +1,104 @@
+"""
+Tests for the fixed-memory keyword sketches (sketches.py).
+"""
+import random
+from collections import Counter
+
+from analyzer import ProblemAnalyzer
+from sketches import CountMinTopK, SpaceSaving, create_keyword_counter, merge_counts
+
+
+def zipf_stream(length=20000, vocabulary=2000, seed=7):
+    """Keywords with Zipf-like frequencies: a few heavy hitters, a long tail."""
+    rng = random.Random(seed)
+    words = [f'word{i}' for i in range(vocabulary)]
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+    return rng.choices(words, weights, k=length)
+
+
+def check_accuracy(sketch, stream, top=10):
+    exact = Counter(stream)
+    bound = sketch.error_bound()
+    assert bound <= len(stream) * 0.01 + 1
+    reported = sketch.most_common(top)
+    for key, count in reported:
+        assert exact[key] <= count <= exact[key] + bound, key
+    assert [key for key, _ in reported] == [key for key, _ in exact.most_common(top)]
+
+
+def test_space_saving_on_skewed_data():
+    stream = zipf_stream()
+    sketch = SpaceSaving(200)
+    sketch.update(stream)
+    assert len(sketch.counts) == 200
+    check_accuracy(sketch, stream)
+
+
+def test_space_saving_is_exact_while_vocabulary_fits():
+    stream = zipf_stream(vocabulary=50)
+    sketch = SpaceSaving(50)
+    sketch.update(stream)
+    assert sketch.error_bound() <= len(stream) // 50
+    assert dict(sketch.most_common()) == Counter(stream)
+
+
+def test_count_min_on_skewed_data():
+    stream = zipf_stream()
+    sketch = CountMinTopK(epsilon=0.005, delta=0.01, candidates=40)
+    sketch.update(stream)
+    assert sketch.rows.shape == (5, 544)
+    check_accuracy(sketch, stream)
+
+
+def test_merge_counts_across_shards():
+    stream = zipf_stream()
+    shards = [stream[i::4] for i in range(4)]
+    for make in (lambda: SpaceSaving(200),
+                 lambda: CountMinTopK(epsilon=0.005, delta=0.01, candidates=40)):
+        merged = make()
+        for shard in shards:
+            sketch = make()
+            sketch.update(shard)
+            merge_counts(merged, sketch)
+        assert merged.total == len(stream)
+        check_accuracy(merged, stream)
+
+    # Exact counters merge exactly, and a sketch can absorb one
+    exact = Counter()
+    for shard in shards:
+        merge_counts(exact, Counter(shard))
+    assert exact == Counter(stream)
+    sketch = SpaceSaving(200)
+    merge_counts(sketch, exact)
+    check_accuracy(sketch, stream)
+
+
+def test_empty_count_min_merges_cheaply():
+    empty, full = (CountMinTopK(epsilon=0.01, delta=0.01, candidates=10) for _ in range(2))
+    full.update(['login', 'login', 'docker'])
+    empty.merge(CountMinTopK(epsilon=0.01, delta=0.01, candidates=10))
+    assert empty.rows is None
+    empty.merge(full)
+    assert empty.estimate('login') == 2 and empty.rows is not full.rows
+
+
+def test_create_keyword_counter():
+    assert isinstance(create_keyword_counter({}, 50), Counter)
+    sketch = create_keyword_counter({'enabled': True, 'epsilon': 0.001}, 50)
+    assert isinstance(sketch, SpaceSaving) and sketch.capacity == 1000
+    cell = create_keyword_counter({'enabled': True, 'epsilon': 0.001}, 20, cell=True)
+    assert cell.capacity == 200
+
+
+def test_analysis_reports_error_bound():
+    problems = [{'title': 'Login fails after password reset', 'text': 'docker login token',
+                 'source': 'reddit', 'url': f'https://example.com/{i}'} for i in range(5)]
+    exact = ProblemAnalyzer({'analysis': {}}).analyze_problems(problems)
+    assert 'keyword_error_bound' not in exact
+
+    sketched = ProblemAnalyzer({'analysis': {'keyword_sketch': {
+        'enabled': True, 'epsilon': 0.5}}}).analyze_problems(problems)
+    # The global sketch keeps at least top_keywords (50) counters
+    keywords_seen = sum(count for _, count in exact['top_keywords'])
+    assert sketched['keyword_error_bound'] == keywords_seen // 50
+    assert sketched['cubes']['source']['reddit']['keyword_error_bound'] >= 0
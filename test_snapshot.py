@@ -0,0 +1,96 @@
+"""
+Tests for the binary snapshot format (snapshot.py).
+"""
+import json
+import os
+import tempfile
+
+from snapshot import (CubeCells, Snapshot, SnapshotError, StringTable, dumps_snapshot,
+                      load_snapshot, write_snapshot)
+
+
+def sample_analysis():
+    """A small analysis with every kind of section the writer handles."""
+    group = {
+        'title': 'Login fails after upgrade — ünïcode',
+        'keywords': ['login', 'fails', 'upgrade'],
+        'category': 'Authentication',
+        'count': 4,
+        'total_engagement': 120,
+        'examples': [
+            {'title': 'Login fails after upgrade', 'url': 'https://reddit.com/a', 'source': 'reddit'},
+            {'title': 'NUL \x00 inside', 'url': 'https://github.com/o/r/issues/1', 'source': 'github'},
+        ],
+        'priority': 52.0,
+        'users_affected': 4,
+        'ci': {'priority': [40.0, 60.0]},
+    }
+    cell = {
+        'total_problems': 4,
+        'total_engagement': 120,
+        'top_problems': [dict(group)],
+        'top_keywords': [['login', 4]],
+    }
+    return {
+        'total_problems': 10,
+        'top_problems': [group, dict(group, title='Second', ci={'priority': [1.0, 2.0]})],
+        'top_keywords': [('login', 7), ('fails', 5)],
+        'categories': {'Authentication': 7, 'General': 3},
+        'sources': {'reddit': 6, 'github': 4},
+        'cubes': {
+            'category': {'Authentication': cell},
+            'source': {'reddit': cell},
+            'category_source': {'Authentication': {'reddit': cell}},
+        },
+        'preview': {'sampled': 3, 'confidence': 0.95},
+    }
+
+
+def _as_json(value):
+    return json.loads(json.dumps(value))
+
+
+def test_round_trip():
+    analysis = sample_analysis()
+    directory = tempfile.mkdtemp()
+    for compress in (True, False):
+        path = os.path.join(directory, f'analysis-{compress}.snap')
+        write_snapshot(path, analysis, timestamp='2024-01-01T00:00:00', compress=compress)
+        snap = Snapshot.open(path)
+        try:
+            assert snap.timestamp == '2024-01-01T00:00:00'
+            assert list(snap) == list(analysis)
+            assert _as_json(snap.to_dict()) == _as_json(analysis)
+        finally:
+            snap.close()
+
+
+def test_lazy_decoding():
+    snap = Snapshot(dumps_snapshot(sample_analysis(), compress=False))
+    assert snap['total_problems'] == 10
+    assert 'strings' not in snap._cache
+
+    top = snap['top_problems']
+    assert isinstance(snap._string_table(), StringTable)
+    assert top[1]['title'] == 'Second'
+    assert top[-1] == top[1]
+
+    cubes = snap['cubes']
+    assert isinstance(cubes, CubeCells)
+    assert 'Authentication' in cubes['category']
+    assert cubes['category_source']['Authentication']['reddit']['total_problems'] == 4
+
+
+def test_rejects_foreign_data():
+    try:
+        Snapshot(b'not a snapshot at all')
+    except SnapshotError:
+        pass
+    else:
+        raise AssertionError('expected SnapshotError')
+
+
+def test_load_snapshot_cache():
+    path = os.path.join(tempfile.mkdtemp(), 'analysis.snap')
+    write_snapshot(path, sample_analysis())
+    assert load_snapshot(path) is load_snapshot(path)
@@ -0,0 +1,55 @@
+"""
+Tests for versioned analysis publication (store.py).
+"""
+import tempfile
+
+from store import AnalysisStore, SharedAnalysisStore
+
+
+def analysis(total):
+    return {'total_problems': total, 'top_problems': [], 'top_keywords': [('login', total)],
+            'categories': {'Authentication': total}, 'sources': {'reddit': total}}
+
+
+def test_versions_and_history():
+    store = AnalysisStore(history=3)
+    assert store.current().empty and store.current().version == 0
+
+    for total in range(1, 6):
+        snapshot = store.publish(analysis(total), timestamp=f'2024-01-0{total}')
+        assert snapshot.version == total
+        assert store.current() is snapshot
+
+    assert [store.get(version) for version in (1, 2)] == [None, None]
+    assert [store.get(version).analysis['total_problems'] for version in (3, 4, 5)] == [3, 4, 5]
+    assert store.get(5).timestamp == '2024-01-05'
+    assert store.get(6) is None
+
+
+def test_shared_store_across_instances():
+    directory = tempfile.mkdtemp()
+    writer, reader = SharedAnalysisStore(directory, keep=2), SharedAnalysisStore(directory, keep=2)
+    assert reader.current().empty
+
+    for total in range(1, 4):
+        writer.publish(analysis(total), problems=[{'title': str(total)}])
+        current = reader.current()
+        assert current.version == total
+        assert current.analysis['total_problems'] == total
+        assert [problem['title'] for problem in current.problems] == [str(total)]
+
+    assert reader.get(1) is None
+    assert reader.get(2).analysis['categories'] == {'Authentication': 2}
+    assert reader.get(4) is None
+
+
+def test_problems_kept_only_on_current_version():
+    store = AnalysisStore(history=4)
+    first = store.publish(analysis(1), problems=[{'title': 'a'}])
+    store.publish(analysis(2), problems=[{'title': 'b'}])
+
+    # A reader holding the superseded snapshot still sees its problems
+    assert first.problems == [{'title': 'a'}]
+    assert store.get(1).problems is None
+    assert store.get(1).analysis is first.analysis
+    assert store.current().problems == [{'title': 'b'}]
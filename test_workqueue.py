@@ -0,0 +1,132 @@
+"""
+Tests for the SQLite shard queue (workqueue.py).
+"""
+import os
+import tempfile
+import time
+
+import scraper
+from workqueue import LeaseKeeper, ShardQueue, run_worker
+
+
+def make_config(lease_seconds=60, max_attempts=3, subreddits=('webdev', 'python')):
+    return {'scraping': {
+        'enabled_sources': ['reddit'],
+        'subreddits': list(subreddits),
+        'queue': {'path': os.path.join(tempfile.mkdtemp(), 'queue.db'),
+                  'lease_seconds': lease_seconds, 'max_attempts': max_attempts},
+    }}
+
+
+def test_claim_and_complete():
+    config = make_config()
+    work_queue = ShardQueue.from_config(config)
+    run_id = work_queue.enqueue_run(config)
+    assert work_queue.status(run_id) == {'pending': 2}
+
+    first, second = work_queue.claim('w1'), work_queue.claim('w2')
+    assert (first.target, second.target) == ('webdev', 'python')
+    assert first.attempts == 1
+    assert work_queue.claim('w3') is None
+
+    assert work_queue.complete(first, 'w1', [{'title': 'a'}])
+    assert not work_queue.complete(second, 'w1', [])
+    assert work_queue.complete(second, 'w2', [{'title': 'b'}, {'title': 'c'}])
+    assert work_queue.status(run_id) == {'done': 2}
+    assert [p['title'] for p in work_queue.iter_problems(run_id)] == ['a', 'b', 'c']
+
+
+def test_expired_lease_is_reclaimed():
+    config = make_config(lease_seconds=0.05, subreddits=['webdev'])
+    work_queue = ShardQueue.from_config(config)
+    run_id = work_queue.enqueue_run(config)
+
+    crashed = work_queue.claim('crashed')
+    assert work_queue.claim('other') is None
+    time.sleep(0.1)
+
+    reclaimed = work_queue.claim('other')
+    assert reclaimed.id == crashed.id and reclaimed.attempts == 2
+    # The stalled worker can neither extend nor complete the lease it lost
+    assert not work_queue.renew(crashed, 'crashed')
+    assert not work_queue.complete(crashed, 'crashed', [{'title': 'stale'}])
+    assert work_queue.complete(reclaimed, 'other', [{'title': 'fresh'}])
+    assert [p['title'] for p in work_queue.iter_problems(run_id)] == ['fresh']
+
+
+def test_failures_are_retried_until_max_attempts():
+    config = make_config(max_attempts=2, subreddits=['webdev'])
+    work_queue = ShardQueue.from_config(config)
+    run_id = work_queue.enqueue_run(config)
+
+    work_queue.fail(work_queue.claim('w1'), 'w1', 'HTTP 429')
+    assert work_queue.status(run_id) == {'pending': 1}
+    shard = work_queue.claim('w1')
+    assert shard.attempts == 2
+    work_queue.fail(shard, 'w1', 'HTTP 429')
+    assert work_queue.status(run_id) == {'failed': 1}
+    assert work_queue.claim('w1') is None
+
+
+def test_expired_lease_without_attempts_left_fails():
+    config = make_config(lease_seconds=0.05, max_attempts=1, subreddits=['webdev'])
+    work_queue = ShardQueue.from_config(config)
+    run_id = work_queue.enqueue_run(config)
+
+    work_queue.claim('crashed')
+    time.sleep(0.1)
+    assert work_queue.claim('other') is None
+    assert work_queue.status(run_id) == {'failed': 1}
+
+
+def test_lease_keeper_renews_while_working():
+    config = make_config(lease_seconds=0.15, subreddits=['webdev'])
+    work_queue = ShardQueue.from_config(config)
+    work_queue.enqueue_run(config)
+
+    shard = work_queue.claim('w1')
+    with LeaseKeeper(work_queue, shard, 'w1') as keeper:
+        time.sleep(0.4)
+        assert work_queue.claim('w2') is None
+    assert not keeper.lost
+    assert work_queue.complete(shard, 'w1', [])
+
+
+class FlakyScraper:
+    """Fails every fetch of ``python``, as a rate-limited strict fetch would."""
+    name = 'reddit'
+
+    def __init__(self):
+        self.calls = []
+
+    def targets(self):
+        return ['webdev', 'python']
+
+    def describe(self, target):
+        return f"r/{target}"
+
+    def fetch(self, target, strict=False):
+        self.calls.append((target, strict))
+        if target == 'python':
+            raise RuntimeError('HTTP 429')
+        return [{'title': target}]
+
+
+class NullSession:
+    def close(self):
+        pass
+
+
+def test_worker_retries_failed_fetches(monkeypatch):
+    config = make_config(max_attempts=3)
+    fake = FlakyScraper()
+    monkeypatch.setattr(scraper, 'create_scrapers', lambda config, session=None: [fake])
+    monkeypatch.setattr(scraper, 'create_session', lambda config: NullSession())
+
+    work_queue = ShardQueue.from_config(config)
+    run_id = work_queue.enqueue_run(config)
+    assert run_worker(config, worker_id='w1') == 1
+
+    assert work_queue.status(run_id) == {'done': 1, 'failed': 1}
+    assert fake.calls.count(('python', True)) == 3
+    assert [p['title'] for p in work_queue.iter_problems(run_id)] == ['webdev']
@@ -0,0 +1,336 @@
+"""
+Sharded scraping through a durable local work queue.
+
+A scrape run is split into one shard per (source, target) pair, e.g.
+``reddit/webdev`` or ``stackoverflow/react``, stored in a SQLite database.
+Any number of worker processes, on this host or on other hosts that share
+the database file over a filesystem with working POSIX locks, claim shards
+under a time-limited lease, scrape them and write the problems back. Shards
+whose lease expires (a crashed or stalled worker) are handed out again, up
+to ``max_attempts`` times. Workers renew their lease in the background while
+a shard is being scraped, and scrape in strict mode: a rate-limited or
+failing request raises, so the shard is retried instead of being stored as
+an empty result. With ``scraping.comments.enabled`` a worker also fetches
+comment threads for each shard it scraped, within a per-shard frontier
+budget, before storing the result. No external broker is required.
+
+Usage:
+    python workqueue.py enqueue                  # create a run, print its id
+    python workqueue.py work --processes 4       # scrape shards until idle
+    python workqueue.py status RUN_ID
+    python workqueue.py collect RUN_ID [--output analysis.snap]
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result BLOB,
+    error TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS shards_claim ON shards (status, lease_expires);
+CREATE INDEX IF NOT EXISTS shards_run ON shards (run_id, status);
+"""
+
+
+class Shard(NamedTuple):
+    """A claimed unit of scraping work."""
+    id: int
+    run_id: str
+    source: str
+    target: str
+    attempts: int
+
+
+class ShardQueue:
+    """SQLite-backed queue of scrape shards with leases and retries."""
+
+    def __init__(self, path: str, lease_seconds: float = 120, max_attempts: int = 3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.executescript(SCHEMA)
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'ShardQueue':
+        queue_config = config.get('scraping', {}).get('queue', {})
+        return cls(queue_config.get('path', 'scrape_queue.db'),
+                   lease_seconds=queue_config.get('lease_seconds', 120),
+                   max_attempts=queue_config.get('max_attempts', 3))
+
+    def close(self):
+        self.db.close()
+
+    def enqueue_run(self, config: dict) -> str:
+        """Create a run with one shard per enabled source target."""
+        from scraper import create_scrapers
+
+        run_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        rows = [(run_id, scraper.name, target, now)
+                for scraper in create_scrapers(config)
+                for target in scraper.targets()]
+        with self.db:
+            self.db.execute('BEGIN IMMEDIATE')
+            self.db.executemany(
+                'INSERT INTO shards (run_id, source, target, updated) VALUES (?, ?, ?, ?)', rows)
+        return run_id
+
+    def claim(self, worker_id: str) -> Optional[Shard]:
+        """Lease the next pending (or expired) shard to ``worker_id``."""
+        now = time.time()
+        with self.db:
+            # IMMEDIATE takes the write lock up front, so two workers can
+            # never select the same row
+            self.db.execute('BEGIN IMMEDIATE')
+            row = self.db.execute(
+                """SELECT id, run_id, source, target, attempts FROM shards
+                   WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                     AND attempts < ?
+                   ORDER BY id LIMIT 1""",
+                (now, self.max_attempts)).fetchone()
+            if row is None:
+                # Expired leases that ran out of attempts are given up on
+                self.db.execute(
+                    """UPDATE shards SET status = 'failed', updated = ?
+                       WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?""",
+                    (now, now, self.max_attempts))
+                return None
+            self.db.execute(
+                """UPDATE shards SET status = 'leased', lease_owner = ?, lease_expires = ?,
+                          attempts = attempts + 1, updated = ?
+                   WHERE id = ?""",
+                (worker_id, now + self.lease_seconds, now, row[0]))
+        return Shard(row[0], row[1], row[2], row[3], row[4] + 1)
+
+    def renew(self, shard: Shard, worker_id: str) -> bool:
+        """Extend a lease; returns False if it was lost to another worker."""
+        now = time.time()
+        with self.db:
+            cursor = self.db.execute(
+                """UPDATE shards SET lease_expires = ?, updated = ?
+                   WHERE id = ? AND status = 'leased' AND lease_owner = ?""",
+                (now + self.lease_seconds, now, shard.id, worker_id))
+        return cursor.rowcount == 1
+
+    def complete(self, shard: Shard, worker_id: str, problems: List[Dict]) -> bool:
+        """Store a shard's problems; ignored if the lease was lost meanwhile."""
+        payload = zlib.compress(json.dumps(problems, separators=(',', ':')).encode('utf-8'))
+        with self.db:
+            cursor = self.db.execute(
+                """UPDATE shards SET status = 'done', result = ?, error = NULL, updated = ?
+                   WHERE id = ? AND status = 'leased' AND lease_owner = ?""",
+                (payload, time.time(), shard.id, worker_id))
+        return cursor.rowcount == 1
+
+    def fail(self, shard: Shard, worker_id: str, error: str):
+        """Release a shard after an error, to be retried while attempts remain."""
+        status = 'pending' if shard.attempts < self.max_attempts else 'failed'
+        with self.db:
+            self.db.execute(
+                """UPDATE shards SET status = ?, error = ?, lease_owner = NULL,
+                          lease_expires = NULL, updated = ?
+                   WHERE id = ? AND status = 'leased' AND lease_owner = ?""",
+                (status, error[:1000], time.time(), shard.id, worker_id))
+
+    def status(self, run_id: str) -> Dict[str, int]:
+        """Shard counts by status for a run."""
+        rows = self.db.execute(
+            'SELECT status, COUNT(*) FROM shards WHERE run_id = ? GROUP BY status', (run_id,))
+        return dict(rows.fetchall())
+
+    def iter_problems(self, run_id: str) -> Iterator[Dict]:
+        """Yield the problems of every completed shard of a run."""
+        rows = self.db.execute(
+            "SELECT result FROM shards WHERE run_id = ? AND status = 'done' ORDER BY id",
+            (run_id,))
+        for (payload,) in rows:
+            yield from json.loads(zlib.decompress(payload))
+
+
+class LeaseKeeper(threading.Thread):
+    """Renews a shard's lease in the background while it is being scraped.
+    
+    SQLite connections stay in the thread that created them, so the keeper
+    opens its own.
+    """
+
+    def __init__(self, work_queue: ShardQueue, shard: Shard, worker_id: str):
+        super().__init__(name=f'lease-{shard.id}', daemon=True)
+        self.path = work_queue.path
+        self.lease_seconds = work_queue.lease_seconds
+        self.shard = shard
+        self.worker_id = worker_id
+        self.lost = False
+        self._released = threading.Event()
+
+    def run(self):
+        work_queue = ShardQueue(self.path, lease_seconds=self.lease_seconds)
+        try:
+            while not self._released.wait(self.lease_seconds / 3):
+                if not work_queue.renew(self.shard, self.worker_id):
+                    self.lost = True
+                    break
+        finally:
+            work_queue.close()
+
+    def __enter__(self) -> 'LeaseKeeper':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._released.set()
+        self.join()
+
+
+def run_worker(config: dict, worker_id: Optional[str] = None, idle_exit: bool = True,
+               poll_interval: float = 2.0) -> int:
+    """Claim and scrape shards until the queue is drained; returns shards done."""
+    from frontier import create_frontier
+    from scraper import create_scrapers, create_session
+
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    work_queue = ShardQueue.from_config(config)
+    session = create_session(config)
+    scrapers = {scraper.name: scraper for scraper in create_scrapers(config, session)}
+    done = 0
+
+    try:
+        while True:
+            shard = work_queue.claim(worker_id)
+            if shard is None:
+                if idle_exit:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            scraper = scrapers.get(shard.source)
+            if scraper is None:
+                work_queue.fail(shard, worker_id, f"Source '{shard.source}' is not enabled")
+                continue
+
+            try:
+                with LeaseKeeper(work_queue, shard, worker_id):
+                    problems = scraper.fetch(shard.target, strict=True)
+                    frontier = create_frontier(config, session)
+                    if frontier is not None:
+                        frontier.crawl(problems)
+            except Exception as e:
+                print(f"[{worker_id}] Error scraping {scraper.describe(shard.target)}: {str(e)}")
+                work_queue.fail(shard, worker_id, str(e))
+                continue
+
+            if work_queue.complete(shard, worker_id, problems):
+                done += 1
+                print(f"[{worker_id}] {scraper.describe(shard.target)}: {len(problems)} problems")
+            else:
+                print(f"[{worker_id}] Lease lost for shard {shard.id}, result discarded")
+    finally:
+        session.close()
+        work_queue.close()
+
+    return done
+
+
+def collect_run(config: dict, run_id: str) -> Dict:
+    """Deduplicate and analyze the problems of a finished run."""
+    from analyzer import ProblemAnalyzer
+    from dedup import create_deduplicator
+
+    work_queue = ShardQueue.from_config(config)
+    analyzer = ProblemAnalyzer(config)
+    deduplicator = create_deduplicator(config)
+    state = analyzer.new_state()
+
+    try:
+        for problem in work_queue.iter_problems(run_id):
+            if deduplicator is None or deduplicator.add(problem):
+                analyzer.accumulate(state, analyzer.prepare_problem(problem))
+    finally:
+        work_queue.close()
+
+    if deduplicator is not None:
+        print(deduplicator.report())
+    return analyzer.finalize(state)
+
+
+def _work(config: dict, index: int, idle_exit: bool):
+    run_worker(config, worker_id=f"{socket.gethostname()}-{os.getpid()}-{index}",
+               idle_exit=idle_exit)
+
+
+if __name__ == '__main__':
+    import argparse
+    import multiprocessing
+
+    parser = argparse.ArgumentParser(description='Sharded scraping through a local work queue.')
+    parser.add_argument('command', choices=['enqueue', 'work', 'status', 'collect'])
+    parser.add_argument('run_id', nargs='?')
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Worker processes to start for the work command')
+    parser.add_argument('--wait', action='store_true',
+                        help='Keep workers polling instead of exiting when the queue is empty')
+    parser.add_argument('--output', help='Write the collected analysis to this .json or .snap file')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = json.load(f)
+
+    if args.command == 'enqueue':
+        work_queue = ShardQueue.from_config(config)
+        print(work_queue.enqueue_run(config))
+        work_queue.close()
+    elif args.command == 'work':
+        if args.processes <= 1:
+            run_worker(config, idle_exit=not args.wait)
+        else:
+            workers = [multiprocessing.Process(target=_work, args=(config, i, not args.wait))
+                       for i in range(args.processes)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+    elif not args.run_id:
+        parser.error(f"{args.command} needs a run id")
+    elif args.command == 'status':
+        work_queue = ShardQueue.from_config(config)
+        print(json.dumps(work_queue.status(args.run_id)))
+        work_queue.close()
+    else:
+        from store import SharedAnalysisStore, create_store
+        from snapshot import write_snapshot
+
+        analysis = collect_run(config, args.run_id)
+        print(f"Analyzed {analysis['total_problems']} problems")
+        if args.output and args.output.endswith('.snap'):
+            write_snapshot(args.output, analysis)
+        elif args.output:
+            with open(args.output, 'w') as f:
+                json.dump({'analysis': analysis}, f)
+
+        # Hand the result to running web workers through the shared store
+        store = create_store(config)
+        if isinstance(store, SharedAnalysisStore):
+            published = store.publish(analysis)
+            print(f"Published run {args.run_id} as version {published.version}")
+        elif not args.output:
+            print("Shared snapshot store is disabled; use --output to save the analysis")